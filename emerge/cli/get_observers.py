@@ -16,8 +16,10 @@ CLASS_MAPPER = {
     "node_timeseries_voltage": node_voltage_stats.NodeVoltageTimeSeries,
     "node_voltage_stats": node_voltage_stats.NodeVoltageStats,
     "node_voltage_bins": node_voltage_stats.NodeVoltageBins,
+    "node_voltage_time_stats": node_voltage_stats.NodeVoltageTimeStats,
     "line_loading_stats": line_loading_stats.LineLoadingStats,
     "line_loading_bins": line_loading_stats.LineLoadingBins,
+    "line_loading_time_stats": line_loading_stats.LineLoadingTimeStats,
     "overloaded_lines": line_loading_stats.OverloadedLines,
     "sardi_voltage": system_metrics.SARDI_voltage,
     "sardi_line": system_metrics.SARDI_line,
@@ -29,8 +31,12 @@ class MetricEntry(BaseModel):
     """Interface for defining metric entry."""
 
     export_type: Annotated[
-        Literal["csv"],
-        Field("csv", description="Export format type. Only csv is supported for now."),
+        Literal["csv", "parquet", "arrow", "feather", "npz"],
+        Field(
+            "csv",
+            description="Export format type, parquet is zstd compressed and arrow "
+            "or feather is uncompressed Arrow IPC file which can be memory mapped.",
+        ),
     ]
     file_name: Annotated[str, Field(..., description="File name with extension.")]
     args: Annotated[list[Any], Field([], description="List of arguments if any.")]
@@ -64,6 +70,13 @@ class SimulationMetrics(BaseModel):
             description="Distribution for node voltages.",
         ),
     ]
+    node_voltage_time_stats: Annotated[
+        MetricEntry,
+        Field(
+            MetricEntry(file_name="node_voltage_time_stats.csv", args=[[0.05, 0.95]]),
+            description="Statistics of each node voltage over time.",
+        ),
+    ]
     line_loading_stats: Annotated[
         MetricEntry,
         Field(
@@ -81,6 +94,13 @@ class SimulationMetrics(BaseModel):
             description="Distribution of thermal loading of line segments.",
         ),
     ]
+    line_loading_time_stats: Annotated[
+        MetricEntry,
+        Field(
+            MetricEntry(file_name="line_loading_time_stats.csv", args=[[0.05, 0.95]]),
+            description="Statistics of thermal loading of each line segment over time.",
+        ),
+    ]
     xfmr_loading_stats: Annotated[
         MetricEntry,
         Field(
@@ -171,6 +191,11 @@ class SimulationMetrics(BaseModel):
     ]
 
 
+def get_export_types(metrics: dict) -> dict:
+    """Function to return export type of each metric."""
+    return {key: subdict.get("export_type", "csv") for key, subdict in metrics.items()}
+
+
 def get_observers(metrics: dict) -> dict:
     """Function to return list of observers."""
     observers = {}
@@ -1,27 +1,127 @@
 """ Module for computing time series metrics for multi scenario simulation."""
 from pathlib import Path
-import multiprocessing
 from typing import Annotated
 import json
+import re
 
 import click
-from emerge.cli import get_num_core, get_observers
-from emerge.cli.timeseries_simulation import TimeseriesSimulationInput
+from emerge.cli import get_num_core, get_observers, worker_pool
+from emerge.cli.timeseries_simulation import TimeseriesSimulationInput, get_export_metadata
 
 from emerge.metrics import observer
+from emerge.scenarios import opendss_writer
 from emerge.simulator import simulation_manager
 from emerge.simulator.opendss import OpenDSSSimulator
 from pydantic import Field
 
 
+# Classes of elements scenarios can define on top of the compiled feeder and
+# later disable again, OpenDSS can not remove them from the circuit.
+SCENARIO_ELEMENT_CLASSES = ("pvsystem", "load", "storage", "generator")
+_NEW_ELEMENT_PATTERN = re.compile(
+    r"^new\s+(?P<element>(?P<element_class>\w+)\.\S+)\s*(?P<properties>.*)$", re.IGNORECASE
+)
+_PROPERTY_PATTERN = re.compile(r"([^\s=]+)\s*=")
+
+
 class ScenarioTimeseriesSimulationInput(TimeseriesSimulationInput):
     scenario_file: Annotated[Path, Field(..., description="Path to .dss file to load")]
 
 
-def _run_timeseries_sim(config: ScenarioTimeseriesSimulationInput):
-    opendss_instance = OpenDSSSimulator(config.master_dss_file)
-    opendss_instance.post_redirect(config.scenario_file.absolute())
+class ScenarioElements:
+    """Class for switching scenario elements on compiled feeder without recompiling.
+
+    Elements of the previous scenario not in the next one are disabled and
+    elements of the same name are redefined with `edit` and enabled again, so
+    that the feeder is compiled once per process and each scenario only
+    applies its own elements.
+
+    Attributes:
+        opendss_instance (OpenDSSSimulator): Simulator scenarios are applied to.
+        feeder_elements (set[str]): Names of elements of compiled feeder.
+        properties (dict[str, str]): Properties each scenario element was last
+            defined with indexed by element name.
+        enabled (set[str]): Names of elements of the applied scenario.
+    """
+
+    def __init__(self, opendss_instance: OpenDSSSimulator):
+        self.opendss_instance = opendss_instance
+        self.feeder_elements = {
+            name.lower() for name in opendss_instance.dss_instance.Circuit.AllElementNames()
+        }
+        self.properties: dict[str, str] = {}
+        self.enabled: set[str] = set()
+
+    def can_apply(self, elements: dict[str, str]) -> bool:
+        """Returns True if elements do not redefine feeder elements and
+        elements defined before are given the same properties."""
+        for element, properties in elements.items():
+            if element in self.feeder_elements:
+                return False
+            if element in self.properties and _PROPERTY_PATTERN.findall(
+                self.properties[element].lower()
+            ) != _PROPERTY_PATTERN.findall(properties.lower()):
+                return False
+        return True
+
+    def apply(self, elements: dict[str, str]):
+        """Method to disable elements of previous scenario and define the given ones."""
+        for element in self.enabled - elements.keys():
+            self.opendss_instance.execute_dss_command(f"edit {element} enabled=no")
+        for element, properties in elements.items():
+            if element not in self.properties:
+                self.opendss_instance.execute_dss_command(f"new {element} {properties}")
+            elif element not in self.enabled or self.properties[element] != properties:
+                self.opendss_instance.execute_dss_command(
+                    f"edit {element} {properties} enabled=yes"
+                )
+        self.properties.update(elements)
+        self.enabled = set(elements)
+        self.opendss_instance.mark_circuit_changed()
+
+
+# Scenario elements defined on the simulator of this process, None if the
+# applied scenario can not be undone.
+_scenario_elements: ScenarioElements | None = None
+
 
+def _get_scenario_elements(commands: list[str]) -> dict[str, str] | None:
+    """Function to return properties of elements defined by scenario commands.
+
+    Returns None if any command does something else than defining new
+    element of `SCENARIO_ELEMENT_CLASSES`.
+    """
+    elements = {}
+    for command in commands:
+        match = _NEW_ELEMENT_PATTERN.match(command)
+        if match is None or match["element_class"].lower() not in SCENARIO_ELEMENT_CLASSES:
+            return None
+        elements[match["element"].lower()] = match["properties"]
+    return elements
+
+
+def _export_scenario(
+    manager: simulation_manager.OpenDSSSimulationManager,
+    observers: dict[str, observer.MetricObserver],
+    export_folder: Path,
+    export_types: dict[str, str],
+    metadata: dict,
+):
+    """Function to export convergence report and metrics of simulated scenario."""
+    manager.export_convergence(export_folder / "convergence_report.csv")
+    observer.export_metrics(observers, export_folder, export_types, metadata)
+
+
+def _simulate_scenario(
+    opendss_instance: OpenDSSSimulator,
+    config: ScenarioTimeseriesSimulationInput,
+    writer: worker_pool.BackgroundWriter | None = None,
+):
+    """Function to run time series simulation for scenario already applied to circuit.
+
+    Results are exported on given background writer if passed, neither
+    manager nor observers of the scenario are used afterwards.
+    """
     manager = simulation_manager.OpenDSSSimulationManager(
         opendss_instance=opendss_instance,
         simulation_start_time=config.start_time,
@@ -31,17 +131,126 @@ def _run_timeseries_sim(config: ScenarioTimeseriesSimulationInput):
     )
 
     subject = observer.MetricsSubject()
-    observers = get_observers.get_observers(config.metrics.model_dump())
+    metrics = config.metrics.model_dump()
+    observers = get_observers.get_observers(metrics)
 
     for _, observer_ in observers.items():
         subject.attach(observer_)
 
-    manager.simulate(subject)
-
     export_folder = Path(config.export_path) / config.scenario_file.stem
     export_folder.mkdir(exist_ok=True, parents=True)
-    manager.export_convergence(export_folder / "convergence_report.csv")
-    observer.export_csv(list(observers.values()), export_folder)
+    export_types = get_observers.get_export_types(metrics)
+    metadata = {**get_export_metadata(config), "scenario": config.scenario_file.stem}
+    if config.memory_budget_mb is not None:
+        observer.stream_metrics(
+            observers, export_folder, export_types, config.memory_budget_mb, metadata
+        )
+
+    if config.bulk_qsts:
+        manager.simulate_bulk(subject)
+    else:
+        manager.simulate(subject)
+
+    worker_pool.write(
+        writer,
+        _export_scenario,
+        manager,
+        observers,
+        export_folder,
+        export_types,
+        metadata,
+        label=str(config.scenario_file),
+    )
+
+
+def _apply_scenario(config: ScenarioTimeseriesSimulationInput) -> OpenDSSSimulator:
+    """Function to apply scenario on top of feeder compiled by this process.
+
+    Elements of scenarios only defining new elements are switched on the
+    compiled feeder. Other scenario files are redirected and the feeder is
+    compiled again for the next scenario as their changes can not be undone.
+    """
+    global _scenario_elements
+    opendss_instance = worker_pool.get_opendss_instance(config.master_dss_file)
+    scenario_elements = _scenario_elements
+    if scenario_elements is None or scenario_elements.opendss_instance is not opendss_instance:
+        scenario_elements = ScenarioElements(opendss_instance)
+
+    elements = _get_scenario_elements(
+        opendss_writer.read_scenario_file(config.scenario_file).commands
+    )
+    if elements is None or not scenario_elements.can_apply(elements):
+        if scenario_elements.properties:
+            worker_pool.discard_opendss_instance()
+            opendss_instance = worker_pool.get_opendss_instance(config.master_dss_file)
+        worker_pool.discard_opendss_instance()
+        _scenario_elements = None
+        opendss_instance.post_redirect(config.scenario_file.absolute())
+        return opendss_instance
+
+    scenario_elements.apply(elements)
+    _scenario_elements = scenario_elements
+    opendss_instance.reset_solution()
+    return opendss_instance
+
+
+def _run_timeseries_sim(config: ScenarioTimeseriesSimulationInput):
+    _simulate_scenario(_apply_scenario(config), config, worker_pool.get_background_writer())
+
+
+def _run_nested_timeseries_sims(configs: list[ScenarioTimeseriesSimulationInput]):
+    """Function to simulate nested scenarios in order on one compiled circuit.
+
+    Every scenario after the first one only adds the elements or commands
+    not present in the previous one.
+    """
+    writer = worker_pool.get_background_writer()
+    opendss_instance = _apply_scenario(configs[0])
+    _simulate_scenario(opendss_instance, configs[0], writer)
+    applied_commands = set(opendss_writer.read_scenario_file(configs[0].scenario_file).commands)
+
+    for config in configs[1:]:
+        commands = opendss_writer.read_scenario_file(config.scenario_file).commands
+        if _scenario_elements is not None:
+            opendss_instance = _apply_scenario(config)
+        else:
+            for command in commands:
+                if command not in applied_commands:
+                    opendss_instance.execute_dss_command(command)
+            opendss_instance.mark_circuit_changed()
+            opendss_instance.reset_solution()
+        applied_commands.update(commands)
+        _simulate_scenario(opendss_instance, config, writer)
+
+
+def _get_nested_scenario_groups(
+    configs: list[ScenarioTimeseriesSimulationInput],
+) -> list[list[ScenarioTimeseriesSimulationInput]]:
+    """Function to group scenarios into chains of nested scenarios.
+
+    Scenarios with same sample id are ordered by penetration and each one
+    is chained to the previous one if it contains all of its commands.
+    Scenarios without scenario header are kept on their own.
+    """
+    groups, samples = [], {}
+    for config in configs:
+        scenario = opendss_writer.read_scenario_file(config.scenario_file)
+        if scenario.sample_id is None or scenario.penetration is None:
+            groups.append([config])
+        else:
+            samples.setdefault(scenario.sample_id, []).append((scenario, config))
+
+    for sample_scenarios in samples.values():
+        sample_scenarios.sort(key=lambda item: item[0].penetration)
+        previous_commands = None
+        for scenario, config in sample_scenarios:
+            commands = set(scenario.commands)
+            if previous_commands is not None and previous_commands <= commands:
+                groups[-1].append(config)
+            else:
+                groups.append([config])
+            previous_commands = commands
+    return groups
 
 
 @click.command()
@@ -62,7 +271,29 @@ def _run_timeseries_sim(config: ScenarioTimeseriesSimulationInput):
     show_default=True,
     help="Num of cores to run simulation with.",
 )
-def multi_timeseries_simulation(config: str, scenario_folder: str, num_core: int):
+@click.option(
+    "-fc",
+    "--fork-after-compile",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Compile feeder once and fork a fresh worker for each scenario.",
+)
+@click.option(
+    "-ns",
+    "--nested-scenarios",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Simulate penetration levels of same sample incrementally on one circuit.",
+)
+def multi_timeseries_simulation(
+    config: str,
+    scenario_folder: str,
+    num_core: int,
+    fork_after_compile: bool,
+    nested_scenarios: bool,
+):
     """Run multiscenario time series simulation and compute
     time series metrics."""
     with open(config, "r", encoding="utf-8") as file:
@@ -78,8 +309,15 @@ def multi_timeseries_simulation(config: str, scenario_folder: str, num_core: int
                 ScenarioTimeseriesSimulationInput(**config.model_dump(), scenario_file=file_path)
             )
 
-    num_core = get_num_core(num_core, len(timeseries_input))
+    run_func = _run_timeseries_sim
+    if nested_scenarios:
+        run_func = _run_nested_timeseries_sims
+        timeseries_input = _get_nested_scenario_groups(timeseries_input)
+
+    num_core = get_num_core.get_num_core(num_core, len(timeseries_input))
 
     if num_core > 0:
-        with multiprocessing.Pool(int(num_core)) as p:
-            p.map(_run_timeseries_sim, timeseries_input)
+        if fork_after_compile:
+            worker_pool.map_forked(run_func, timeseries_input, num_core, config.master_dss_file)
+            return
+        worker_pool.map_pool(run_func, timeseries_input, num_core, config.master_dss_file)
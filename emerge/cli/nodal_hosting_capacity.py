@@ -4,11 +4,12 @@ capacity.
 Idea is to loop through all the nodes. Increase the solar capacity by step kw specified
 by user and return max capacity for which the risk would be zero.
 """
+from functools import partial
 from pathlib import Path
-from typing import Annotated
-from datetime import datetime
+from typing import Annotated, Callable, Literal
+from datetime import datetime, timedelta
 import json
-import multiprocessing
+import multiprocessing.queues
 import time
 import math
 
@@ -17,9 +18,8 @@ import numpy as np
 import polars as pl
 from pydantic import BaseModel, Field
 from loguru import logger
-from sqlmodel import Session
 
-from emerge.cli import get_num_core
+from emerge.cli import get_num_core, worker_pool
 from emerge.metrics import observer
 from emerge.simulator import opendss
 from emerge.cli.nodal_hosting_sqlite_tables import (
@@ -27,9 +27,12 @@ from emerge.cli.nodal_hosting_sqlite_tables import (
     OverloadedLinesReport,
     SimulationConvergenceReport,
     SimulationTime,
+    SQLiteWriter,
     TotalEnergyReport,
     create_table,
+    encode_loadings,
     get_engine,
+    insert_reports,
 )
 from emerge.metrics.line_loading_stats import OverloadedLines
 from emerge.metrics.system_metrics import (
@@ -39,8 +42,12 @@ from emerge.metrics.system_metrics import (
     TotalEnergy,
     TotalPVGeneration,
 )
+from emerge.simulator.powerflow_results import PowerflowSnapshot
 from emerge.simulator.simulation_manager import OpenDSSSimulationManager
 
+HOSTING_CAPACITY_PV = "emerge_hosting_capacity_pv"
+_critical_timestamps: dict[tuple, list[datetime]] = {}
+
 
 class BasicSimulationSettings(BaseModel):
     """Interface for basic simulation settings."""
@@ -61,6 +68,34 @@ class SingleNodeHostingCapacityInput(BasicSimulationSettings):
         float, Field(gt=0, description="kW value to increase pv capacity by each time.")
     ]
     max_kw: Annotated[float, Field(gt=0, description="Maximum kw to not exceed.")]
+    search_strategy: Annotated[
+        Literal["linear", "bisection"],
+        Field(
+            "linear",
+            description="Strategy for searching capacities. Linear search tries all capacities "
+            "in step kw increments, bisection search grows capacity exponentially until it "
+            "is reached and then bisects down to step kw resolution.",
+        ),
+    ]
+    screening_timesteps: Annotated[
+        int,
+        Field(
+            0,
+            ge=0,
+            description="Number of critical timesteps per capacity to screen capacities on. "
+            "Timesteps are ranked from base case net load and pv profile, capacities are "
+            "searched only at these timesteps and the result is confirmed by simulating "
+            "the whole window. Zero disables screening.",
+        ),
+    ]
+    early_termination: Annotated[
+        bool,
+        Field(
+            False,
+            description="Stop simulating a capacity at the first timestep hosting capacity "
+            "is reached, metrics for such capacities only cover the simulated timesteps.",
+        ),
+    ]
 
 
 class MultiNodeHostingCapacityInput(SingleNodeHostingCapacityInput):
@@ -80,6 +115,7 @@ class NodalHostingCapacityReport:
 
     def __init__(self):
         self.subject = observer.MetricsSubject()
+        self.is_partial = False
         self.sardi_agg = SARDI_aggregated()
         self.sardi_voltage = SARDI_voltage()
         self.sardi_line = SARDI_line()
@@ -111,6 +147,10 @@ class NodalHostingCapacityReport:
         """Returns overloaded lines."""
         return self.ol_lines.get_metric()
 
+    def get_overloaded_line_start_steps(self) -> dict[str, int]:
+        """Returns index of the first timestep loadings of each overloaded line start at."""
+        return self.ol_lines.get_start_steps()
+
     def get_sardi_voltage(self):
         """Returns SARDI voltage metrics."""
         return pl.from_dict(self.sardi_voltage.get_metric())["sardi_voltage"].to_list()[0]
@@ -136,105 +176,389 @@ class NodalHostingCapacityReport:
         return pl.from_dict(self.export_energy.get_metric())["active_power"].to_list()[0]
 
 
-def _compute_hosting_capacity(input):
-    """Wrapper around compute hosting capacity."""
-    return compute_hosting_capacity(*input)
+def _place_pv(
+    opendss_instance: opendss.OpenDSSSimulator, bus: str, capacity: float, pv_profile: str
+):
+    """Function to place hosting capacity pv on a bus without recompiling the circuit.
+
+    PV system is created the first time and edited in place afterwards to
+    change its bus and capacity.
+    """
+    opendss_instance.dss_instance.Circuit.SetActiveBus(bus)
+    bus_kv = round(opendss_instance.dss_instance.Bus.kVBase() * math.sqrt(3), 2)
+    pv_names = [name.lower() for name in opendss_instance.dss_instance.PVsystems.AllNames()]
+    command = "edit" if HOSTING_CAPACITY_PV in pv_names else "new"
+
+    pv_command = (
+        f"{command} PVSystem.{HOSTING_CAPACITY_PV} bus1={bus} kv={bus_kv} "
+        + f"phases=3 kVA={capacity} Pmpp={capacity} PF=1.0 yearly={pv_profile} enabled=yes"
+    )
+    logger.info(pv_command)
 
+    opendss_instance.execute_dss_command(pv_command)
+    opendss_instance.reset_solution()
 
-def compute_hosting_capacity(
-    config: SingleNodeHostingCapacityInput, bus: str, pv_profile: str, sqlite_file: Path
-):
-    """Function to compute node hosting capacity."""
-    hosting_capacity = 0
-    engine = get_engine(sqlite_file)
 
-    for capacity in np.arange(config.step_kw, config.max_kw, config.step_kw):
-        opendss_instance = opendss.OpenDSSSimulator(config.master_dss_file)
-        opendss_instance.dss_instance.Circuit.SetActiveBus(bus)
-        bus_kv = round(opendss_instance.dss_instance.Bus.kVBase() * math.sqrt(3), 2)
-        pv_name = f"{bus}_pv"
+def _disable_pv(opendss_instance: opendss.OpenDSSSimulator):
+    """Function to disable hosting capacity pv once the bus is done."""
+    pv_names = [name.lower() for name in opendss_instance.dss_instance.PVsystems.AllNames()]
+    if HOSTING_CAPACITY_PV in pv_names:
+        opendss_instance.execute_dss_command(f"edit PVSystem.{HOSTING_CAPACITY_PV} enabled=no")
 
-        new_pv = (
-            f"new PVSystem.{pv_name} bus1={bus} kv={round(bus_kv,2 )} "
-            + f"phases=3 kVA={capacity} Pmpp={capacity} PF=1.0 yearly={pv_profile}"
-        )
-        logger.info(new_pv)
 
-        opendss_instance.dss_instance.run_command(new_pv)
-        opendss_instance.recalc()
-        opendss_instance.solve()
+class _NetLoadObserver(observer.MetricObserver):
+    """Class for recording circuit net load at each timestep."""
 
+    required_results = ("total_power",)
+
+    def __init__(self):
+        self.net_load = {"timestamp": [], "net_load_kw": []}
+
+    def compute(self, snapshot: PowerflowSnapshot):
+        """Refer to base class for more details."""
+        self.net_load["timestamp"].append(snapshot.timestamp)
+        self.net_load["net_load_kw"].append(-float(snapshot.total_power[0]))
+
+    def get_metric(self):
+        """Refer to base class for more details."""
+        return self.net_load
+
+
+def _get_profile_multipliers(
+    opendss_instance: opendss.OpenDSSSimulator,
+    config: SingleNodeHostingCapacityInput,
+    pv_profile: str,
+    timestamps: list[datetime],
+) -> np.ndarray:
+    """Function to return pv profile multipliers OpenDSS uses at given timestamps."""
+    loadshape = opendss_instance.dss_instance.LoadShape
+    loadshape.Name(pv_profile)
+    multipliers = np.array(loadshape.PMult())
+
+    # OpenDSS increments time before solving a yearly simulation step.
+    offsets = [timestamp - config.profile_start_time for timestamp in timestamps]
+    hours = np.array([offset.total_seconds() / 3600 for offset in offsets])
+    hours += config.resolution_min / 60
+
+    interval = loadshape.HrInterval()
+    if interval > 0:
+        return multipliers[(np.round(hours / interval).astype(int) - 1) % len(multipliers)]
+    time_hours = np.array(loadshape.TimeArray())
+    return np.interp(hours % time_hours[-1], time_hours, multipliers)
+
+
+def _get_critical_timestamps(
+    opendss_instance: opendss.OpenDSSSimulator,
+    config: SingleNodeHostingCapacityInput,
+    pv_profile: str,
+    capacities: np.ndarray,
+) -> list[datetime]:
+    """Function to return timesteps most likely to limit pv hosting capacity.
+
+    Base case without hosting capacity pv is simulated once per process and
+    for each capacity timesteps with highest pv generation in excess of
+    base case net load are picked, union of these is returned in time order.
+    """
+    key = (
+        Path(config.master_dss_file),
+        config.start_time,
+        config.end_time,
+        config.profile_start_time,
+        config.resolution_min,
+        pv_profile,
+        config.screening_timesteps,
+        tuple(capacities),
+    )
+    if key in _critical_timestamps:
+        return _critical_timestamps[key]
+
+    _disable_pv(opendss_instance)
+    opendss_instance.reset_solution()
+    net_load_observer = _NetLoadObserver()
+    subject = observer.MetricsSubject()
+    subject.attach(net_load_observer)
+    OpenDSSSimulationManager(
+        opendss_instance=opendss_instance,
+        simulation_start_time=config.start_time,
+        profile_start_time=config.profile_start_time,
+        simulation_end_time=config.end_time,
+        simulation_timestep_min=config.resolution_min,
+    ).simulate(subject=subject)
+
+    timestamps = net_load_observer.get_metric()["timestamp"]
+    net_load = np.array(net_load_observer.get_metric()["net_load_kw"])
+    multipliers = _get_profile_multipliers(opendss_instance, config, pv_profile, timestamps)
+
+    excess_generation = np.outer(capacities, multipliers) - net_load
+    excess_generation[:, multipliers <= 0] = -np.inf
+    n_critical = min(config.screening_timesteps, len(timestamps))
+    critical_ids = np.unique(
+        np.argpartition(-excess_generation, n_critical - 1, axis=1)[:, :n_critical]
+    )
+    critical_timestamps = [timestamps[id] for id in critical_ids if multipliers[id] > 0]
+    if not critical_timestamps:
+        critical_timestamps = list(timestamps)
+
+    logger.info(f"Screening capacities on {len(critical_timestamps)} critical timesteps.")
+    _critical_timestamps[key] = critical_timestamps
+    return critical_timestamps
+
+
+def _compute_hosting_capacity(input):
+    """Wrapper around compute hosting capacity sending reports to writer process."""
+    return compute_hosting_capacity(*input, report_queue=worker_pool.get_report_queue())
+
+
+def _evaluate_capacity(
+    opendss_instance: opendss.OpenDSSSimulator,
+    config: SingleNodeHostingCapacityInput,
+    bus: str,
+    capacity: float,
+    pv_profile: str,
+    write_reports: Callable[[dict], None],
+    timestamps: list[datetime] | None = None,
+) -> NodalHostingCapacityReport:
+    """Function to simulate single pv capacity on a bus and record the reports.
+
+    If timestamps are given only those timesteps are simulated, such
+    screening runs are flagged as partial and only their compute time and
+    convergence are recorded. Report rows keyed by table model are passed
+    to `write_reports`.
+    """
+    _place_pv(opendss_instance, bus, capacity, pv_profile)
+
+    report_instance = NodalHostingCapacityReport()
+    stop_condition = (
+        report_instance.is_hosting_capacity_reached if config.early_termination else None
+    )
+    simulation_windows = (
+        [(config.start_time, config.end_time)]
+        if timestamps is None
+        else [(timestamp, timestamp) for timestamp in timestamps]
+    )
+    logger.info(f"Node started {bus}, capacity {capacity}")
+
+    start_time = time.time()
+    convergence_dict = {"datetime": [], "convergence": []}
+    for window_start, window_end in simulation_windows:
         sim_manager = OpenDSSSimulationManager(
             opendss_instance=opendss_instance,
-            simulation_start_time=config.start_time,
+            simulation_start_time=window_start,
             profile_start_time=config.profile_start_time,
-            simulation_end_time=config.end_time,
+            simulation_end_time=window_end,
             simulation_timestep_min=config.resolution_min,
         )
-
-        report_instance = NodalHostingCapacityReport()
-        logger.info(f"Node started {bus}, capacity {capacity}")
-
-        start_time = time.time()
-        sim_manager.simulate(subject=report_instance.get_subject())
-        end_time = time.time()
-        logger.info(f"Node finished {bus}, " f"elpased time {end_time - start_time} seconds")
-
-        with Session(engine) as session:
+        sim_manager.simulate(subject=report_instance.get_subject(), stop_condition=stop_condition)
+        for key, values in sim_manager.convergence_dict.items():
+            convergence_dict[key].extend(values)
+        if sim_manager.is_stopped:
+            break
+    end_time = time.time()
+    report_instance.is_partial = timestamps is not None or sim_manager.is_stopped
+    logger.info(f"Node finished {bus}, " f"elpased time {end_time - start_time} seconds")
+
+    reports = {
+        SimulationConvergenceReport: [
+            {
+                "node_name": bus,
+                "convergence": conv_,
+                "capacity_kw": capacity,
+                "timestamp": timestamp,
+            }
             for timestamp, conv_ in zip(
-                sim_manager.convergence_dict["datetime"],
-                sim_manager.convergence_dict["convergence"],
-            ):
-                session.add(
-                    SimulationConvergenceReport(
-                        node_name=bus, convergence=conv_, capacity_kw=capacity, timestamp=timestamp
-                    )
-                )
-
-            session.add(
-                SimulationTime(
-                    node_name=bus, capacity=capacity, compute_sec=(end_time - start_time)
-                )
+                convergence_dict["datetime"], convergence_dict["convergence"]
             )
+        ],
+        SimulationTime: [
+            {
+                "node_name": bus,
+                "capacity": capacity,
+                "compute_sec": (end_time - start_time),
+                "is_partial": report_instance.is_partial,
+            }
+        ],
+    }
+
+    if timestamps is None:
+        reports[TotalEnergyReport] = [
+            {
+                "node_name": bus,
+                "pv_capacity_kw": capacity,
+                "pv_energy_mwh": report_instance.get_solar_total_energy(),
+                "circuit_energy_mwh": report_instance.get_circuit_total_energy(),
+            }
+        ]
+        start_steps = report_instance.get_overloaded_line_start_steps()
+        reports[OverloadedLinesReport] = [
+            {
+                "start_time": config.start_time
+                + timedelta(minutes=config.resolution_min * start_steps[ol_line]),
+                "resolution_min": config.resolution_min,
+                "node_name": bus,
+                "line_name": ol_line,
+                "loadings": encode_loadings(loadings),
+            }
+            for ol_line, loadings in report_instance.get_overloaded_line_loadings().items()
+        ]
 
-            session.add(
-                TotalEnergyReport(
-                    node_name=bus,
-                    pv_capacity_kw=capacity,
-                    pv_energy_mwh=report_instance.get_solar_total_energy(),
-                    circuit_energy_mwh=report_instance.get_circuit_total_energy(),
-                )
-            )
+    write_reports(reports)
+    return report_instance
 
-            for ol_line, loadings in report_instance.get_overloaded_line_loadings().items():
-                session.add(
-                    OverloadedLinesReport(
-                        start_time=config.start_time,
-                        resolution_min=config.resolution_min,
-                        node_name=bus,
-                        line_name=ol_line,
-                        loadings=str(loadings),
-                    )
-                )
 
-            session.commit()
+def _linear_search(
+    capacities: np.ndarray, evaluate: Callable[[float], NodalHostingCapacityReport]
+) -> tuple[float, NodalHostingCapacityReport]:
+    """Function to find hosting capacity by trying capacities one by one.
 
-        if report_instance.is_hosting_capacity_reached() > 0:
+    Returns hosting capacity along with report of the first capacity exceeding
+    it or of the last capacity tried if none did, hosting capacity of zero
+    with empty report if there are no capacities to try.
+    """
+    if not len(capacities):
+        return 0, NodalHostingCapacityReport()
+    hosting_capacity = 0
+    for capacity in capacities:
+        report_instance = evaluate(capacity)
+        if report_instance.is_hosting_capacity_reached():
             break
-
         hosting_capacity = capacity
+    return hosting_capacity, report_instance
+
+
+def _bisection_search(
+    capacities: np.ndarray, evaluate: Callable[[float], NodalHostingCapacityReport]
+) -> tuple[float, NodalHostingCapacityReport]:
+    """Function to find hosting capacity with galloping followed by bisection.
+
+    Capacity index is doubled until hosting capacity is reached (or all
+    capacities pass) and the boundary is then bisected, so only O(log n)
+    capacities are simulated. Assumes hosting capacity criteria is monotonic
+    in pv capacity, returns the same result as `_linear_search` in that case.
+    """
+    if not len(capacities):
+        return 0, NodalHostingCapacityReport()
+    reports: dict[int, NodalHostingCapacityReport] = {}
+
+    def is_reached(index: int) -> bool:
+        if index not in reports:
+            reports[index] = evaluate(capacities[index])
+        return reports[index].is_hosting_capacity_reached()
+
+    # Indexes of last passing and first failing capacity, -1 means no capacity passes.
+    low, high = -1, len(capacities)
+    index = 0
+    while index < len(capacities):
+        if is_reached(index):
+            high = index
+            break
+        low = index
+        index = 2 * index + 1
+    else:
+        last = len(capacities) - 1
+        if last > low and is_reached(last):
+            high = last
+        else:
+            low = last
+
+    while high - low > 1:
+        middle = (low + high) // 2
+        if is_reached(middle):
+            high = middle
+        else:
+            low = middle
+
+    hosting_capacity = capacities[low] if low >= 0 else 0
+    return hosting_capacity, reports[high if high < len(capacities) else low]
+
+
+def _screened_search(
+    capacities: np.ndarray,
+    search: Callable,
+    screen: Callable[[float], NodalHostingCapacityReport],
+    evaluate: Callable[[float], NodalHostingCapacityReport],
+) -> tuple[float, NodalHostingCapacityReport]:
+    """Function to find hosting capacity by screening capacities first.
+
+    Capacities are searched using cheap screening evaluation, screened hosting
+    capacity is an upper bound as fewer timesteps can only show fewer
+    violations. It is confirmed with full evaluation and if it fails hosting
+    capacity is searched again among smaller capacities with full evaluation.
+    """
+    hosting_capacity, report_instance = search(capacities, screen)
+    candidates = capacities[capacities <= hosting_capacity]
+    if not len(candidates):
+        return hosting_capacity, report_instance
+
+    confirmation = evaluate(candidates[-1])
+    if not confirmation.is_hosting_capacity_reached():
+        if report_instance.is_hosting_capacity_reached():
+            return hosting_capacity, report_instance
+        return hosting_capacity, confirmation
+
+    reports = {candidates[-1]: confirmation}
+
+    def evaluate_once(capacity: float) -> NodalHostingCapacityReport:
+        if capacity not in reports:
+            reports[capacity] = evaluate(capacity)
+        return reports[capacity]
+
+    return search(candidates, evaluate_once)
 
-    with Session(engine) as session:
-        session.add(
-            HostingCapacityReport(
-                node_name=bus,
-                hosting_capacity_kw=hosting_capacity,
-                sardi_voltage=report_instance.get_sardi_voltage(),
-                sardi_aggregated=report_instance.get_sardi_aggregated(),
-                sardi_line=report_instance.get_sardi_line(),
-            )
+
+def compute_hosting_capacity(
+    config: SingleNodeHostingCapacityInput,
+    bus: str,
+    pv_profile: str,
+    sqlite_file: Path,
+    report_queue: multiprocessing.queues.Queue | None = None,
+):
+    """Function to compute node hosting capacity.
+
+    Reports are put on queue of `SQLiteWriter` process if passed so that
+    simulation of next capacity does not wait for them, otherwise each
+    capacity is committed to `sqlite_file` right away.
+    """
+    if report_queue is None:
+        write_reports = partial(insert_reports, get_engine(sqlite_file))
+    else:
+        write_reports = report_queue.put
+    opendss_instance = worker_pool.get_opendss_instance(config.master_dss_file)
+
+    def evaluate(capacity: float, timestamps: list[datetime] | None = None):
+        return _evaluate_capacity(
+            opendss_instance, config, bus, capacity, pv_profile, write_reports, timestamps
+        )
+
+    capacities = np.arange(config.step_kw, config.max_kw, config.step_kw)
+    search = _bisection_search if config.search_strategy == "bisection" else _linear_search
+    if config.screening_timesteps and len(capacities):
+        critical_timestamps = _get_critical_timestamps(
+            opendss_instance, config, pv_profile, capacities
+        )
+        hosting_capacity, report_instance = _screened_search(
+            capacities,
+            search,
+            lambda capacity: evaluate(capacity, critical_timestamps),
+            evaluate,
         )
-        session.commit()
+    else:
+        hosting_capacity, report_instance = search(capacities, evaluate)
+
+    _disable_pv(opendss_instance)
+    write_reports(
+        {
+            HostingCapacityReport: [
+                {
+                    "node_name": bus,
+                    "hosting_capacity_kw": hosting_capacity,
+                    "sardi_voltage": report_instance.get_sardi_voltage(),
+                    "sardi_aggregated": report_instance.get_sardi_aggregated(),
+                    "sardi_line": report_instance.get_sardi_line(),
+                    "is_partial": report_instance.is_partial,
+                }
+            ]
+        }
+    )
 
 
 @click.command()
@@ -270,16 +594,22 @@ def nodal_hosting_analysis(config: str, nodes: str):
 
     create_table(config.export_sqlite_path)
     num_core = get_num_core.get_num_core(config.num_core, len(buses))
-    with multiprocessing.Pool(int(num_core)) as pool:
-        data_to_process = [
-            [
-                SingleNodeHostingCapacityInput.model_validate(config.model_dump()),
-                bus,
-                config.pv_profile,
-                config.export_sqlite_path,
-            ]
-            for bus in buses
+    data_to_process = [
+        [
+            SingleNodeHostingCapacityInput.model_validate(config.model_dump()),
+            bus,
+            config.pv_profile,
+            config.export_sqlite_path,
         ]
-        pool.map(_compute_hosting_capacity, data_to_process)
+        for bus in buses
+    ]
+    with SQLiteWriter(config.export_sqlite_path) as writer:
+        worker_pool.map_pool(
+            _compute_hosting_capacity,
+            data_to_process,
+            num_core,
+            config.master_dss_file,
+            writer.queue,
+        )
     analysis_end_time = time.time()
     print(f"Required time: {analysis_end_time - analysis_start_time} seconds, num_core={num_core}")
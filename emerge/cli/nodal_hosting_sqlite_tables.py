@@ -1,9 +1,25 @@
+""" Module for sqlite tables of nodal hosting capacity reports.
+
+Reports from all workers are written by a single writer process that
+bulk inserts them in batches, so workers never contend for the database lock.
+"""
+
 from typing import Optional
 from pathlib import Path
 from datetime import datetime
-
+import multiprocessing
+import multiprocessing.queues
+import queue
+import time
+
+import numpy as np
+from loguru import logger
+from sqlalchemy import event, insert
 from sqlmodel import Field, SQLModel, create_engine
 
+# Dtype of line loadings stored as binary arrays.
+LOADINGS_DTYPE = np.dtype("<f4")
+
 
 class HostingCapacityReport(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -12,6 +28,7 @@ class HostingCapacityReport(SQLModel, table=True):
     sardi_voltage: float
     sardi_line: float
     sardi_aggregated: float
+    is_partial: bool = False
 
 
 class SimulationTime(SQLModel, table=True):
@@ -19,6 +36,7 @@ class SimulationTime(SQLModel, table=True):
     node_name: str
     capacity: float
     compute_sec: float
+    is_partial: bool = False
 
 
 class SimulationConvergenceReport(SQLModel, table=True):
@@ -43,16 +61,143 @@ class OverloadedLinesReport(SQLModel, table=True):
     resolution_min: int
     node_name: str
     line_name: str
-    loadings: str
+    loadings: bytes
+
+
+def encode_loadings(loadings: list[float] | np.ndarray) -> bytes:
+    """Function to encode line loadings as compact binary array."""
+    return np.asarray(loadings, dtype=LOADINGS_DTYPE).tobytes()
+
+
+def decode_loadings(loadings: bytes) -> np.ndarray:
+    """Function to decode line loadings stored by `encode_loadings`."""
+    return np.frombuffer(loadings, dtype=LOADINGS_DTYPE)
+
+
+def _set_sqlite_pragmas(dbapi_connection, _):
+    """Internal function enabling write ahead log so readers do not block writer."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
 
 
 def get_engine(sqlite_file: Path):
-    return create_engine(f"sqlite:///{str(sqlite_file)}")
+    engine = create_engine(f"sqlite:///{str(sqlite_file)}")
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
 
 
 def create_table(sqlite_file: Path):
     """Function to create sqlite table."""
 
-    engine = create_engine(f"sqlite:///{str(sqlite_file)}")
+    engine = get_engine(sqlite_file)
     SQLModel.metadata.create_all(engine)
     return engine
+
+
+def insert_reports(engine, reports: dict[type[SQLModel], list[dict]]):
+    """Function to bulk insert report rows in a single transaction.
+
+    Args:
+        engine (Engine): Engine of the sqlite file.
+        reports (dict[type[SQLModel], list[dict]]): Rows to insert keyed by table model.
+    """
+    with engine.begin() as connection:
+        for model, rows in reports.items():
+            if rows:
+                connection.execute(insert(model), rows)
+
+
+def _write_reports(
+    sqlite_file: Path,
+    report_queue: multiprocessing.queues.Queue,
+    commit_rows: int,
+    commit_interval_sec: float,
+):
+    """Internal function inserting reports from queue until stop sentinel is received.
+
+    Rows are committed once `commit_rows` rows are pending or the oldest
+    pending row waited `commit_interval_sec` seconds. Queue is drained until
+    the sentinel even if inserts fail so that workers never block on it,
+    process exits with non zero code in that case.
+    """
+    engine = get_engine(sqlite_file)
+    pending: dict[type[SQLModel], list[dict]] = {}
+    n_pending, pending_since, failed = 0, None, False
+
+    def commit():
+        nonlocal pending, n_pending, pending_since, failed
+        try:
+            insert_reports(engine, pending)
+        except Exception:
+            logger.exception(f"Failed to insert {n_pending} rows into {sqlite_file}.")
+            failed = True
+        pending, n_pending, pending_since = {}, 0, None
+
+    while True:
+        timeout = (
+            None
+            if pending_since is None
+            else max(pending_since + commit_interval_sec - time.monotonic(), 0)
+        )
+        try:
+            reports = report_queue.get(timeout=timeout)
+        except queue.Empty:
+            commit()
+            continue
+        if reports is None:
+            break
+
+        for model, rows in reports.items():
+            pending.setdefault(model, []).extend(rows)
+            n_pending += len(rows)
+        if pending_since is None:
+            pending_since = time.monotonic()
+        if n_pending >= commit_rows:
+            commit()
+
+    commit()
+    engine.dispose()
+    if failed:
+        raise RuntimeError(f"Failed to write reports to {sqlite_file}.")
+
+
+class SQLiteWriter:
+    """Class for writing reports of all workers from a single process.
+
+    Reports put on `queue` as dictionary of rows keyed by table model are
+    bulk inserted by the writer process in batches. Queue can be shared with
+    pool workers through pool initializer.
+
+    Args:
+        sqlite_file (Path): Path to sqlite file with tables already created.
+        commit_rows (int): Number of pending rows triggering commit.
+        commit_interval_sec (float): Maximum time rows stay uncommitted.
+    """
+
+    def __init__(
+        self, sqlite_file: Path, commit_rows: int = 5000, commit_interval_sec: float = 5.0
+    ):
+        self.queue = multiprocessing.Queue()
+        self.process = multiprocessing.Process(
+            target=_write_reports,
+            args=(sqlite_file, self.queue, commit_rows, commit_interval_sec),
+            name="emerge-sqlite-writer",
+            daemon=True,
+        )
+        self.process.start()
+
+    def close(self):
+        """Method to commit remaining reports and stop the writer process."""
+        if self.process.exitcode is None:
+            self.queue.put(None)
+            self.process.join()
+        if self.process.exitcode:
+            raise RuntimeError("SQLite writer process failed.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
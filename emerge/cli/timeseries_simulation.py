@@ -30,6 +30,34 @@ class TimeseriesSimulationInput(BaseModel):
     metrics: Annotated[
         SimulationMetrics, Field(SimulationMetrics(), description="Simulation metrics.")
     ]
+    bulk_qsts: Annotated[
+        bool,
+        Field(
+            False,
+            description="Solve all timesteps inside OpenDSS and read results from monitors.",
+        ),
+    ]
+    memory_budget_mb: Annotated[
+        float | None,
+        Field(
+            None,
+            gt=0,
+            description="Memory in MB for buffering results of metrics exported as parquet, "
+            "which are then written in chunks while simulating. Results are kept in "
+            "memory until export if not passed.",
+        ),
+    ]
+
+
+def get_export_metadata(config: TimeseriesSimulationInput) -> dict[str, str]:
+    """Function to return simulation details stored along with exported metrics."""
+    return {
+        "master_dss_file": str(config.master_dss_file),
+        "start_time": config.start_time.isoformat(),
+        "end_time": config.end_time.isoformat(),
+        "profile_start_time": config.profile_start_time.isoformat(),
+        "resolution_min": str(config.resolution_min),
+    }
 
 
 def compute_timeseries_simulation_metrics(config: TimeseriesSimulationInput):
@@ -45,14 +73,25 @@ def compute_timeseries_simulation_metrics(config: TimeseriesSimulationInput):
         simulation_timestep_min=config.resolution_min,
     )
     subject = observer.MetricsSubject()
-    observers = get_observers.get_observers(config.metrics.model_dump())
+    metrics = config.metrics.model_dump()
+    observers = get_observers.get_observers(metrics)
 
     for _, observer_ in observers.items():
         subject.attach(observer_)
 
-    manager.simulate(subject)
+    export_types = get_observers.get_export_types(metrics)
+    metadata = get_export_metadata(config)
+    if config.memory_budget_mb is not None:
+        observer.stream_metrics(
+            observers, config.export_path, export_types, config.memory_budget_mb, metadata
+        )
+
+    if config.bulk_qsts:
+        manager.simulate_bulk(subject)
+    else:
+        manager.simulate(subject)
     manager.export_convergence(config.export_path / "convergence_report.csv")
-    observer.export_csv(list(observers.values()), config.export_path)
+    observer.export_metrics(observers, config.export_path, export_types, metadata)
 
 
 @click.command()
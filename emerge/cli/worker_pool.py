@@ -0,0 +1,328 @@
+""" Module for managing worker processes that keep a compiled feeder
+between tasks.
+
+Each worker compiles the master dss file once when it starts and
+precomputes static feeder metadata, tasks then only apply their own
+changes e.g. pv placement or scenario file on top of the compiled feeder.
+Results are written by a background writer thread of each worker so that
+the worker goes on to the next task while previous results are written.
+"""
+
+import multiprocessing
+import multiprocessing.connection
+import multiprocessing.queues
+import multiprocessing.util
+import os
+import queue
+import threading
+from pathlib import Path
+from typing import Callable
+
+from loguru import logger
+
+from emerge.simulator import opendss
+from emerge.simulator.feeder_metadata import get_feeder_metadata
+
+_opendss_instance: opendss.OpenDSSSimulator | None = None
+_background_writer: "BackgroundWriter | None" = None
+_report_queue: multiprocessing.queues.Queue | None = None
+_write_errors: multiprocessing.queues.Queue | None = None
+
+
+def get_opendss_instance(master_dss_file: Path) -> opendss.OpenDSSSimulator:
+    """Returns simulator compiled once per process and reused across tasks.
+
+    Circuit is recompiled if it is not loaded in OpenDSS anymore, if it was
+    compiled from different master file or if it was discarded by
+    `discard_opendss_instance`.
+    """
+    global _opendss_instance
+    if (
+        _opendss_instance is None
+        or not _opendss_instance.is_active()
+        or _opendss_instance.case_file != Path(master_dss_file)
+    ):
+        _opendss_instance = opendss.OpenDSSSimulator(master_dss_file)
+    return _opendss_instance
+
+
+def discard_opendss_instance():
+    """Function to force recompiling the circuit for the next task.
+
+    Used after changes that can not be undone e.g. redirecting a scenario file.
+    """
+    global _opendss_instance
+    _opendss_instance = None
+
+
+class BackgroundWriter:
+    """Class for running write tasks in order on a background thread.
+
+    Tasks are put on a bounded queue so that at most `max_pending` finished
+    results wait to be written, submitting blocks once the writer falls that
+    far behind. Failed tasks are logged along with their label and put on
+    `error_queue` if given, e.g. for the process that started the pool to
+    raise them, otherwise they are raised by the next `flush` or `close`.
+
+    Args:
+        max_pending (int): Maximum number of tasks waiting in the queue.
+        error_queue (multiprocessing.queues.Queue | None): Queue receiving
+            labelled error messages of failed tasks.
+    """
+
+    def __init__(
+        self, max_pending: int = 2, error_queue: multiprocessing.queues.Queue | None = None
+    ):
+        self.pid = os.getpid()
+        self.error_queue = error_queue
+        self._queue = queue.Queue(max_pending)
+        self._errors: list[tuple[str, BaseException]] = []
+        self._thread = threading.Thread(target=self._run, name="emerge-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        """Internal method running queued tasks until stop sentinel is received."""
+        while True:
+            task = self._queue.get()
+            try:
+                if task is None:
+                    return
+                func, args, label = task
+                func(*args)
+            except Exception as error:
+                logger.exception(f"Background write of {label} failed.")
+                if self.error_queue is not None:
+                    self.error_queue.put(f"{label}: {error!r}")
+                else:
+                    self._errors.append((label, error))
+            finally:
+                self._queue.task_done()
+
+    def _raise_errors(self):
+        """Internal method to raise failed tasks in the submitting thread."""
+        if self._errors:
+            errors, self._errors = self._errors, []
+            labels = ", ".join(label for label, _ in errors)
+            raise RuntimeError(f"Background write of {labels} failed.") from errors[0][1]
+
+    def submit(self, func: Callable, *args, label: str | None = None):
+        """Method to queue `func(*args)` to run on the background thread.
+
+        Args:
+            func (Callable): Function writing results.
+            *args: Arguments passed to `func`.
+            label (str | None): Name of the results reported if writing fails,
+                defaults to function name.
+        """
+        if not self._thread.is_alive():
+            raise RuntimeError("Background writer is closed.")
+        self._queue.put((func, args, label or func.__name__))
+
+    def flush(self):
+        """Method to wait until all queued tasks are written."""
+        if self._thread.is_alive():
+            self._queue.join()
+        self._raise_errors()
+
+    def close(self):
+        """Method to write queued tasks and stop the background thread.
+
+        Does nothing in processes forked from the one that started the writer
+        as the thread is not running there.
+        """
+        if self.pid != os.getpid():
+            return
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._raise_errors()
+
+
+def get_background_writer() -> BackgroundWriter:
+    """Returns background writer started once per process.
+
+    Writer is closed when the process exits normally, e.g. pool workers
+    once the pool is closed and joined, so queued results are not lost.
+    Failures of pool workers are sent to the process that started the pool.
+    """
+    global _background_writer
+    if _background_writer is None or _background_writer.pid != os.getpid():
+        writer = BackgroundWriter(error_queue=_write_errors)
+        multiprocessing.util.Finalize(writer, writer.close, exitpriority=10)
+        _background_writer = writer
+    return _background_writer
+
+
+def close_background_writer():
+    """Function to write queued results and stop background writer of this process."""
+    global _background_writer
+    if _background_writer is not None and _background_writer.pid == os.getpid():
+        writer, _background_writer = _background_writer, None
+        writer.close()
+
+
+def write(writer: BackgroundWriter | None, func: Callable, *args, label: str | None = None):
+    """Function to run write task on given background writer or right away if not given."""
+    if writer is None:
+        func(*args)
+    else:
+        writer.submit(func, *args, label=label)
+
+
+def get_report_queue() -> multiprocessing.queues.Queue | None:
+    """Returns queue of the report writer process shared with this worker if any."""
+    return _report_queue
+
+
+def init_worker(
+    master_dss_file: Path,
+    report_queue: multiprocessing.queues.Queue | None = None,
+    write_errors: multiprocessing.queues.Queue | None = None,
+):
+    """Pool initializer compiling the feeder and precomputing static metadata."""
+    global _report_queue, _write_errors
+    _report_queue = report_queue
+    _write_errors = write_errors
+    get_opendss_instance(master_dss_file)
+
+    feeder = get_feeder_metadata()
+    for attribute in [
+        "buses",
+        "network",
+        "substation_bus",
+        "load_bus_map",
+        "bus_load_flag",
+        "topology",
+        "bus_load_counts",
+        "line_customers",
+    ]:
+        getattr(feeder, attribute)
+
+
+def get_pool(
+    num_core: int,
+    master_dss_file: Path,
+    report_queue: multiprocessing.queues.Queue | None = None,
+    write_errors: multiprocessing.queues.Queue | None = None,
+    **kwargs,
+) -> multiprocessing.Pool:
+    """Returns pool whose workers are initialized with the compiled feeder.
+
+    Args:
+        num_core (int): Number of worker processes.
+        master_dss_file (Path): Path to master dss file to compile in each worker.
+        report_queue (multiprocessing.queues.Queue | None): Queue of report writer
+            process returned by `get_report_queue` in workers.
+        write_errors (multiprocessing.queues.Queue | None): Queue receiving
+            failures of background writers of the workers.
+        **kwargs: Additional arguments passed to `multiprocessing.Pool`.
+    """
+    return multiprocessing.Pool(
+        int(num_core),
+        initializer=init_worker,
+        initargs=(master_dss_file, report_queue, write_errors),
+        **kwargs,
+    )
+
+
+def map_pool(
+    func: Callable,
+    inputs: list,
+    num_core: int,
+    master_dss_file: Path,
+    report_queue: multiprocessing.queues.Queue | None = None,
+) -> list:
+    """Function to map inputs over worker pool and shut it down cleanly.
+
+    Pool is closed and joined instead of terminated, so each worker exits
+    normally and flushes its background writer before the function returns.
+    Writes that failed in any worker are raised here along with their labels.
+
+    Args:
+        func (Callable): Function to call with each input.
+        inputs (list): List of inputs.
+        num_core (int): Number of worker processes.
+        master_dss_file (Path): Path to master dss file to compile in each worker.
+        report_queue (multiprocessing.queues.Queue | None): Queue of report writer
+            process shared with workers.
+
+    Returns:
+        list: Return values of `func` in order of inputs.
+
+    Raises:
+        RuntimeError: If background write of any input failed.
+    """
+    write_errors = multiprocessing.Queue()
+    pool = get_pool(num_core, master_dss_file, report_queue, write_errors)
+    try:
+        results = pool.map(func, inputs)
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+    errors = []
+    while True:
+        try:
+            errors.append(write_errors.get_nowait())
+        except queue.Empty:
+            break
+    if errors:
+        raise RuntimeError("Background write failed for " + "; ".join(errors))
+    return results
+
+
+def _run_forked(func: Callable, input):
+    """Internal function running input in forked process and writing its results."""
+    func(input)
+    close_background_writer()
+
+
+def map_forked(func: Callable, inputs: list, num_core: int, master_dss_file: Path):
+    """Function to run each input in its own process forked after compiling feeder.
+
+    Feeder is compiled and its metadata precomputed once in the calling
+    process, processes get it copy-on-write when forked so they neither
+    compile nor hold their own copy until they change the circuit. Each input
+    runs in a fresh process so it always starts from the unmodified feeder.
+    Processes are forked from the calling thread as OpenDSS engine may crash
+    in processes forked from other threads, which rules out pool with
+    `maxtasksperchild`. Background writer is flushed before each process
+    exits so failed writes fail the process. Only available on platforms
+    supporting fork.
+
+    Args:
+        func (Callable): Function to call with each input, return value is ignored.
+        inputs (list): List of inputs.
+        num_core (int): Maximum number of processes running at the same time.
+        master_dss_file (Path): Path to master dss file to compile.
+    """
+    if "fork" not in multiprocessing.get_all_start_methods():
+        raise NotImplementedError("Fork start method is not supported on this platform.")
+
+    init_worker(master_dss_file)
+    context = multiprocessing.get_context("fork")
+    running, failed = [], []
+
+    def wait_for_process():
+        finished = multiprocessing.connection.wait([process.sentinel for process in running])
+        for process in [process for process in running if process.sentinel in finished]:
+            process.join()
+            running.remove(process)
+            if process.exitcode:
+                failed.append(process.name)
+
+    for input in inputs:
+        while len(running) >= num_core:
+            wait_for_process()
+        process = context.Process(target=_run_forked, args=(func, input))
+        process.start()
+        running.append(process)
+
+    while running:
+        wait_for_process()
+
+    if failed:
+        raise RuntimeError(f"{len(failed)} of {len(inputs)} forked processes failed.")
@@ -0,0 +1,277 @@
+""" Module with vectorized kernels shared by statistical metric observers. """
+
+import numpy as np
+
+
+class BinAccumulator:
+    """Class for accumulating time elements spend in value bins.
+
+    Bins are open intervals between consecutive edges along with one bin
+    below the lowest and one above the highest edge, values equal to an
+    edge or NaN are not counted in any bin.
+
+    Attributes:
+        edges (np.ndarray): Sorted unique bin edges.
+        labels (list[str]): Bin labels e.g. `>0.95__<0.96`, `<0.95` and `>1.05`.
+        hours (np.ndarray): Accumulated hours for each bin ordered by bin position.
+    """
+
+    def __init__(self, bins: list[float]):
+        edges = sorted(set(bins))
+        if len(edges) < 2:
+            raise ValueError(f"{edges} should at least have two unique items.")
+
+        self.edges = np.array(edges, dtype=float)
+        self.labels = [f">{edges[id]}__<{el}" for id, el in enumerate(edges[1:])]
+        self.labels += [f"<{edges[0]}", f">{edges[-1]}"]
+        # Bin positions of the labels, position 0 is below the lowest edge.
+        self._label_positions = np.r_[1 : len(edges), 0, len(edges)]
+        self.hours = np.zeros(len(edges) + 1)
+
+    def add(self, values: np.ndarray, duration_hr: float) -> None:
+        """Method to add values observed for given duration.
+
+        Args:
+            values (np.ndarray): Values of a single timestep or (timesteps x
+                elements) block of values sharing the same timestep.
+            duration_hr (float): Duration of each timestep in hours.
+        """
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        positions = np.searchsorted(self.edges, values, side="right")
+        on_edge = self.edges[np.maximum(positions - 1, 0)] == values
+        self.hours += (
+            np.bincount(positions[~on_edge], minlength=len(self.hours)) * duration_hr
+        )
+
+    def get_hours(self) -> dict[str, float]:
+        """Method to return accumulated hours keyed by bin label."""
+        return dict(zip(self.labels, self.hours[self._label_positions].tolist()))
+
+
+DEFAULT_QUANTILES = {
+    "quantile_0.1": 0.1,
+    "quantile_0.25": 0.25,
+    "quantile_0.75": 0.75,
+    "quantile_0.90": 0.9,
+}
+
+
+class StatisticsAccumulator:
+    """Class for computing statistics of values for each timestep.
+
+    Minimum, maximum, median, mean and quantiles are computed from a single
+    partition of the values. Quantiles use nearest rank like polars default
+    interpolation and median is linearly interpolated. Results are written
+    into a preallocated (timesteps x statistics) array which grows if more
+    timesteps are added than reserved.
+
+    Attributes:
+        labels (list[str]): Statistic names e.g. `min`, `mean` or `quantile_0.1`.
+        quantiles (np.ndarray): Quantiles computed after min, max, median and mean.
+        statistics (np.ndarray): (timesteps x statistics) array of computed statistics.
+        n_steps (int): Number of timesteps added so far.
+    """
+
+    def __init__(self, quantiles: list[float] | None = None):
+        """Constructor for `StatisticsAccumulator` class.
+
+        Args:
+            quantiles (list[float] | None): Quantiles to compute, labelled
+                `quantile_<q>`. Defaults to 0.1, 0.25, 0.75 and 0.90.
+        """
+        quantiles = (
+            DEFAULT_QUANTILES
+            if quantiles is None
+            else {f"quantile_{quantile}": quantile for quantile in quantiles}
+        )
+        if not all(0 <= quantile <= 1 for quantile in quantiles.values()):
+            raise ValueError(f"{list(quantiles.values())} should all be between 0 and 1.")
+
+        self.labels = ["min", "max", "median", "mean", *quantiles]
+        self.quantiles = np.array(list(quantiles.values()), dtype=float)
+        self.statistics = np.empty((0, len(self.labels)))
+        self.n_steps = 0
+
+    def reserve(self, n_steps: int) -> None:
+        """Method to make room for `n_steps` more timesteps."""
+        n_rows = self.n_steps + n_steps
+        if n_rows > len(self.statistics):
+            statistics = np.empty((max(n_rows, 2 * len(self.statistics)), len(self.labels)))
+            statistics[: self.n_steps] = self.statistics[: self.n_steps]
+            self.statistics = statistics
+
+    def add(self, values: np.ndarray) -> None:
+        """Method to compute statistics of values for the next timestep."""
+        self.reserve(1)
+        row = self.statistics[self.n_steps]
+        self.n_steps += 1
+
+        n_values = len(values)
+        if n_values == 0:
+            row[:] = np.nan
+            return
+
+        median_ranks = [(n_values - 1) // 2, n_values // 2]
+        quantile_ranks = np.floor((n_values - 1) * self.quantiles + 0.5).astype(int)
+        ranks = np.unique([0, n_values - 1, *median_ranks, *quantile_ranks])
+        values = np.partition(values, ranks)
+
+        row[0] = values[0]
+        row[1] = values[n_values - 1]
+        row[2] = values[median_ranks].mean()
+        row[3] = values.mean()
+        row[4:] = values[quantile_ranks]
+
+    def get_statistics(self) -> dict[str, list[float]]:
+        """Method to return computed statistics keyed by label."""
+        statistics = self.statistics[: self.n_steps]
+        return {label: statistics[:, id].tolist() for id, label in enumerate(self.labels)}
+
+
+class P2Quantiles:
+    """Class for estimating quantiles of each element over time with P² algorithm.
+
+    Each quantile of each element is tracked with five markers whose heights
+    are adjusted with piecewise parabolic interpolation as values arrive, see
+    Jain and Chlamtac (1985). Memory is constant per element irrespective
+    of number of timesteps and markers of all elements are updated at once.
+    Quantiles are exact for the first five timesteps.
+
+    Attributes:
+        quantiles (np.ndarray): Quantiles being estimated.
+        n_steps (int): Number of timesteps added so far.
+    """
+
+    def __init__(self, quantiles: list[float]):
+        if not all(0 <= quantile <= 1 for quantile in quantiles):
+            raise ValueError(f"{quantiles} should all be between 0 and 1.")
+
+        self.quantiles = np.array(quantiles, dtype=float)
+        self.n_steps = 0
+        # Marker heights and positions with shape (quantiles x elements x 5).
+        self._heights = np.array([])
+        self._positions = np.array([])
+        self._desired_positions = np.outer(self.quantiles, [0, 2, 4, 2, 0]) + [0, 0, 0, 2, 4]
+        self._desired_increments = (
+            np.outer(self.quantiles, [0, 0.5, 1, 0.5, 0]) + [0, 0, 0, 0.5, 1]
+        )
+
+    def add(self, values: np.ndarray) -> None:
+        """Method to add values of all elements for the next timestep."""
+        values = np.asarray(values, dtype=float)
+        if self.n_steps < 5:
+            if self.n_steps == 0:
+                self._heights = np.empty((5, len(values)))
+            self._heights[self.n_steps] = values
+            self.n_steps += 1
+            if self.n_steps == 5:
+                self._heights = np.broadcast_to(
+                    np.sort(self._heights, axis=0).T, (len(self.quantiles), len(values), 5)
+                ).copy()
+                self._positions = np.broadcast_to(
+                    np.arange(5, dtype=float), self._heights.shape
+                ).copy()
+            return
+
+        self.n_steps += 1
+        heights, positions = self._heights, self._positions
+        np.minimum(heights[..., 0], values, out=heights[..., 0])
+        np.maximum(heights[..., 4], values, out=heights[..., 4])
+        cell = (heights[..., 1:4] <= values[:, None]).sum(axis=-1)
+        positions[..., 1:] += np.arange(1, 5) > cell[..., None]
+        self._desired_positions += self._desired_increments
+
+        desired_positions = self._desired_positions[:, None, :]
+        for id in range(1, 4):
+            offset = desired_positions[..., id] - positions[..., id]
+            move_up = (offset >= 1) & (positions[..., id + 1] - positions[..., id] > 1)
+            move_down = (offset <= -1) & (positions[..., id - 1] - positions[..., id] < -1)
+            step = move_up.astype(float) - move_down
+            if step.any():
+                self._adjust_marker(id, step)
+
+    def _adjust_marker(self, id: int, step: np.ndarray) -> None:
+        """Internal method to move marker `id` by `step` positions adjusting its height."""
+        heights, positions = self._heights, self._positions
+        q_low, q, q_high = heights[..., id - 1], heights[..., id], heights[..., id + 1]
+        n_low, n, n_high = positions[..., id - 1], positions[..., id], positions[..., id + 1]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            parabolic = q + step / (n_high - n_low) * (
+                (n - n_low + step) * (q_high - q) / (n_high - n)
+                + (n_high - n - step) * (q - q_low) / (n - n_low)
+            )
+            q_next = np.where(step > 0, q_high, q_low)
+            n_next = np.where(step > 0, n_high, n_low)
+            linear = q + step * (q_next - q) / (n_next - n)
+        height = np.where((q_low < parabolic) & (parabolic < q_high), parabolic, linear)
+
+        moved = step != 0
+        heights[..., id] = np.where(moved, height, q)
+        positions[..., id] += step
+
+    def get_quantiles(self) -> np.ndarray:
+        """Method to return (quantiles x elements) array of estimated quantiles."""
+        if self.n_steps < 5:
+            return np.quantile(
+                self._heights[: self.n_steps], self.quantiles, axis=0, method="nearest"
+            )
+        return self._heights[..., 2].copy()
+
+
+class ElementStatistics:
+    """Class for computing statistics of each element over time in constant memory.
+
+    Minimum, maximum, mean and sample variance are updated exactly with
+    Welford's algorithm while quantiles are estimated with `P2Quantiles`.
+
+    Attributes:
+        labels (list[str]): Statistic names e.g. `min`, `variance` or `quantile_0.05`.
+        n_steps (int): Number of timesteps added so far.
+    """
+
+    def __init__(self, quantiles: list[float]):
+        self.labels = ["min", "max", "mean", "variance"]
+        self.labels += [f"quantile_{quantile}" for quantile in quantiles]
+        self.n_steps = 0
+        self._min = np.array([])
+        self._max = np.array([])
+        self._mean = np.array([])
+        self._sum_squares = np.array([])
+        self._quantiles = P2Quantiles(quantiles)
+
+    def add(self, values: np.ndarray) -> None:
+        """Method to add values of all elements for the next timestep."""
+        values = np.asarray(values, dtype=float)
+        if self.n_steps == 0:
+            self._min = values.copy()
+            self._max = values.copy()
+            self._mean = np.zeros(len(values))
+            self._sum_squares = np.zeros(len(values))
+
+        self.n_steps += 1
+        np.minimum(self._min, values, out=self._min)
+        np.maximum(self._max, values, out=self._max)
+        delta = values - self._mean
+        self._mean += delta / self.n_steps
+        self._sum_squares += delta * (values - self._mean)
+        self._quantiles.add(values)
+
+    def add_batch(self, values: np.ndarray) -> None:
+        """Method to add (timesteps x elements) block of values."""
+        for step_values in values:
+            self.add(step_values)
+
+    def get_statistics(self) -> dict[str, np.ndarray]:
+        """Method to return statistics of each element keyed by label."""
+        if self.n_steps == 0:
+            return {label: np.array([]) for label in self.labels}
+
+        variance = (
+            self._sum_squares / (self.n_steps - 1)
+            if self.n_steps > 1
+            else np.full(len(self._mean), np.nan)
+        )
+        statistics = [self._min, self._max, self._mean, variance]
+        return dict(zip(self.labels, [*statistics, *self._quantiles.get_quantiles()]))
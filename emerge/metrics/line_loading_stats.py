@@ -1,121 +1,200 @@
 """ Module for computing timeseries line loading stats. """
 
+import datetime
 from typing import Dict, List
 import numpy as np
 
-import polars
-import opendssdirect as odd
-
-from emerge.metrics import observer
-from emerge.simulator import powerflow_results
-
-
-def get_line_loading_df():
-    return powerflow_results.get_loading_dataframe()
+from emerge.metrics import array_stats, data_model, observer
+from emerge.simulator.powerflow_results import PowerflowSnapshot
 
 
 class OverloadedLines(observer.MetricObserver):
-    """Class for computing time series loading metrics for lines."""
-
-    def __init__(self):
-        self.metrics = {}
-
-    def compute(self) -> None:
-        df = powerflow_results.get_loading_dataframe()
-        loading_dict = dict(zip(df["branch"], df["loading(pu)"]))
-        if len(self.metrics) == 0:
-            self.metrics = {key: [] for key in loading_dict}
+    """Class for computing time series loading metrics for lines.
+
+    Only loadings of elements whose loading exceeded the threshold are kept.
+    Loadings of all elements are buffered in a chunk of `chunk_size`
+    timesteps, once chunk is full only the columns of elements that crossed
+    the threshold so far are kept. Memory therefore scales with number of
+    overloaded elements instead of all elements times timesteps. Loadings of
+    elements first exceeding the threshold in a later chunk are reported
+    from the first timestep of that chunk, see `get_start_steps`.
+
+    Attributes:
+        loading_limit (ThermalLoadingLimit): Instance of `ThermalLoadingLimit`
+            data model.
+        branches (list[str]): Power delivery element names.
+        max_loadings (np.ndarray): Running maximum per unit loading of each element.
+    """
+
+    required_results = ("loadings",)
+
+    def __init__(self, loading_limit: float = 1.0, chunk_size: int = 96):
+        """Constructor for `OverloadedLines` class.
+
+        Args:
+            loading_limit (float): Per unit loading above which element is overloaded.
+            chunk_size (int): Number of timesteps buffered for all the elements.
+        """
+        if chunk_size < 1:
+            raise ValueError(f"{chunk_size=} should be at least 1.")
+
+        self.loading_limit = data_model.ThermalLoadingLimit(threshold=loading_limit)
+        self.chunk_size = chunk_size
+        self.branches: list[str] = []
+        self.max_loadings = np.array([])
+        self._chunk = np.array([])
+        self._chunk_steps = 0
+        # Completed chunks as (element indexes, timesteps x elements loadings).
+        self._chunks: list[tuple[np.ndarray, np.ndarray]] = []
+
+    def _get_overloaded_indexes(self) -> np.ndarray:
+        """Internal method to return indexes of elements exceeding the threshold so far."""
+        return np.flatnonzero(self.max_loadings > self.loading_limit.threshold)
+
+    def _get_loadings(self) -> dict[int, tuple[int, np.ndarray]]:
+        """Internal method to return first timestep and loadings of overloaded elements.
+
+        Returns:
+            dict[int, tuple[int, np.ndarray]]: First timestep and loadings from
+                it onwards keyed by element index.
+        """
+        chunks = self._chunks + [
+            (self._get_overloaded_indexes(), self._chunk[: self._chunk_steps])
+        ]
+        loadings: dict[int, tuple[int, list[np.ndarray]]] = {}
+        for chunk_id, (indexes, chunk) in enumerate(chunks):
+            # Last chunk still holds all the elements.
+            columns = indexes if chunk_id == len(self._chunks) else range(len(indexes))
+            for index, column in zip(indexes, columns):
+                loadings.setdefault(index, (chunk_id * self.chunk_size, []))[1].append(
+                    chunk[:, column]
+                )
+        return {
+            index: (start_step, np.concatenate(columns))
+            for index, (start_step, columns) in sorted(loadings.items())
+        }
 
-        for line, metric in loading_dict.items():
-            self.metrics[line].append(metric)
+    def compute(self, snapshot: PowerflowSnapshot) -> None:
+        if not self.branches:
+            self.branches = list(snapshot.branches)
+            self.max_loadings = np.full(len(self.branches), -np.inf)
+            self._chunk = np.empty((self.chunk_size, len(self.branches)))
+        if len(snapshot.loadings) != len(self.branches):
+            raise ValueError(
+                f"Number of elements changed from {len(self.branches)} "
+                f"to {len(snapshot.loadings)}."
+            )
+
+        self._chunk[self._chunk_steps] = snapshot.loadings
+        np.maximum(self.max_loadings, snapshot.loadings, out=self.max_loadings)
+        self._chunk_steps += 1
+
+        if self._chunk_steps == self.chunk_size:
+            indexes = self._get_overloaded_indexes()
+            self._chunks.append((indexes, self._chunk[:, indexes].copy()))
+            self._chunk_steps = 0
+
+    def get_start_steps(self) -> Dict[str, int]:
+        """Returns index of the first timestep loadings of each overloaded element start at."""
+        return {
+            self.branches[index]: start_step
+            for index, (start_step, _) in self._get_loadings().items()
+        }
 
     def get_metric(self) -> Dict:
-        overloaded_lines = {}
-        for line, loading_arr in self.metrics.items():
-            loading_arr_np = np.array(loading_arr)
-            if len(loading_arr_np[loading_arr_np > 1.0]):
-                overloaded_lines[line] = loading_arr
+        """Returns loadings of overloaded elements keyed by element name.
+
+        Loadings start at the timestep given by `get_start_steps`, so elements
+        first overloaded in a later chunk have shorter lists.
+        """
+        return {
+            self.branches[index]: loadings.tolist()
+            for index, (_, loadings) in self._get_loadings().items()
+        }
 
-        return overloaded_lines
+    def get_table(self) -> Dict:
+        """Returns loadings of overloaded elements over all timesteps, loadings
+        before the first timestep of an element are left empty."""
+        return {
+            self.branches[index]: [None] * start_step + loadings.tolist()
+            for index, (start_step, loadings) in self._get_loadings().items()
+        }
 
 
 class LineLoadingBins(observer.MetricObserver):
     """Class for computing line loading distribution bins."""
 
+    required_results = ("loadings",)
+
     def __init__(self, bins: List[float]):
-        bins = list(set(bins))
-        bins.sort()
-
-        if len(bins) < 2:
-            raise ValueError(f"{bins} should at least have two unique items.")
-
-        self.metrics = {f">{bins[id]}__<{el}": 0 for id, el in enumerate(bins[1:])}
-        self.metrics[f"<{bins[0]}"] = 0
-        self.metrics[f">{bins[-1]}"] = 0
-
-    def compute(self) -> None:
-        df = get_line_loading_df()
-        timestep = odd.Solution.StepSize() / (3600)
-
-        for metric in self.metrics:
-            if "__" in metric:
-                low_val = float(metric.split("__")[0].split(">")[1])
-                high_val = float(metric.split("__")[1].split("<")[1])
-
-                self.metrics[metric] += (
-                    len(
-                        df.filter(
-                            (polars.col("loading(pu)") > low_val)
-                            & (polars.col("loading(pu)") < high_val)
-                        )
-                    )
-                    * timestep
-                )
+        self.bins = array_stats.BinAccumulator(bins)
 
-            elif "<" in metric and "__" not in metric:
-                low_val = float(metric.split("<")[1])
-                self.metrics[metric] += (
-                    len(df.filter((polars.col("loading(pu)") < low_val))) * timestep
-                )
+    def compute(self, snapshot: PowerflowSnapshot) -> None:
+        self.bins.add(snapshot.loadings, snapshot.timestep_hr)
 
-            elif ">" in metric and "__" not in metric:
-                high_val = float(metric.split(">")[1])
-                self.metrics[metric] += (
-                    len(df.filter((polars.col("loading(pu)") > high_val))) * timestep
-                )
+    def compute_batch(self, loadings: np.ndarray, timestep_hr: float) -> None:
+        """Method to add (timesteps x elements) block of loadings at once.
+
+        Args:
+            loadings (np.ndarray): Per unit loadings for each timestep.
+            timestep_hr (float): Simulation step size in hours.
+        """
+        self.bins.add(loadings, timestep_hr)
 
     def get_metric(self) -> Dict:
-        return self.metrics
+        return self.bins.get_hours()
 
 
 class LineLoadingStats(observer.MetricObserver):
     """Class for computing line loading statistics."""
 
-    def __init__(self):
-        self.metrics = {
-            metric: []
-            for metric in [
-                "min",
-                "max",
-                "median",
-                "mean",
-                "quantile_0.1",
-                "quantile_0.25",
-                "quantile_0.75",
-                "quantile_0.90",
-            ]
-        }
+    required_results = ("loadings",)
 
-    def compute(self) -> None:
-        df = get_line_loading_df()  # noqa
-        for metric in self.metrics:
-            if "_" not in metric:
-                self.metrics[metric].append(eval(f"df.{metric}()['loading(pu)'][0]"))
-            else:
-                param = float(metric.split("_")[1])
-                self.metrics[metric].append(
-                    eval(f"df.{metric.split('_')[0]}({param})['loading(pu)'][0]")
-                )
+    def __init__(self, quantiles: List[float] | None = None):
+        """Constructor for `LineLoadingStats` class.
+
+        Args:
+            quantiles (List[float] | None): Quantiles to compute in addition to
+                min, max, median and mean. Defaults to 0.1, 0.25, 0.75 and 0.90.
+        """
+        self.statistics = array_stats.StatisticsAccumulator(quantiles)
+
+    def initialize(self, timestamps: list[datetime.datetime]) -> None:
+        self.statistics.reserve(len(timestamps))
+
+    def compute(self, snapshot: PowerflowSnapshot) -> None:
+        self.statistics.add(snapshot.loadings)
 
     def get_metric(self) -> Dict:
-        return self.metrics
+        return self.statistics.get_statistics()
+
+
+class LineLoadingTimeStats(observer.MetricObserver):
+    """Class for computing loading statistics of each power delivery element over time.
+
+    Statistics are updated as timesteps are simulated so memory does not
+    grow with simulation length, quantiles are estimates.
+
+    Args:
+        quantiles (List[float] | None): Quantiles to estimate for each element,
+            defaults to 0.05 and 0.95.
+    """
+
+    required_results = ("loadings",)
+
+    def __init__(self, quantiles: List[float] | None = None):
+        self.branches: list[str] = []
+        self.statistics = array_stats.ElementStatistics(
+            [0.05, 0.95] if quantiles is None else quantiles
+        )
+
+    def compute(self, snapshot: PowerflowSnapshot) -> None:
+        if not self.branches:
+            self.branches = list(snapshot.branches)
+        self.statistics.add(snapshot.loadings)
+
+    def get_metric(self) -> Dict:
+        statistics = self.statistics.get_statistics()
+        return {"branch": self.branches} | {
+            label: values.tolist() for label, values in statistics.items()
+        }
@@ -1,11 +1,11 @@
 """ Module for managing computation of node level metrics. """
 
-import pandas as pd
+import numpy as np
 
 from emerge.metrics import observer
 from emerge.metrics import data_model
-from emerge.simulator import powerflow_results
-from emerge.utils import dss_util
+from emerge.simulator.feeder_metadata import get_feeder_metadata
+from emerge.simulator.powerflow_results import PowerflowSnapshot
 
 
 class LLRI(observer.MetricObserver):
@@ -13,13 +13,15 @@ class LLRI(observer.MetricObserver):
 
     Attributes:
         loading_threshold (float): Line loading threshol
-        llri_metric (float): LLRI metric
+        llri_metric (np.ndarray): Running sum of LLRI metric for each line
         counter (int): Counter for keeping track how number
             of times compute function is called
         line_downward_customers (pd.DataFrame): Dataframe containing mapping
             between line segment and number of downward customers
     """
 
+    required_results = ("loadings",)
+
     def __init__(self, loading_threshold: float = 1.0):
         """Constructor for LLRI metric.
 
@@ -30,50 +32,49 @@ class LLRI(observer.MetricObserver):
 
         self.loading_limit = data_model.ThermalLoadingLimit(threshold=loading_threshold)
 
-        self.llri_metric = pd.DataFrame()
+        self.llri_metric = np.array([])
         self.counter = 0
 
-    def _get_initial_dataset(self):
-        """Get initial dataset for computing the metric."""
+    def _get_initial_dataset(self, branches: list[str]):
+        """Get initial dataset for computing the metric.
 
-        self.line_downward_customers = dss_util.get_line_customers()
+        Maps branches to lines once so that each step only indexes arrays.
+        Line names are lower case while branch names keep OpenDSS class
+        case e.g. `Line.`, so branches are matched case insensitively like
+        SARDI metrics match them to topology edges.
+        """
 
-    def compute(self):
-        """Refer to base class for more details."""
+        self.line_downward_customers = get_feeder_metadata().line_customers
+        line_index = {
+            linename: id for id, linename in enumerate(self.line_downward_customers.index)
+        }
+        branch_lines = [line_index.get(branch.lower(), -1) for branch in branches]
+        self._branch_index = np.flatnonzero(np.array(branch_lines) >= 0)
+        self._line_index = np.array(branch_lines, dtype=int)[self._branch_index]
+        self._customers = self.line_downward_customers["customers"].to_numpy(dtype=float)
+        self.llri_metric = np.zeros(len(self.line_downward_customers))
 
-        # Get voltage dataframe and load bus mapper
-        line_loading_df = powerflow_results.get_loading_dataframe().to_pandas().set_index("branch")
+    def compute(self, snapshot: PowerflowSnapshot):
+        """Refer to base class for more details."""
 
         if not self.counter:
-            self._get_initial_dataset()
-
-        ol_flags = line_loading_df["loading(pu)"] > self.loading_limit.threshold
-        ol_gamma = line_loading_df[ol_flags] - self.loading_limit.threshold
-        ol_gamma = ol_gamma.rename(columns={"loading(pu)": "ol_llri"})
+            self._get_initial_dataset(snapshot.branches)
 
-        merged_df = pd.merge(
-            self.line_downward_customers,
-            ol_gamma,
-            how="left",
-            left_index=True,
-            right_index=True,
-        ).fillna(0)
-
-        merged_df["metric"] = merged_df["customers"] * (merged_df["ol_llri"])
-
-        if self.llri_metric.empty:
-            self.llri_metric = pd.DataFrame(merged_df["metric"])
-        else:
-            self.llri_metric = pd.DataFrame(self.llri_metric["metric"] + merged_df["metric"])
+        loadings = snapshot.loadings[self._branch_index]
+        ol_gamma = np.where(
+            loadings > self.loading_limit.threshold, loadings - self.loading_limit.threshold, 0
+        )
+        self.llri_metric[self._line_index] += self._customers[self._line_index] * ol_gamma
 
         self.counter += 1
 
     def get_metric(self):
         """Refer to base class for more details."""
-        return {
-            linename: metric / self.counter if self.counter else 0
-            for linename, metric in self.llri_metric.to_dict().get("metric", {}).items()
-        }
+        if not self.counter:
+            return {}
+        return dict(
+            zip(self.line_downward_customers.index, (self.llri_metric / self.counter).tolist())
+        )
 
 
 class NVRI(observer.MetricObserver):
@@ -82,13 +83,15 @@ class NVRI(observer.MetricObserver):
     Attributes:
         upper_threshold (float): Voltage upper threshold
         lower_threshold (float): Voltage lower threshold
-        nvri_metric (float): NVRI metric
+        nvri_metric (np.ndarray): Running sum of NVRI metric for each bus
         counter (int): Counter for keeping track how number
             of times compute function is called
         bus_load_flag_df (pd.DataFrame): Dataframe containing mapping
             between bus and load flag
     """
 
+    required_results = ("voltages",)
+
     def __init__(self, upper_threshold: float = 1.05, lower_threshold: float = 0.95):
         """Constructor for SARDI_voltage metric.
 
@@ -102,57 +105,49 @@ class NVRI(observer.MetricObserver):
             undervoltage_threshold=lower_threshold,
         )
 
-        self.nvri_metric = pd.DataFrame()
+        self.nvri_metric = np.array([])
         self.counter = 0
 
-    def _get_initial_dataset(self):
-        """Get initial dataset for computing the metric."""
+    def _get_initial_dataset(self, buses: list[str]):
+        """Get initial dataset for computing the metric.
 
-        self.bus_load_flag_df = dss_util.get_bus_load_flag()
+        Maps nodes to buses once so that each step only indexes arrays.
+        """
 
-    def compute(self):
+        self.bus_load_flag_df = get_feeder_metadata().bus_load_flag
+        bus_load_flag = self.bus_load_flag_df[~self.bus_load_flag_df.index.duplicated()]
+        self._buses = list(bus_load_flag.index)
+        bus_index = {busname: id for id, busname in enumerate(self._buses)}
+        node_buses = np.array([bus_index.get(busname, -1) for busname in buses], dtype=int)
+        self._node_index = np.flatnonzero(node_buses >= 0)
+        self._node_buses = node_buses[self._node_index]
+        self._is_load = bus_load_flag["is_load"].to_numpy(dtype=float)
+        self.nvri_metric = np.zeros(len(self._buses))
+
+    def _add_first_violation(self, metric: np.ndarray, flags: np.ndarray, gamma: np.ndarray):
+        """Internal method to add gamma of the first violating node of each bus."""
+        node_buses = self._node_buses[flags]
+        violating_buses, first_nodes = np.unique(node_buses, return_index=True)
+        metric[violating_buses] += gamma[flags][first_nodes]
+
+    def compute(self, snapshot: PowerflowSnapshot):
         """Refer to base class for more details."""
 
-        # Get voltage dataframe and load bus mapper
-        voltage_df = powerflow_results.get_voltage_dataframe().to_pandas().set_index("busname")
-
         if not self.counter:
-            self._get_initial_dataset()
-
-        ov_flags = voltage_df["voltage(pu)"] > self.voltage_limit.overvoltage_threshold
-        ov_gamma = voltage_df[ov_flags] - self.voltage_limit.overvoltage_threshold
-        ov_gamma = ov_gamma.rename(columns={"voltage(pu)": "ov_nvri"})
-
-        uv_flags = voltage_df["voltage(pu)"] < self.voltage_limit.undervoltage_threshold
-        uv_gamma = self.voltage_limit.undervoltage_threshold - voltage_df[uv_flags]
-        uv_gamma = uv_gamma.rename(columns={"voltage(pu)": "uv_nvri"})
+            self._get_initial_dataset(snapshot.buses)
 
-        merged_df_ = pd.merge(
-            self.bus_load_flag_df,
-            ov_gamma,
-            how="left",
-            left_index=True,
-            right_index=True,
-        ).fillna(0)
-        merged_df = pd.merge(
-            merged_df_, uv_gamma, how="left", left_index=True, right_index=True
-        ).fillna(0)
-
-        merged_df["metric"] = merged_df["is_load"] * (merged_df["ov_nvri"] + merged_df["uv_nvri"])
-
-        ## Deal with duplicate indexes
-        merged_df = merged_df[~merged_df.index.duplicated(keep="first")]
-
-        if self.nvri_metric.empty:
-            self.nvri_metric = pd.DataFrame(merged_df["metric"])
-        else:
-            self.nvri_metric = pd.DataFrame(self.nvri_metric["metric"] + merged_df["metric"])
+        voltages = snapshot.voltages[self._node_index]
+        metric = np.zeros(len(self._buses))
+        ov_gamma = voltages - self.voltage_limit.overvoltage_threshold
+        self._add_first_violation(metric, ov_gamma > 0, ov_gamma)
+        uv_gamma = self.voltage_limit.undervoltage_threshold - voltages
+        self._add_first_violation(metric, uv_gamma > 0, uv_gamma)
 
+        self.nvri_metric += self._is_load * metric
         self.counter += 1
 
     def get_metric(self):
         """Refer to base class for more details."""
-        return {
-            busname: metric / self.counter if self.counter else 0
-            for busname, metric in self.nvri_metric.to_dict().get("metric", {}).items()
-        }
+        if not self.counter:
+            return {}
+        return dict(zip(self._buses, (self.nvri_metric / self.counter).tolist()))
@@ -1,110 +1,227 @@
 """ Module for computing timeseries voltage stats. """
 
+import datetime
+from pathlib import Path
 from typing import List
 
-import opendssdirect as odd
-import polars
+import numpy as np
+import polars as pl
 
-from emerge.metrics import observer
-from emerge.simulator import powerflow_results
-
-
-def get_voltage_df():
-    return powerflow_results.get_voltage_dataframe()
+from emerge.metrics import array_stats, observer
+from emerge.simulator.powerflow_results import PowerflowSnapshot
 
 
 class NodeVoltageTimeSeries(observer.MetricObserver):
-    def __init__(self):
-        self.metrics = {}
-
-    def compute(self) -> None:
-        df = powerflow_results.get_voltage_dataframe()
-        if not self.metrics:
-            self.metrics = {busname: [] for busname in df.index}
-        for key, value in df.to_dict()["voltage(pu)"].items():
-            self.metrics[key].append(value)
+    """Class for storing per unit voltage time series of all nodes.
+
+    Voltages are written into a preallocated (timesteps x nodes) array sized
+    from the timesteps passed to `initialize`, which grows if more timesteps
+    are computed than expected. Array can be backed by a memory mapped `.npy`
+    file to keep long simulations of large feeders out of memory. When
+    streaming, the array instead holds a fixed chunk of timesteps fitting the
+    memory budget which is appended to the parquet file once full.
+
+    Args:
+        dtype (str): Numpy dtype used to store voltages e.g. `float32`.
+        memmap_file (str | Path | None): Path to `.npy` file backing the array,
+            array is kept in memory if not passed.
+        timestamp_index (bool): Include `timestamp` column in the metric.
+    """
+
+    required_results = ("voltages",)
+    can_stream = True
+
+    def __init__(
+        self,
+        dtype: str = "float64",
+        memmap_file: str | Path | None = None,
+        timestamp_index: bool = False,
+    ):
+        self.dtype = np.dtype(dtype)
+        self.memmap_file = None if memmap_file is None else Path(memmap_file)
+        self.timestamp_index = timestamp_index
+        self.nodes: list[str] = []
+        self.timestamps: list[datetime.datetime | None] = []
+        self.voltages: np.ndarray | None = None
+        self._expected_steps = 0
+        # Timesteps already appended to the parquet stream.
+        self._n_flushed = 0
+        self._stream: observer.ParquetStream | None = None
+        self._chunk_bytes = 0.0
+
+    def _allocate(self, n_steps: int, n_nodes: int) -> np.ndarray:
+        """Internal method to create (timesteps x nodes) array filled with NaN."""
+        if self.memmap_file is None:
+            return np.full((n_steps, n_nodes), np.nan, dtype=self.dtype)
+        voltages = np.lib.format.open_memmap(
+            self.memmap_file, mode="w+", dtype=self.dtype, shape=(n_steps, n_nodes)
+        )
+        voltages[:] = np.nan
+        return voltages
+
+    def _reserve(self, n_steps: int) -> None:
+        """Internal method to grow the array so that it holds at least `n_steps` rows."""
+        if self.voltages is None or len(self.voltages) >= n_steps:
+            return
+        if self.is_streaming:
+            self._flush()
+            return
+        n_steps = max(n_steps, 2 * len(self.voltages))
+        if self.memmap_file is None:
+            voltages = self._allocate(n_steps, len(self.nodes))
+            voltages[: len(self.timestamps)] = self.voltages[: len(self.timestamps)]
+            self.voltages = voltages
+            return
+
+        # Memory mapped file can not be resized in place, copy into larger file.
+        old_file = self.memmap_file.with_suffix(".old.npy")
+        self.voltages.flush()
+        del self.voltages
+        self.memmap_file.replace(old_file)
+        old_voltages = np.load(old_file, mmap_mode="r")
+        self.voltages = self._allocate(n_steps, old_voltages.shape[1])
+        self.voltages[: len(self.timestamps)] = old_voltages[: len(self.timestamps)]
+        del old_voltages
+        old_file.unlink()
+
+    def _get_columns(self, start: int, end: int) -> dict:
+        """Internal method to return metric columns for timesteps `start` to `end`."""
+        columns = {"timestamp": self.timestamps[start:end]} if self.timestamp_index else {}
+        if self.voltages is not None:
+            voltages = self.voltages[start - self._n_flushed : end - self._n_flushed]
+            columns.update({node: voltages[:, id] for id, node in enumerate(self.nodes)})
+        return columns
+
+    def _flush(self) -> None:
+        """Internal method to append buffered timesteps to the parquet stream."""
+        if len(self.timestamps) > self._n_flushed:
+            self._stream.write(self._get_columns(self._n_flushed, len(self.timestamps)))
+            self._n_flushed = len(self.timestamps)
+
+    def stream(
+        self, file_path: Path, memory_budget_mb: float, metadata: dict | None = None
+    ) -> bool:
+        if self.voltages is not None:
+            raise ValueError("Streaming should start before computing any timestep.")
+        self._stream = observer.ParquetStream(file_path, metadata)
+        self._chunk_bytes = memory_budget_mb * 1024**2
+        self.is_streaming = True
+        return True
+
+    def close(self) -> None:
+        if self.is_streaming:
+            self._flush()
+            self._stream.close()
+
+    def initialize(self, timestamps: list[datetime.datetime]) -> None:
+        self._expected_steps = len(self.timestamps) + len(timestamps)
+        if not self.is_streaming:
+            self._reserve(self._expected_steps)
+
+    def compute(self, snapshot: PowerflowSnapshot) -> None:
+        if self.voltages is None:
+            self.nodes = snapshot.nodes
+            n_steps = max(self._expected_steps, len(self.timestamps) + 1)
+            if self.is_streaming:
+                chunk_steps = self._chunk_bytes // (len(self.nodes) * self.dtype.itemsize)
+                n_steps = int(max(1, min(n_steps, chunk_steps)))
+            self.voltages = self._allocate(n_steps, len(self.nodes))
+        if len(snapshot.voltages) != len(self.nodes):
+            raise ValueError(
+                f"Number of nodes changed from {len(self.nodes)} to {len(snapshot.voltages)}."
+            )
+
+        self._reserve(len(self.timestamps) - self._n_flushed + 1)
+        self.voltages[len(self.timestamps) - self._n_flushed] = snapshot.voltages
+        self.timestamps.append(snapshot.timestamp)
 
     def get_metric(self) -> dict:
-        return self.metrics
+        """Refer to base class for more details.
+
+        Streamed voltages are read back from the parquet file once it is closed.
+        """
+        if self.is_streaming:
+            self.close()
+            if not self._stream.n_rows:
+                return self._get_columns(0, 0)
+            return pl.read_parquet(self._stream.file_path).to_dict(as_series=False)
+        return self._get_columns(0, len(self.timestamps))
 
 
 class NodeVoltageStats(observer.MetricObserver):
     """Class for computing node voltage statistical metrics."""
 
-    def __init__(self):
-        self.metrics = {
-            metric: []
-            for metric in [
-                "min",
-                "max",
-                "median",
-                "mean",
-                "quantile_0.1",
-                "quantile_0.25",
-                "quantile_0.75",
-                "quantile_0.90",
-            ]
-        }
+    required_results = ("voltages",)
+
+    def __init__(self, quantiles: List[float] | None = None):
+        """Constructor for `NodeVoltageStats` class.
 
-    def compute(self) -> None:
-        df = get_voltage_df()  # noqa
-        for metric in self.metrics:
-            if "_" not in metric:
-                self.metrics[metric].append(eval(f"df.{metric}()['voltage(pu)'][0]"))
-            else:
-                param = float(metric.split("_")[1])
-                self.metrics[metric].append(
-                    eval(f"df.{metric.split('_')[0]}({param})['voltage(pu)'][0]")
-                )
+        Args:
+            quantiles (List[float] | None): Quantiles to compute in addition to
+                min, max, median and mean. Defaults to 0.1, 0.25, 0.75 and 0.90.
+        """
+        self.statistics = array_stats.StatisticsAccumulator(quantiles)
+
+    def initialize(self, timestamps: list[datetime.datetime]) -> None:
+        self.statistics.reserve(len(timestamps))
+
+    def compute(self, snapshot: PowerflowSnapshot) -> None:
+        self.statistics.add(snapshot.voltages)
 
     def get_metric(self) -> dict:
-        return self.metrics
+        return self.statistics.get_statistics()
 
 
 class NodeVoltageBins(observer.MetricObserver):
     """Class for computing node voltage statistical metrics."""
 
+    required_results = ("voltages",)
+
     def __init__(self, bins: List[float]):
-        bins = list(set(bins))
-        bins.sort()
-
-        if len(bins) < 2:
-            raise ValueError(f"{bins} should at least have two unique items.")
-
-        self.metrics = {f">{bins[id]}__<{el}": 0 for id, el in enumerate(bins[1:])}
-        self.metrics[f"<{bins[0]}"] = 0
-        self.metrics[f">{bins[-1]}"] = 0
-
-    def compute(self) -> None:
-        df = get_voltage_df()
-        timestep = odd.Solution.StepSize() / (3600)
-
-        for metric in self.metrics:
-            if "__" in metric:
-                low_val = float(metric.split("__")[0].split(">")[1])
-                high_val = float(metric.split("__")[1].split("<")[1])
-
-                self.metrics[metric] += (
-                    len(
-                        df.filter(
-                            (polars.col("voltage(pu)") > low_val)
-                            & (polars.col("voltage(pu)") < high_val)
-                        )
-                    )
-                    * timestep
-                )
-
-            elif "<" in metric and "__" not in metric:
-                low_val = float(metric.split("<")[1])
-                self.metrics[metric] += (
-                    len(df.filter((polars.col("voltage(pu)") < low_val))) * timestep
-                )
-
-            elif ">" in metric and "__" not in metric:
-                high_val = float(metric.split(">")[1])
-                self.metrics[metric] += (
-                    len(df.filter((polars.col("voltage(pu)") > high_val))) * timestep
-                )
+        self.bins = array_stats.BinAccumulator(bins)
+
+    def compute(self, snapshot: PowerflowSnapshot) -> None:
+        self.bins.add(snapshot.voltages, snapshot.timestep_hr)
+
+    def compute_batch(self, voltages: np.ndarray, timestep_hr: float) -> None:
+        """Method to add (timesteps x elements) block of voltages at once.
+
+        Args:
+            voltages (np.ndarray): Per unit voltages for each timestep.
+            timestep_hr (float): Simulation step size in hours.
+        """
+        self.bins.add(voltages, timestep_hr)
 
     def get_metric(self) -> dict:
-        return self.metrics
+        return self.bins.get_hours()
+
+
+class NodeVoltageTimeStats(observer.MetricObserver):
+    """Class for computing voltage statistics of each node over time.
+
+    Statistics are updated as timesteps are simulated so memory does not
+    grow with simulation length, quantiles are estimates.
+
+    Args:
+        quantiles (List[float] | None): Quantiles to estimate for each node,
+            defaults to 0.05 and 0.95.
+    """
+
+    required_results = ("voltages",)
+
+    def __init__(self, quantiles: List[float] | None = None):
+        self.nodes: list[str] = []
+        self.statistics = array_stats.ElementStatistics(
+            [0.05, 0.95] if quantiles is None else quantiles
+        )
+
+    def compute(self, snapshot: PowerflowSnapshot) -> None:
+        if not self.nodes:
+            self.nodes = snapshot.nodes
+        self.statistics.add(snapshot.voltages)
+
+    def get_metric(self) -> dict:
+        statistics = self.statistics.get_statistics()
+        return {"node": self.nodes} | {
+            label: values.tolist() for label, values in statistics.items()
+        }
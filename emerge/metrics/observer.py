@@ -1,24 +1,81 @@
 """ Module for managing metric computation subscriber and publisher. """
 
 import abc
+import datetime
+import json
 import uuid
+from pathlib import Path
 from typing import Dict, List
+
+import numpy as np
 import polars
+import pyarrow
+import pyarrow.feather
+import pyarrow.parquet
+
+from emerge.simulator.powerflow_results import POWERFLOW_RESULTS, PowerflowSnapshot
 
 
 class MetricObserver(abc.ABC):
     """Abstracte interace for metrics observers"""
 
     _id = str(uuid.uuid4())
+    # Power flow results read from snapshot, used to place monitors in bulk simulation.
+    required_results: tuple[str, ...] = POWERFLOW_RESULTS
+    # Whether observer overrides `stream` to write results while simulating.
+    can_stream: bool = False
+    # Whether results are written to file while simulating, see `stream`.
+    is_streaming: bool = False
+
+    def initialize(self, timestamps: list[datetime.datetime]) -> None:
+        """Called before simulating timesteps, observers can override it to preallocate storage.
+
+        It is called again for each simulation run when observer is reused
+        e.g. across separate simulation windows, timestamps then add up.
+
+        Args:
+            timestamps (list[datetime.datetime]): Timesteps about to be simulated.
+        """
+
+    def stream(
+        self, file_path: Path, memory_budget_mb: float, metadata: Dict[str, str] | None = None
+    ) -> bool:
+        """Called before simulating to write results into parquet file while simulating.
+
+        Observers holding results of every timestep can override it to flush
+        chunks of timesteps into `file_path` once they take `memory_budget_mb`
+        instead of keeping the whole history in memory until export.
+
+        Args:
+            file_path (Path): Path to parquet file results are written to.
+            memory_budget_mb (float): Memory in MB results are buffered in.
+            metadata (Dict[str, str] | None): Key value pairs stored along with results.
+
+        Returns:
+            bool: Whether observer streams its results, False by default.
+        """
+        return False
+
+    def close(self) -> None:
+        """Called once simulation is done to finish writing streamed results."""
 
     @abc.abstractmethod
-    def compute(self, *args, **kwargs) -> None:
-        """All metric observer subclass must implement compute method."""
+    def compute(self, snapshot: PowerflowSnapshot) -> None:
+        """All metric observer subclass must implement compute method.
+
+        Args:
+            snapshot (PowerflowSnapshot): Power flow results shared by all
+                observers for the current timestep.
+        """
 
     @abc.abstractmethod
     def get_metric(self) -> Dict:
         """All metric observer subclass must implement get_metric method."""
 
+    def get_table(self) -> Dict:
+        """Returns metric as columns of equal length to export, `get_metric` by default."""
+        return self.get_metric()
+
 
 class MetricsSubject:
     """Class for managing metric subscribers"""
@@ -47,13 +104,173 @@ class MetricsSubject:
         if observer_index:
             self.subscribers.pop(observer_index)
 
-    def notify(self):
-        """Method for notifying the observers."""
+    def get_required_results(self) -> set[str]:
+        """Method to return power flow results needed by all the observers."""
+        return {result for obs in self.subscribers for result in obs.required_results}
+
+    def initialize(self, timestamps: list[datetime.datetime]):
+        """Method for letting observers know the timesteps about to be simulated."""
+        for obs in self.subscribers:
+            obs.initialize(timestamps)
+
+    def notify(self, snapshot: PowerflowSnapshot | None = None):
+        """Method for notifying the observers.
+
+        Args:
+            snapshot (PowerflowSnapshot | None): Power flow results for the
+                current timestep, a new one is created if not passed.
+        """
+        snapshot = PowerflowSnapshot() if snapshot is None else snapshot
         for obs in self.subscribers:
-            obs.compute()
+            obs.compute(snapshot)
+
+
+class ParquetStream:
+    """Class for appending chunks of timesteps to parquet file as row groups.
+
+    File is created with the schema of the first chunk once it is written,
+    later chunks must have the same columns.
+
+    Attributes:
+        file_path (Path): Path to parquet file.
+        n_rows (int): Number of rows written so far.
+    """
+
+    def __init__(self, file_path: Path, metadata: Dict[str, str] | None = None):
+        self.file_path = Path(file_path)
+        self.metadata = {key: str(value) for key, value in (metadata or {}).items()}
+        self.n_rows = 0
+        self._writer: pyarrow.parquet.ParquetWriter | None = None
+
+    def write(self, columns: Dict[str, np.ndarray | list]) -> None:
+        """Method to append chunk of equal length columns keyed by name."""
+        table = pyarrow.table(columns)
+        if self._writer is None:
+            schema = table.schema.with_metadata(self.metadata)
+            self._writer = pyarrow.parquet.ParquetWriter(
+                self.file_path, schema, compression="zstd"
+            )
+        self._writer.write_table(table.replace_schema_metadata(self.metadata))
+        self.n_rows += len(table)
+
+    def close(self) -> None:
+        """Method to finish writing the file, can be called more than once."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+EXPORT_EXTENSIONS = {
+    "csv": ".csv",
+    "parquet": ".parquet",
+    "arrow": ".arrow",
+    "feather": ".feather",
+    "npz": ".npz",
+}
+
+
+def export_metric(
+    observer: MetricObserver,
+    file_path: Path,
+    export_type: str = "csv",
+    metadata: Dict[str, str] | None = None,
+):
+    """Function to export metric of the observer in given format.
+
+    Parquet files are compressed with zstd. Arrow IPC (Feather v2) files
+    are left uncompressed so that columns can be memory mapped and npz
+    files store each column as its own array. Metadata e.g. scenario name
+    and simulation time window is stored in the schema of parquet and arrow
+    files and as `metadata` json string in npz files, csv files ignore it.
+
+    Args:
+        observer (MetricObserver): Observer whose metric is exported.
+        file_path (Path): Path to the exported file.
+        export_type (str): One of `EXPORT_EXTENSIONS` keys.
+        metadata (Dict[str, str] | None): Key value pairs stored along with metric.
+    """
+    if export_type not in EXPORT_EXTENSIONS:
+        raise ValueError(f"{export_type} is not one of {list(EXPORT_EXTENSIONS)}.")
+
+    df = polars.from_dict(observer.get_table())
+    metadata = {key: str(value) for key, value in (metadata or {}).items()}
+    if export_type == "csv":
+        df.write_csv(file_path)
+    elif export_type == "npz":
+        arrays = {
+            name: series.to_numpy().astype(str)
+            if series.dtype == polars.String
+            else series.to_numpy()
+            for name, series in df.to_dict().items()
+        }
+        np.savez(file_path, metadata=json.dumps(metadata), **arrays)
+    else:
+        table = df.to_arrow()
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+        if export_type == "parquet":
+            pyarrow.parquet.write_table(table, file_path, compression="zstd")
+        else:
+            pyarrow.feather.write_feather(table, file_path, compression="uncompressed")
+
+
+def export_metrics(
+    observers: Dict[str, MetricObserver],
+    export_path: Path,
+    export_types: Dict[str, str] | None = None,
+    metadata: Dict[str, str] | None = None,
+):
+    """Function to export metrics of observers named after their class.
+
+    Observers streaming their results already wrote them while simulating,
+    their files are only closed.
+
+    Args:
+        observers (Dict[str, MetricObserver]): Observers keyed by metric name.
+        export_path (Path): Folder to export metrics to.
+        export_types (Dict[str, str] | None): Export type keyed by metric
+            name, metrics not in it are exported as csv.
+        metadata (Dict[str, str] | None): Key value pairs stored along with metrics.
+    """
+    export_types = export_types or {}
+    for key, observer in observers.items():
+        if observer.is_streaming:
+            observer.close()
+            continue
+        export_type = export_types.get(key, "csv")
+        file_name = str(observer.__class__.__name__) + EXPORT_EXTENSIONS[export_type]
+        export_metric(observer, Path(export_path) / file_name, export_type, metadata)
+
+
+def stream_metrics(
+    observers: Dict[str, MetricObserver],
+    export_path: Path,
+    export_types: Dict[str, str],
+    memory_budget_mb: float,
+    metadata: Dict[str, str] | None = None,
+):
+    """Function to let observers exported as parquet stream results while simulating.
+
+    Memory budget is split evenly among observers exported as parquet that
+    can stream their results, their files are named like in `export_metrics`.
+
+    Args:
+        observers (Dict[str, MetricObserver]): Observers keyed by metric name.
+        export_path (Path): Folder to export metrics to.
+        export_types (Dict[str, str]): Export type keyed by metric name.
+        memory_budget_mb (float): Total memory in MB results are buffered in.
+        metadata (Dict[str, str] | None): Key value pairs stored along with metrics.
+    """
+    keys = [
+        key
+        for key, observer in observers.items()
+        if export_types.get(key) == "parquet" and observer.can_stream
+    ]
+    for key in keys:
+        observer = observers[key]
+        file_name = str(observer.__class__.__name__) + EXPORT_EXTENSIONS["parquet"]
+        observer.stream(Path(export_path) / file_name, memory_budget_mb / len(keys), metadata)
 
 
 def export_csv(observers: List[MetricObserver], export_path):
     for observer in observers:
-        df = polars.from_dict(observer.get_metric())
-        df.write_csv(export_path / (str(observer.__class__.__name__) + ".csv"))
+        export_metric(observer, export_path / (str(observer.__class__.__name__) + ".csv"))
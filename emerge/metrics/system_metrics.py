@@ -1,29 +1,12 @@
 """ Module for managing computation of system level metrics. """
-import networkx as nx
-import opendssdirect as odd
+import numpy as np
 import polars as pl
 
 from emerge.metrics import observer
-from emerge.simulator import powerflow_results
-from emerge.utils import dss_util
+from emerge.network import topology
+from emerge.simulator.feeder_metadata import get_feeder_metadata
+from emerge.simulator.powerflow_results import PowerflowSnapshot
 from emerge.metrics import data_model
-from emerge.network import asset_metrics
-
-
-def _get_unimpacted_buses(graph: nx.Graph, impacted_edges: list[str], source_bus: str):
-    """Internal function to return unimpacted buses."""
-
-    graph_copy = nx.Graph()
-    edge_to_be_removed = []
-    for edge in graph.edges():
-        graph_copy.add_edge(*edge)
-        edge_data = graph.get_edge_data(*edge)
-        if edge_data and "name" in edge_data and edge_data["name"] in impacted_edges:
-            edge_to_be_removed.append(edge)
-
-    graph_copy.remove_edges_from(edge_to_be_removed)
-    connected_buses = nx.node_connected_component(graph_copy, source_bus)
-    return connected_buses
 
 
 def _get_voltage_impacted_buses(voltage_df: pl.DataFrame, ov_th: float, uv_th: float) -> list[str]:
@@ -45,14 +28,16 @@ class TimeseriesTotalLoss(observer.MetricObserver):
         reactive_power (float): Time series reactive power
     """
 
+    required_results = ("losses",)
+
     def __init__(self):
         self.active_power = []
         self.reactive_power = []
 
-    def compute(self):
+    def compute(self, snapshot: PowerflowSnapshot):
         """Refer to base class for more details."""
-        timestep = odd.Solution.StepSize() / (3600)
-        sub_losses = odd.Circuit.Losses()
+        timestep = snapshot.timestep_hr
+        sub_losses = snapshot.losses
 
         self.active_power.append((sub_losses[0]) * timestep / 1000)
         self.reactive_power.append((sub_losses[1]) * timestep / 1000)
@@ -70,14 +55,16 @@ class TimeseriesTotalPower(observer.MetricObserver):
         reactive_power (float): Time series reactive power
     """
 
+    required_results = ("total_power",)
+
     def __init__(self):
         self.active_power = []
         self.reactive_power = []
 
-    def compute(self):
+    def compute(self, snapshot: PowerflowSnapshot):
         """Refer to base class for more details."""
-        timestep = odd.Solution.StepSize() / (3600)
-        sub_power = odd.Circuit.TotalPower()
+        timestep = snapshot.timestep_hr
+        sub_power = snapshot.total_power
 
         self.active_power.append((-sub_power[0]) * timestep / 1000)
         self.reactive_power.append((-sub_power[1]) * timestep / 1000)
@@ -95,21 +82,18 @@ class TimeseriesTotalPVPower(observer.MetricObserver):
         reactive_power (float): Time series reactive power
     """
 
+    required_results = ("pv_total_power",)
+
     def __init__(self):
         self.active_power = []
         self.reactive_power = []
 
-    def compute(self):
+    def compute(self, snapshot: PowerflowSnapshot):
         """Refer to base class for more details."""
-        timestep = odd.Solution.StepSize() / (3600)
-        pv_df = powerflow_results.get_pv_power_dataframe()
-        if not pv_df.empty:
-            pv_power = pv_df.sum().to_dict()
-            self.active_power.append(pv_power["active_power"] * timestep / 1000)
-            self.reactive_power.append(pv_power["reactive_power"] * timestep / 1000)
-        else:
-            self.active_power.append(0)
-            self.reactive_power.append(0)
+        timestep = snapshot.timestep_hr
+        pv_power = snapshot.pv_total_power
+        self.active_power.append(float(pv_power[0]) * timestep / 1000)
+        self.reactive_power.append(float(pv_power[1]) * timestep / 1000)
 
     def get_metric(self):
         """Refer to base class for more details."""
@@ -123,13 +107,15 @@ class TotalLossEnergy(observer.MetricObserver):
         total_loss (float): Store for total energy
     """
 
+    required_results = ("losses",)
+
     def __init__(self):
         self.total_loss = {"active_power": 0, "reactive_power": 0}
 
-    def compute(self):
+    def compute(self, snapshot: PowerflowSnapshot):
         """Refer to base class for more details."""
-        timestep = odd.Solution.StepSize() / (3600)
-        sub_losses = odd.Circuit.Losses()
+        timestep = snapshot.timestep_hr
+        sub_losses = snapshot.losses
 
         self.total_loss["active_power"] += (sub_losses[0]) * timestep / 1000000
         self.total_loss["reactive_power"] += (sub_losses[1]) * timestep / 1000000
@@ -146,15 +132,17 @@ class TotalEnergy(observer.MetricObserver):
         total_energy (float): Store for total energy
     """
 
+    required_results = ("total_power",)
+
     def __init__(self, export_only: bool = False, import_only: bool = False):
         self.total_energy = {"active_power": 0, "reactive_power": 0}
         self.export_only = export_only
         self.import_only = import_only
 
-    def compute(self):
+    def compute(self, snapshot: PowerflowSnapshot):
         """Refer to base class for more details."""
-        timestep = odd.Solution.StepSize() / (3600)
-        sub_power = odd.Circuit.TotalPower()
+        timestep = snapshot.timestep_hr
+        sub_power = snapshot.total_power
 
         if self.export_only and not self.import_only and sub_power[0] < 0:
             return
@@ -177,17 +165,17 @@ class TotalPVGeneration(observer.MetricObserver):
         pv_energy (float): Store for total energy
     """
 
+    required_results = ("pv_total_power",)
+
     def __init__(self):
         self.pv_energy = {"active_power": 0, "reactive_power": 0}
 
-    def compute(self):
+    def compute(self, snapshot: PowerflowSnapshot):
         """Refer to base class for more details."""
-        timestep = odd.Solution.StepSize() / (3600)
-        pv_df = powerflow_results.get_pv_power_dataframe()
-        if not pv_df.empty:
-            pv_power = pv_df.sum().to_dict()
-            self.pv_energy["active_power"] += pv_power["active_power"] * timestep / 1000
-            self.pv_energy["reactive_power"] += pv_power["reactive_power"] * timestep / 1000
+        timestep = snapshot.timestep_hr
+        pv_power = snapshot.pv_total_power
+        self.pv_energy["active_power"] += float(pv_power[0]) * timestep / 1000
+        self.pv_energy["reactive_power"] += float(pv_power[1]) * timestep / 1000
 
     def get_metric(self):
         """Refer to base class for more details."""
@@ -203,10 +191,12 @@ class SARDI_aggregated(observer.MetricObserver):
         sardi_transformer (float): SARDI_line metric
         counter (int): Counter for keeping track how number
             of times compute function is called
-        network (nx.Graph): Networkx graph representing
-            distribution network
+        topology (RadialTopology): Index for finding buses downstream
+            of overloaded branches
     """
 
+    required_results = ("voltages", "loadings")
+
     def __init__(self, loading_limit: float = 1.0, voltage_limit: dict | None = None):
         """Constructor for `SARDI_line` class.
 
@@ -226,22 +216,26 @@ class SARDI_aggregated(observer.MetricObserver):
         self.sardi_aggregated = 0
         self.counter = 0
 
-    def _get_initial_dataset(self):
-        """Get initial dataset for computing the metric."""
-        self.network = asset_metrics.networkx_from_opendss_model()
-        self.load_bus_map = dss_util.get_bus_load_dataframe().set_index("busname")
-        self.substation_bus = dss_util.get_source_node()
-        self.bus_load_flag_df = dss_util.get_bus_load_flag()
+    def _get_initial_dataset(self, branches: list[str]):
+        """Get initial dataset for computing the metric.
 
-    def compute(self):
+        Branch names keep OpenDSS class case e.g. `Line.` while topology
+        edges are lower case, so branches are mapped to edges once.
+        """
+        feeder = get_feeder_metadata()
+        self.topology = feeder.topology
+        self._edges = np.array([branch.lower() for branch in branches], dtype=object)
+        self.bus_load_counts = feeder.bus_load_counts
+        self.load_prefix_sums = self.topology.get_prefix_sums(self.bus_load_counts)
+        self.total_load = len(feeder.load_table)
+
+    def compute(self, snapshot: PowerflowSnapshot):
         """Refer to base class for more details."""
 
-        # Get line loading dataframe
-        line_loading_df = powerflow_results.get_loading_dataframe()
-        voltage_df = powerflow_results.get_voltage_dataframe()
+        voltage_df = snapshot.voltage_dataframe
 
         if not self.counter:
-            self._get_initial_dataset()
+            self._get_initial_dataset(snapshot.branches)
 
         bus_with_voltage_violations = _get_voltage_impacted_buses(
             voltage_df,
@@ -249,25 +243,20 @@ class SARDI_aggregated(observer.MetricObserver):
             self.voltage_limit.undervoltage_threshold,
         )
 
-        overloaded_branches = line_loading_df.filter(
-            pl.col("loading(pu)") > self.loading_limit.threshold
-        )["branch"].to_list()
-        total_impacted_load_buses = bus_with_voltage_violations
-        if overloaded_branches:
-            connected_buses = _get_unimpacted_buses(
-                self.network, overloaded_branches, self.substation_bus
-            )
-            impacted_buses = self.bus_load_flag_df.loc[
-                self.bus_load_flag_df.index.difference(connected_buses)
-            ]
-            impacted_load_buses = set(impacted_buses[impacted_buses["is_load"] == 1].index)
-            total_impacted_load_buses = impacted_load_buses.union(bus_with_voltage_violations)
-
-        total_load = odd.Loads.Count()
-        affected_loads = list(
-            set(self.load_bus_map.loc[list(total_impacted_load_buses)]["loadname"])
+        overloaded_branches = np.flatnonzero(snapshot.loadings > self.loading_limit.threshold)
+        disconnected = self.topology.get_disconnected_intervals(self._edges[overloaded_branches])
+        affected_loads = topology.get_interval_sums(self.load_prefix_sums, disconnected)
+
+        # Loads on buses with voltage violations not already disconnected
+        voltage_buses = np.array(
+            [self.topology.bus_index[bus] for bus in bus_with_voltage_violations], dtype=int
         )
-        self.sardi_aggregated += len(affected_loads) * 100 / total_load
+        is_disconnected = topology.get_interval_mask(
+            self.topology.positions[voltage_buses], disconnected
+        )
+        affected_loads += self.bus_load_counts[voltage_buses[~is_disconnected]].sum()
+
+        self.sardi_aggregated += affected_loads * 100 / self.total_load
         self.counter += 1
 
     def get_metric(self):
@@ -286,10 +275,12 @@ class SARDI_line(observer.MetricObserver):
         sardi_line (float): SARDI_line metric
         counter (int): Counter for keeping track how number
             of times compute function is called
-        network (nx.Graph): Networkx graph representing
-            distribution network
+        topology (RadialTopology): Index for finding buses downstream
+            of overloaded branches
     """
 
+    required_results = ("loadings",)
+
     def __init__(self, loading_limit: float = 1.0):
         """Constructor for `SARDI_line` class.
 
@@ -302,37 +293,26 @@ class SARDI_line(observer.MetricObserver):
         self.sardi_line = 0
         self.counter = 0
 
-    def _get_initial_dataset(self):
-        """Get initial dataset for computing the metric."""
-        self.network = asset_metrics.networkx_from_opendss_model()
-        self.substation_bus = dss_util.get_source_node()
-        self.bus_load_flag_df = dss_util.get_bus_load_flag()
-        self.load_bus_map = dss_util.get_bus_load_dataframe().set_index("busname")
+    def _get_initial_dataset(self, branches: list[str]):
+        """Get initial dataset for computing the metric, see `SARDI_aggregated`."""
+        feeder = get_feeder_metadata()
+        self.topology = feeder.topology
+        self._edges = np.array([branch.lower() for branch in branches], dtype=object)
+        self.load_prefix_sums = self.topology.get_prefix_sums(feeder.bus_load_counts)
+        self.total_load = len(feeder.load_table)
 
-    def compute(self):
+    def compute(self, snapshot: PowerflowSnapshot):
         """Refer to base class for more details."""
 
-        # Get line loading dataframe
-        line_loading_df = powerflow_results.get_loading_dataframe()
-
         if not self.counter:
-            self._get_initial_dataset()
-
-        overloaded_lines = line_loading_df.filter(
-            pl.col("loading(pu)") > self.loading_limit.threshold
-        )["branch"].to_list()
-
-        if overloaded_lines:
-            connected_buses = _get_unimpacted_buses(
-                self.network, overloaded_lines, self.substation_bus
-            )
-            impacted_buses = self.bus_load_flag_df.loc[
-                self.bus_load_flag_df.index.difference(connected_buses)
-            ]
-            impacted_load_buses = impacted_buses[impacted_buses["is_load"] == 1].index
-            affected_loads = set(list(self.load_bus_map.loc[impacted_load_buses]["loadname"]))
-            total_load = odd.Loads.Count()
-            self.sardi_line += len(affected_loads) * 100 / total_load
+            self._get_initial_dataset(snapshot.branches)
+
+        overloaded_lines = np.flatnonzero(snapshot.loadings > self.loading_limit.threshold)
+
+        if len(overloaded_lines):
+            disconnected = self.topology.get_disconnected_intervals(self._edges[overloaded_lines])
+            affected_loads = topology.get_interval_sums(self.load_prefix_sums, disconnected)
+            self.sardi_line += affected_loads * 100 / self.total_load
 
         self.counter += 1
 
@@ -354,6 +334,8 @@ class SARDI_voltage(observer.MetricObserver):
             between bus and load
     """
 
+    required_results = ("voltages",)
+
     def __init__(self, upper_threshold: float = 1.05, lower_threshold: float = 0.95):
         """Constructor for SARDI_voltage metric.
 
@@ -367,14 +349,14 @@ class SARDI_voltage(observer.MetricObserver):
         self.sardi_voltage = 0
         self.counter = 0
 
-    def compute(self):
+    def compute(self, snapshot: PowerflowSnapshot):
         """Refer to base class for more details."""
 
         # Get voltage dataframe and load bus mapper
-        voltage_df = powerflow_results.get_voltage_dataframe()
+        voltage_df = snapshot.voltage_dataframe
 
         if not hasattr(self, "load_bus_map"):
-            self.load_bus_map = dss_util.get_bus_load_dataframe().set_index("busname")
+            self.load_bus_map = get_feeder_metadata().load_bus_map
 
         # Filter voltages for load buses only
         # and count the number of overvoltages and undervoltages
@@ -12,6 +12,7 @@ from emerge.network.data_model import (
     RegulatorsAssetMetrics,
     TransformersAssetMetrics,
 )
+from emerge.network.topology import FeederGraph
 
 
 def opendss_load_metrics_extractor():
@@ -84,44 +85,7 @@ def opendss_transformers_metrics_extractor():
 
 def networkx_from_opendss_model():
     """Let's create a networkx representation of the model"""
-    network = nx.Graph()
-
-    """ Let's add all buses """
-    for bus in odd.Circuit.AllBusNames():
-        odd.Circuit.SetActiveBus(bus)
-        network.add_node(bus, pos=(odd.Bus.X(), odd.Bus.Y()))
-
-    UNIT_MAPPER = {
-        0: 0,
-        1: 1.60934,
-        2: 0.3048,
-        3: 1,
-        4: 0.001,
-        5: 0.0003048,
-        6: 0.0000254,
-        7: 0.00001,
-    }
-
-    """ Let's all line elements to the network """
-
-    for edge_name in ["Line", "Transformer"]:
-        odd.Circuit.SetActiveClass(edge_name)
-        flag = odd.ActiveClass.First()
-        while flag > 0:
-            name = odd.CktElement.Name().lower()
-            buses = odd.CktElement.BusNames()
-            edge_length = (
-                0
-                if edge_name == "Transformer"
-                else UNIT_MAPPER[odd.Lines.Units()] * odd.Lines.Length()
-            )
-
-            network.add_edge(
-                buses[0].split(".")[0], buses[1].split(".")[0], name=name, length=edge_length
-            )
-            flag = odd.ActiveClass.Next()
-
-    return network
+    return FeederGraph.from_opendss().to_networkx()
 
 
 def get_all_kv_levels():
@@ -0,0 +1,152 @@
+""" Module for extracting columnar tables of circuit elements in bulk.
+
+Each table is extracted with whole circuit array getters where OpenDSS
+provides them and otherwise a single walk over the elements of the class,
+so callers needing several attributes of buses or loads share one
+extraction instead of each walking the circuit on their own.
+"""
+
+import numpy as np
+import opendssdirect as odd
+import pandas as pd
+
+# Factors converting OpenDSS length units to km, indexed by unit code.
+LENGTH_UNITS_TO_KM = {
+    0: 0,
+    1: 1.60934,
+    2: 0.3048,
+    3: 1,
+    4: 0.001,
+    5: 0.0003048,
+    6: 0.0000254,
+    7: 0.00001,
+}
+
+
+def get_bus_table() -> pd.DataFrame:
+    """Function to extract coordinates and distance of all buses.
+
+    Returns
+    -------
+        pd.DataFrame: Dataframe containing `x`, `y` and `distance`
+            from the energy meter indexed by bus name.
+    """
+    buses = odd.Circuit.AllBusNames()
+    coordinates = np.empty((len(buses), 2))
+    for id in range(len(buses)):
+        odd.Circuit.SetActiveBusi(id)
+        coordinates[id] = odd.Bus.X(), odd.Bus.Y()
+
+    return pd.DataFrame(
+        {
+            "x": coordinates[:, 0],
+            "y": coordinates[:, 1],
+            "distance": np.asarray(odd.Circuit.AllBusDistances(), dtype=float),
+        },
+        index=pd.Index(buses, name="busname"),
+    )
+
+
+def get_load_table() -> pd.DataFrame:
+    """Function to extract attributes of all loads.
+
+    Returns
+    -------
+        pd.DataFrame: Dataframe containing `bus` with nodes, `busname`,
+            `phases`, `kv`, `kw`, `kvar`, `yearly`, `class` and `customers`
+            indexed by load name e.g. `Load.x`.
+    """
+    loads = {
+        key: []
+        for key in [
+            "name",
+            "bus",
+            "phases",
+            "kv",
+            "kw",
+            "kvar",
+            "yearly",
+            "class",
+            "customers",
+        ]
+    }
+    flag = odd.Loads.First()
+    while flag:
+        loads["name"].append(odd.CktElement.Name())
+        loads["bus"].append(odd.CktElement.BusNames()[0])
+        loads["phases"].append(odd.Loads.Phases())
+        loads["kv"].append(odd.Loads.kV())
+        loads["kw"].append(odd.Loads.kW())
+        loads["kvar"].append(odd.Loads.kvar())
+        loads["yearly"].append(odd.Loads.Yearly())
+        loads["class"].append(odd.Loads.Class())
+        loads["customers"].append(odd.Loads.NumCust())
+        flag = odd.Loads.Next()
+
+    loads["busname"] = [bus.split(".")[0] for bus in loads["bus"]]
+    return pd.DataFrame(loads).set_index("name")
+
+
+def get_line_table() -> pd.DataFrame:
+    """Function to extract attributes of all lines.
+
+    Returns
+    -------
+        pd.DataFrame: Dataframe containing `bus1`, `bus2` without nodes,
+            `length` in km and `total_customers` downward of the line
+            indexed by line name e.g. `Line.x`.
+    """
+    lines = {key: [] for key in ["name", "bus1", "bus2", "length", "total_customers"]}
+    flag = odd.Lines.First()
+    while flag:
+        buses = odd.CktElement.BusNames()
+        lines["name"].append(odd.CktElement.Name())
+        lines["bus1"].append(buses[0].split(".")[0])
+        lines["bus2"].append(buses[1].split(".")[0])
+        lines["length"].append(LENGTH_UNITS_TO_KM[odd.Lines.Units()] * odd.Lines.Length())
+        lines["total_customers"].append(odd.Lines.TotalCust())
+        flag = odd.Lines.Next()
+
+    return pd.DataFrame(lines).set_index("name")
+
+
+def get_transformer_table() -> pd.DataFrame:
+    """Function to extract attributes of all transformers.
+
+    Returns
+    -------
+        pd.DataFrame: Dataframe containing `bus1`, `bus2` without nodes
+            and `kva` indexed by transformer name e.g. `Transformer.x`.
+    """
+    transformers = {key: [] for key in ["name", "bus1", "bus2", "kva"]}
+    flag = odd.Transformers.First()
+    while flag:
+        buses = odd.CktElement.BusNames()
+        transformers["name"].append(odd.CktElement.Name())
+        transformers["bus1"].append(buses[0].split(".")[0])
+        transformers["bus2"].append(buses[1].split(".")[0])
+        transformers["kva"].append(odd.Transformers.kVA())
+        flag = odd.Transformers.Next()
+
+    return pd.DataFrame(transformers).set_index("name")
+
+
+def get_pv_table() -> pd.DataFrame:
+    """Function to extract attributes of all pv systems.
+
+    Returns
+    -------
+        pd.DataFrame: Dataframe containing `bus` with nodes, `busname`,
+            `pmpp` and `kva` indexed by pv system name e.g. `PVSystem.x`.
+    """
+    pvs = {key: [] for key in ["name", "bus", "pmpp", "kva"]}
+    flag = odd.PVsystems.First()
+    while flag:
+        pvs["name"].append(odd.CktElement.Name())
+        pvs["bus"].append(odd.CktElement.BusNames()[0])
+        pvs["pmpp"].append(odd.PVsystems.Pmpp())
+        pvs["kva"].append(odd.PVsystems.kVARated())
+        flag = odd.PVsystems.Next()
+
+    pvs["busname"] = [bus.split(".")[0] for bus in pvs["bus"]]
+    return pd.DataFrame(pvs).set_index("name")
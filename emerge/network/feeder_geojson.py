@@ -4,6 +4,7 @@ Create a geoJSON for a feeder model
 
 from pathlib import Path
 
+from emerge.network import circuit_tables
 from emerge.utils.util import validate_path, write_file
 
 
@@ -13,116 +14,85 @@ def create_feeder_geojson(dss_instance, output_folder):
     validate_path(output_folder)
 
     # Let's get all the buses
-    bus_geojson = {"type": "FeatureCollection", "features": []}
-
-    # Get all the busnames, loop over them and find the
-    # x,y coordinates
-    all_buses = dss_instance.Circuit.AllBusNames()
-    bus_coord_dict = {}
-    for bus in all_buses:
-        dss_instance.Circuit.SetActiveBus(bus)
-
-        x, y = dss_instance.Bus.X(), dss_instance.Bus.Y()
-        bus_coord_dict[bus] = {"longitude": x, "latitude": y}
-
-        bus_geojson["features"].append(
+    bus_df = circuit_tables.get_bus_table()
+    bus_coords = dict(zip(bus_df.index, bus_df[["x", "y"]].to_numpy().tolist()))
+    bus_geojson = {
+        "type": "FeatureCollection",
+        "features": [
             {
                 "type": "Feature",
-                "geometry": {"type": "Point", "coordinates": [x, y]},
+                "geometry": {"type": "Point", "coordinates": coords},
                 "properties": {"name": bus},
             }
-        )
+            for bus, coords in bus_coords.items()
+        ],
+    }
     write_file(bus_geojson, output_folder / "buses.json")
 
     # Get all the line sections
-    lines_geojson = {"type": "FeatureCollection", "features": []}
-    flag = dss_instance.Lines.First()
-    while flag:
-        line_name = dss_instance.Lines.Name()
-        bus1, bus2 = (
-            dss_instance.Lines.Bus1().split(".")[0],
-            dss_instance.Lines.Bus2().split(".")[0],
-        )
-        n_customers = dss_instance.Lines.TotalCust()
-        lines_geojson["features"].append(
+    line_df = circuit_tables.get_line_table()
+    lines_geojson = {
+        "type": "FeatureCollection",
+        "features": [
             {
                 "type": "Feature",
                 "geometry": {
                     "type": "LineString",
-                    "coordinates": [
-                        [bus_coord_dict[bus1]["longitude"], bus_coord_dict[bus1]["latitude"]],
-                        [bus_coord_dict[bus2]["longitude"], bus_coord_dict[bus2]["latitude"]],
-                    ],
+                    "coordinates": [bus_coords[bus1], bus_coords[bus2]],
                     "properties": {
-                        "name": line_name,
+                        "name": name.split(".", 1)[1],
                         "n_customers": n_customers,
                         "bus1": bus1,
                         "bus2": bus2,
                     },
                 },
             }
-        )
-
-        flag = dss_instance.Lines.Next()
-
+            for name, bus1, bus2, n_customers in zip(
+                line_df.index,
+                line_df["bus1"],
+                line_df["bus2"],
+                line_df["total_customers"].tolist(),
+            )
+        ],
+    }
     write_file(lines_geojson, output_folder / "lines.json")
 
     # Get all transformers
-    transformer_geojson = {"type": "FeatureCollection", "features": []}
-    flag = dss_instance.Transformers.First()
-    while flag:
-        transformer_name = dss_instance.CktElement.Name()
-        bus1, bus2 = dss_instance.CktElement.BusNames()[:2]
-        bus1, bus2 = bus1.split(".")[0], bus2.split(".")[0]
-        transformer_geojson["features"].append(
+    xfmr_df = circuit_tables.get_transformer_table()
+    transformer_geojson = {
+        "type": "FeatureCollection",
+        "features": [
             {
                 "type": "Feature",
                 "geometry": {
                     "type": "Point",
-                    "coordinates": [
-                        bus_coord_dict[bus1]["longitude"],
-                        bus_coord_dict[bus1]["latitude"],
-                    ],
-                    "properties": {
-                        "name": transformer_name,
-                        "bus1": bus1,
-                        "bus2": bus2,
-                        "kva": dss_instance.Transformers.kVA(),
-                    },
+                    "coordinates": bus_coords[bus1],
+                    "properties": {"name": name, "bus1": bus1, "bus2": bus2, "kva": kva},
                 },
             }
-        )
-
-        flag = dss_instance.Transformers.Next()
-
+            for name, bus1, bus2, kva in zip(
+                xfmr_df.index, xfmr_df["bus1"], xfmr_df["bus2"], xfmr_df["kva"].tolist()
+            )
+        ],
+    }
     write_file(transformer_geojson, output_folder / "transformers.json")
 
     # Get all loads
-    load_geojson = {"type": "FeatureCollection", "features": []}
-    flag = dss_instance.Loads.First()
-    while flag:
-        load_name = dss_instance.CktElement.Name()
-        bus1 = dss_instance.CktElement.BusNames()[0]
-        bus1 = bus1.split(".")[0]
-        load_geojson["features"].append(
+    load_df = circuit_tables.get_load_table()
+    load_geojson = {
+        "type": "FeatureCollection",
+        "features": [
             {
                 "type": "Feature",
                 "geometry": {
                     "type": "Point",
-                    "coordinates": [
-                        bus_coord_dict[bus1]["longitude"],
-                        bus_coord_dict[bus1]["latitude"],
-                    ],
-                    "properties": {
-                        "name": load_name,
-                        "bus": bus1,
-                        "kw": dss_instance.Loads.kW(),
-                        "kvar": dss_instance.Loads.kvar(),
-                    },
+                    "coordinates": bus_coords[bus],
+                    "properties": {"name": name, "bus": bus, "kw": kw, "kvar": kvar},
                 },
             }
-        )
-
-        flag = dss_instance.Loads.Next()
-
+            for name, bus, kw, kvar in zip(
+                load_df.index, load_df["busname"], load_df["kw"].tolist(), load_df["kvar"].tolist()
+            )
+        ],
+    }
     write_file(load_geojson, output_folder / "loads.json")
@@ -0,0 +1,412 @@
+""" Module for indexing feeder topology to find buses downstream of branches. """
+
+from typing import Iterable
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from emerge.network import circuit_tables
+
+
+def _merge_intervals(starts: np.ndarray, ends: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Internal function to merge half open intervals into sorted disjoint ones."""
+    if not len(starts):
+        return starts, ends
+    order = np.argsort(starts, kind="stable")
+    starts, ends = starts[order], np.maximum.accumulate(ends[order])
+    is_new = np.r_[True, starts[1:] > ends[:-1]]
+    last = np.r_[np.flatnonzero(is_new)[1:] - 1, len(starts) - 1]
+    return starts[is_new], ends[last]
+
+
+def get_interval_sums(
+    prefix_sums: np.ndarray, intervals: tuple[np.ndarray, np.ndarray]
+) -> float:
+    """Function to sum values over disjoint intervals of positions.
+
+    Args:
+        prefix_sums (np.ndarray): Cumulative sums of values ordered by position
+            starting with zero, see `RadialTopology.get_prefix_sums`.
+        intervals (tuple[np.ndarray, np.ndarray]): Start and end positions.
+    """
+    starts, ends = intervals
+    return float((prefix_sums[ends] - prefix_sums[starts]).sum())
+
+
+def get_interval_mask(
+    positions: np.ndarray, intervals: tuple[np.ndarray, np.ndarray]
+) -> np.ndarray:
+    """Function to flag positions falling inside disjoint sorted intervals."""
+    starts, ends = intervals
+    interval = np.searchsorted(starts, positions, side="right") - 1
+    return (interval >= 0) & (positions < ends[np.maximum(interval, 0)])
+
+
+def _get_csr_offsets(indptr: np.ndarray, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Internal function to return offsets of all entries of CSR rows along with their counts."""
+    starts = indptr[rows]
+    counts = indptr[rows + 1] - starts
+    bases = np.repeat(starts - np.r_[0, np.cumsum(counts)[:-1]], counts)
+    return bases + np.arange(counts.sum()), counts
+
+
+class FeederGraph:
+    """Class for compact array representation of the feeder graph.
+
+    Buses and branches (lines and transformers) are numbered with integer
+    ids and adjacency is stored in compressed sparse row (CSR) arrays where
+    neighbors of bus `i` are `indices[indptr[i]:indptr[i + 1]]` connected
+    through branches `branch_ids[indptr[i]:indptr[i + 1]]`. Like networkx
+    graph of the feeder, parallel branches between same buses are collapsed
+    into the last one of them.
+
+    Attributes:
+        buses (list[str]): Bus names, bus id refers to this list.
+        bus_index (dict[str, int]): Mapping from bus name to bus id.
+        coordinates (np.ndarray): (buses x 2) array of bus x and y coordinates.
+        branches (list[str]): Branch names, branch id refers to this list.
+        branch_buses (np.ndarray): (branches x 2) array of from and to bus ids.
+        lengths (np.ndarray): Length of each branch in km.
+        indptr (np.ndarray): Offsets of each bus into `indices` and `branch_ids`.
+        indices (np.ndarray): Neighbor bus ids.
+        branch_ids (np.ndarray): Branch id connecting to each neighbor.
+    """
+
+    def __init__(
+        self,
+        buses: list[str],
+        coordinates: np.ndarray,
+        branches: list[str],
+        branch_buses: np.ndarray,
+        lengths: np.ndarray,
+    ):
+        """Constructor for `FeederGraph` class.
+
+        Args:
+            buses (list[str]): Bus names.
+            coordinates (np.ndarray): (buses x 2) array of bus coordinates.
+            branches (list[str]): Branch names.
+            branch_buses (np.ndarray): (branches x 2) array of from and to bus ids.
+            lengths (np.ndarray): Length of each branch in km.
+        """
+        self.buses = list(buses)
+        self.bus_index = {bus: id for id, bus in enumerate(self.buses)}
+        self.coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+        self.branches = list(branches)
+        self.branch_buses = np.asarray(branch_buses, dtype=np.int64).reshape(-1, 2)
+        self.lengths = np.asarray(lengths, dtype=float)
+
+        n_branches = len(self.branches)
+        ends = self.branch_buses.T.ravel()
+        neighbors = self.branch_buses[:, ::-1].T.ravel()
+        branch_ids = np.tile(np.arange(n_branches), 2)
+        order = np.lexsort((branch_ids, ends))
+        self.indptr = np.r_[0, np.cumsum(np.bincount(ends, minlength=len(self.buses)))]
+        self.indices = neighbors[order]
+        self.branch_ids = branch_ids[order]
+
+    @classmethod
+    def from_edges(
+        cls,
+        buses: list[str],
+        coordinates: list[tuple[float, float]],
+        edges: Iterable[tuple[str, str, str, float]],
+    ) -> "FeederGraph":
+        """Method to build graph from buses and (from bus, to bus, name, length) edges.
+
+        Buses only referred to by edges are added after `buses` and parallel
+        edges are collapsed into the last one of them keeping position of the first.
+        """
+        buses, coordinates = list(buses), list(coordinates)
+        bus_index = {bus: id for id, bus in enumerate(buses)}
+        edge_index: dict[tuple[int, int], int] = {}
+        branches, branch_buses, lengths = [], [], []
+        for from_bus, to_bus, name, length in edges:
+            for bus in (from_bus, to_bus):
+                if bus not in bus_index:
+                    bus_index[bus] = len(buses)
+                    buses.append(bus)
+                    coordinates.append((np.nan, np.nan))
+            ids = (bus_index[from_bus], bus_index[to_bus])
+            key = (min(ids), max(ids))
+            if key in edge_index:
+                branches[edge_index[key]] = name
+                lengths[edge_index[key]] = length
+                continue
+            edge_index[key] = len(branches)
+            branches.append(name)
+            branch_buses.append(ids)
+            lengths.append(length)
+        return cls(buses, coordinates, branches, branch_buses, lengths)
+
+    @classmethod
+    def from_opendss(cls, bus_df: pd.DataFrame | None = None) -> "FeederGraph":
+        """Method to build graph of lines and transformers of the active circuit.
+
+        Args:
+            bus_df (pd.DataFrame | None): Already extracted output of
+                `circuit_tables.get_bus_table`, extracted again if not passed.
+        """
+        bus_df = circuit_tables.get_bus_table() if bus_df is None else bus_df
+        line_df = circuit_tables.get_line_table()
+        xfmr_df = circuit_tables.get_transformer_table()
+        edges = [
+            (bus1, bus2, name.lower(), length)
+            for name, bus1, bus2, length in zip(
+                line_df.index, line_df["bus1"], line_df["bus2"], line_df["length"].tolist()
+            )
+        ]
+        edges += [
+            (bus1, bus2, name.lower(), 0)
+            for name, bus1, bus2 in zip(xfmr_df.index, xfmr_df["bus1"], xfmr_df["bus2"])
+        ]
+        return cls.from_edges(list(bus_df.index), bus_df[["x", "y"]].to_numpy().tolist(), edges)
+
+    @classmethod
+    def from_networkx(cls, network: nx.Graph) -> "FeederGraph":
+        """Method to build graph from networkx graph with optional `pos`,
+        `name` and `length` attributes."""
+        buses = list(network.nodes)
+        coordinates = [pos for _, pos in network.nodes(data="pos", default=(np.nan, np.nan))]
+        edges = [
+            (u, v, data.get("name"), data.get("length", 0))
+            for u, v, data in network.edges(data=True)
+        ]
+        return cls.from_edges(buses, coordinates, edges)
+
+    def to_networkx(self) -> nx.Graph:
+        """Method to export the graph as networkx graph with `pos` node
+        attribute and `name` and `length` edge attributes.
+
+        Buses without coordinates e.g. the ones only referred to by
+        branches have no `pos` attribute.
+        """
+        network = nx.Graph()
+        network.add_nodes_from(
+            (bus, {"pos": tuple(pos)} if not np.isnan(pos).any() else {})
+            for bus, pos in zip(self.buses, self.coordinates.tolist())
+        )
+        network.add_edges_from(
+            (self.buses[u], self.buses[v], {"name": name, "length": length})
+            for (u, v), name, length in zip(
+                self.branch_buses.tolist(), self.branches, self.lengths.tolist()
+            )
+        )
+        return network
+
+    def bfs(
+        self, source: int, removed_branches: np.ndarray | None = None
+    ) -> tuple[list[np.ndarray], np.ndarray, np.ndarray]:
+        """Method to traverse the graph breadth first from the source bus.
+
+        All buses of a level are expanded at once by gathering their CSR rows,
+        so the number of python iterations equals depth of the tree.
+
+        Args:
+            source (int): Id of the source bus.
+            removed_branches (np.ndarray | None): Boolean mask of branches
+                to skip while traversing.
+
+        Returns:
+            tuple[list[np.ndarray], np.ndarray, np.ndarray]: Bus ids of each
+                level in BFS order, parent bus id and branch id connecting to
+                the parent for each bus, -1 for the source and unreached buses.
+        """
+        parents = np.full(len(self.buses), -1)
+        parent_branches = np.full(len(self.buses), -1)
+        visited = np.zeros(len(self.buses), dtype=bool)
+        visited[source] = True
+        levels = [np.array([source])]
+        while True:
+            offsets, counts = _get_csr_offsets(self.indptr, levels[-1])
+            neighbors, branches = self.indices[offsets], self.branch_ids[offsets]
+            sources = np.repeat(levels[-1], counts)
+            keep = ~visited[neighbors]
+            if removed_branches is not None:
+                keep &= ~removed_branches[branches]
+            if not keep.any():
+                return levels, parents, parent_branches
+
+            neighbors, branches, sources = neighbors[keep], branches[keep], sources[keep]
+            # Bus reached from several buses of the level keeps the first of them.
+            first = np.sort(np.unique(neighbors, return_index=True)[1])
+            level = neighbors[first]
+            visited[level] = True
+            parents[level] = sources[first]
+            parent_branches[level] = branches[first]
+            levels.append(level)
+
+
+class RadialTopology:
+    """Class for finding buses disconnected from the source by removing branches.
+
+    A BFS tree rooted at the source bus is built once and buses are numbered
+    in depth first order so that the buses downstream of any branch occupy a
+    contiguous interval of positions (Euler tour). Buses disconnected by a set
+    of branches are then union of the intervals of those branches, costing
+    O(branches) instead of traversing the network. Buses not connected to the
+    source occupy the positions after the tree and are disconnected whenever
+    any branch is removed. Meshed networks fall back to traversing the graph
+    without the removed branches.
+
+    Attributes:
+        graph (FeederGraph): Compact graph of the feeder.
+        buses (list[str]): Bus names, bus index refers to this list.
+        bus_index (dict[str, int]): Mapping from bus name to bus index.
+        bfs_order (np.ndarray): Index of buses connected to the source in BFS order.
+        parents (np.ndarray): Parent bus index of each bus, -1 for the source
+            and buses not connected to it.
+        parent_branches (np.ndarray): Branch id connecting each bus to its parent.
+        depths (np.ndarray): Number of branches between each bus and the source.
+        order (np.ndarray): Bus index at each position.
+        positions (np.ndarray): Position of each bus.
+        is_radial (bool): Whether buses connected to the source form a tree.
+    """
+
+    def __init__(self, graph: FeederGraph | nx.Graph, source_bus: str):
+        """Constructor for `RadialTopology` class.
+
+        Args:
+            graph (FeederGraph | nx.Graph): Graph of buses, networkx graph
+                should store branch name in `name` edge attribute.
+            source_bus (str): Name of the source bus.
+        """
+        if isinstance(graph, nx.Graph):
+            graph = FeederGraph.from_networkx(graph)
+        self.graph = graph
+        self.source_bus = source_bus
+        self.buses = graph.buses
+        self.bus_index = graph.bus_index
+        n_buses = len(self.buses)
+
+        levels, self.parents, self.parent_branches = graph.bfs(self.bus_index[source_bus])
+        self.bfs_order = np.concatenate(levels)
+        self._n_connected = len(self.bfs_order)
+        self.depths = np.full(n_buses, -1)
+        for depth, level in enumerate(levels):
+            self.depths[level] = depth
+
+        subtree_sizes = np.ones(n_buses, dtype=int)
+        for level in reversed(levels[1:]):
+            np.add.at(subtree_sizes, self.parents[level], subtree_sizes[level])
+
+        # Children of a level are grouped by parent, each child is placed
+        # after its parent and the subtrees of its preceding siblings.
+        self.positions = np.empty(n_buses, dtype=int)
+        self.positions[levels[0]] = 0
+        for level in levels[1:]:
+            parents, sizes = self.parents[level], subtree_sizes[level]
+            preceding = np.cumsum(sizes) - sizes
+            is_first = np.r_[True, parents[1:] != parents[:-1]]
+            first = np.maximum.accumulate(np.where(is_first, np.arange(len(level)), 0))
+            self.positions[level] = self.positions[parents] + 1 + preceding - preceding[first]
+
+        connected = np.zeros(n_buses, dtype=bool)
+        connected[self.bfs_order] = True
+        self.positions[~connected] = np.arange(self._n_connected, n_buses)
+        self.order = np.empty(n_buses, dtype=int)
+        self.order[self.positions] = np.arange(n_buses)
+        self._subtree_ends = self.positions + subtree_sizes
+
+        children = self.bfs_order[1:]
+        self._edge_children: dict[str, int] = {
+            graph.branches[branch]: child
+            for child, branch in zip(children.tolist(), self.parent_branches[children].tolist())
+            if graph.branches[branch] is not None
+        }
+        n_tree_branches = connected[graph.branch_buses].all(axis=1).sum()
+        self.is_radial = bool(n_tree_branches == self._n_connected - 1)
+
+    def get_path_to_source(self, bus_id: int) -> np.ndarray:
+        """Method to return index of buses from the bus up to the source bus.
+
+        Branches along the path are `parent_branches` of all but the last bus.
+
+        Args:
+            bus_id (int): Index of the bus, should be connected to the source.
+        """
+        if self.depths[bus_id] < 0:
+            raise ValueError(f"{self.buses[bus_id]} is not connected to {self.source_bus}.")
+        path = np.empty(self.depths[bus_id] + 1, dtype=int)
+        path[0] = bus_id
+        for id in range(1, len(path)):
+            path[id] = self.parents[path[id - 1]]
+        return path
+
+    def get_subtree(self, bus_id: int) -> np.ndarray:
+        """Method to return index of the bus and all buses downstream of it."""
+        return self.order[self.positions[bus_id] : self._subtree_ends[bus_id]]
+
+    def get_prefix_sums(self, values: np.ndarray) -> np.ndarray:
+        """Method to return cumulative sums of per bus values ordered by position.
+
+        Args:
+            values (np.ndarray): Value for each bus ordered by bus index.
+        """
+        return np.r_[0, np.cumsum(np.asarray(values)[self.order])]
+
+    def get_downstream_sums(self, edges: list[str], values: np.ndarray) -> np.ndarray:
+        """Method to sum per bus values disconnected by removing each edge on its own.
+
+        For radial networks this is a single vectorized pass over the
+        subtree intervals of all the edges.
+
+        Args:
+            edges (list[str]): Branch names.
+            values (np.ndarray): Value for each bus ordered by bus index.
+
+        Returns:
+            np.ndarray: Sum of values for each edge.
+        """
+        prefix_sums = self.get_prefix_sums(values)
+        if not self.is_radial:
+            return np.array(
+                [
+                    get_interval_sums(prefix_sums, self.get_disconnected_intervals([edge]))
+                    for edge in edges
+                ]
+            )
+
+        sums = np.full(len(edges), prefix_sums[-1] - prefix_sums[self._n_connected])
+        in_tree = [id for id, edge in enumerate(edges) if edge in self._edge_children]
+        children = [self._edge_children[edges[id]] for id in in_tree]
+        sums[in_tree] += (
+            prefix_sums[self._subtree_ends[children]] - prefix_sums[self.positions[children]]
+        )
+        return sums
+
+    def _get_meshed_intervals(self, edges: set[str]) -> tuple[np.ndarray, np.ndarray]:
+        """Internal method to find disconnected buses by traversing without removed edges."""
+        removed = np.array([name in edges for name in self.graph.branches], dtype=bool)
+        levels, _, _ = self.graph.bfs(self.bus_index[self.source_bus], removed)
+        connected = np.zeros(len(self.buses), dtype=bool)
+        connected[np.concatenate(levels)] = True
+        positions = np.sort(self.positions[~connected])
+        return _merge_intervals(positions, positions + 1)
+
+    def get_disconnected_intervals(
+        self, edges: Iterable[str]
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Method to return positions of buses disconnected by removing edges.
+
+        Args:
+            edges (Iterable[str]): Names of removed branches, names not in
+                the network are ignored.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Sorted disjoint half open
+                intervals of positions as start and end positions.
+        """
+        edges = set(edges)
+        if not edges:
+            return np.array([], dtype=int), np.array([], dtype=int)
+        if not self.is_radial:
+            return self._get_meshed_intervals(edges)
+
+        children = [self._edge_children[edge] for edge in edges if edge in self._edge_children]
+        starts, ends = self.positions[children], self._subtree_ends[children]
+        if self._n_connected < len(self.buses):
+            starts = np.r_[starts, self._n_connected]
+            ends = np.r_[ends, len(self.buses)]
+        return _merge_intervals(starts, ends)
@@ -3,6 +3,7 @@
 
 from typing import List, Optional, Dict
 from enum import Enum
+from pathlib import Path
 
 from pydantic import BaseModel, Field, model_validator
 from pydantic_core import PydanticCustomError
@@ -120,6 +121,15 @@ class DistDERScenarioModel(BaseModel):
     ders: List[BasicDERModel]
 
 
+class DERScenarioFileModel(BaseModel):
+    """Model for DER scenario file written in opendss format."""
+
+    file_path: Path
+    sample_id: Optional[int] = None
+    penetration: Optional[float] = None
+    commands: List[str]
+
+
 class LoadMetadataModel(BaseModel):
     """Interface for representing OpenDSS load metadata."""
 
@@ -2,9 +2,37 @@
 
 from typing import List
 from pathlib import Path
+import re
 
 from emerge.scenarios import data_model
 
+SCENARIO_HEADER = "! DER Scenario for {penetration} kW total size, Sample {sample_id} \n"
+_SCENARIO_HEADER_PATTERN = re.compile(
+    r"^! DER Scenario for (?P<penetration>[-+.\deE]+) kW total size, Sample (?P<sample_id>\d+)"
+)
+
+
+def read_scenario_file(file_path: Path) -> data_model.DERScenarioFileModel:
+    """Function to read DER scenario file written by `OpenDSSPVScenarioWriter`.
+
+    Args:
+        file_path (Path): Path to scenario file.
+
+    Returns:
+        data_model.DERScenarioFileModel: Scenario file model, sample id and
+            penetration are None if file does not have scenario header.
+    """
+    scenario = {"file_path": file_path, "commands": []}
+    with open(file_path, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            match = _SCENARIO_HEADER_PATTERN.match(line)
+            if match:
+                scenario.update(match.groupdict())
+            elif line and not line.startswith(("!", "//", "=")):
+                scenario["commands"].append(line)
+    return data_model.DERScenarioFileModel(**scenario)
+
 
 class OpenDSSPVScenarioWriter:
     """Writer class for exporting scenario in opendss format.
@@ -44,7 +72,9 @@ class OpenDSSPVScenarioWriter:
 
             der_models = []
             der_models.append(
-                f"! DER Scenario for {scenario.penetration} kW total size, Sample {scenario.sample_id} \n"
+                SCENARIO_HEADER.format(
+                    penetration=scenario.penetration, sample_id=scenario.sample_id
+                )
             )
             der_models.append(
                 "==============================================DER SCENARIO FILE====================================\n\n"
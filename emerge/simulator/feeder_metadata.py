@@ -0,0 +1,155 @@
+""" Module for sharing static metadata of the compiled feeder.
+
+Topology, load to bus mapping and customer counts do not change while
+simulating the same feeder, so they are computed once per compiled circuit
+and shared by all the observers instead of being rebuilt by each one of them.
+Metadata is keyed by a fingerprint of the active circuit so that it is
+rebuilt once OpenDSS is cleared or a circuit is compiled again.
+"""
+
+from functools import cached_property
+
+import networkx as nx
+import numpy as np
+import opendssdirect as odd
+import pandas as pd
+
+from emerge.network import circuit_tables
+from emerge.network.topology import FeederGraph, RadialTopology
+from emerge.simulator.opendss import OpenDSSSimulator
+from emerge.utils import dss_util
+
+_feeder_metadata: "tuple[tuple, FeederMetadata] | None" = None
+
+
+def _get_circuit_key() -> tuple:
+    """Internal function to return fingerprint of the active circuit.
+
+    Fingerprint covers version of the circuit, which changes every time it is
+    compiled or a file is redirected on top of it, and the elements static
+    metadata is derived from, so that loads or lines added by commands are
+    picked up as well. Adding pv systems or editing them does not invalidate
+    the metadata.
+    """
+    if not odd.Basic.NumCircuits():
+        return ()
+    simulator = OpenDSSSimulator._active_instance
+    return (
+        simulator.circuit_version if simulator is not None else None,
+        odd.Circuit.Name(),
+        odd.Circuit.NumBuses(),
+        odd.Loads.Count(),
+        odd.Lines.Count(),
+        odd.Transformers.Count(),
+    )
+
+
+class FeederMetadata:
+    """Class for lazily computing static metadata of the active circuit.
+
+    Attributes:
+        buses (list[str]): List of all bus names.
+        bus_table (pd.DataFrame): Dataframe containing bus coordinates and
+            distance indexed by bus name.
+        load_table (pd.DataFrame): Dataframe containing load attributes
+            indexed by load name.
+        feeder_graph (FeederGraph): Compact graph of lines and transformers.
+        network (nx.Graph): Networkx graph representing distribution network.
+        substation_bus (str): Name of the source bus.
+        load_bus_map (pd.DataFrame): Dataframe containing load names
+            indexed by bus name.
+        bus_load_flag (pd.DataFrame): Dataframe containing load flag
+            indexed by bus name.
+        topology (RadialTopology): Index for finding buses downstream of branches.
+        bus_load_counts (np.ndarray): Number of loads on each bus ordered
+            as `topology.buses`.
+        downstream_customers (pd.DataFrame): Dataframe containing number of
+            downward customers and load kW indexed by line and transformer name.
+        line_customers (pd.DataFrame): Dataframe containing number of
+            downward customers indexed by line name.
+    """
+
+    def __init__(self):
+        self._node_buses: tuple[int, list[str]] | None = None
+        self._branch_elements: tuple[int, list[str]] | None = None
+
+    @cached_property
+    def buses(self) -> list[str]:
+        return odd.Circuit.AllBusNames()
+
+    @cached_property
+    def bus_table(self) -> pd.DataFrame:
+        return circuit_tables.get_bus_table()
+
+    @cached_property
+    def load_table(self) -> pd.DataFrame:
+        return circuit_tables.get_load_table()
+
+    @cached_property
+    def feeder_graph(self) -> FeederGraph:
+        return FeederGraph.from_opendss(self.bus_table)
+
+    @cached_property
+    def network(self) -> nx.Graph:
+        return self.feeder_graph.to_networkx()
+
+    @cached_property
+    def substation_bus(self) -> str:
+        return dss_util.get_source_node()
+
+    @cached_property
+    def load_bus_map(self) -> pd.DataFrame:
+        return dss_util.get_bus_load_dataframe(self.load_table).set_index("busname")
+
+    @cached_property
+    def bus_load_flag(self) -> pd.DataFrame:
+        return dss_util.get_bus_load_flag(self.load_bus_map.reset_index())
+
+    @cached_property
+    def topology(self) -> RadialTopology:
+        return RadialTopology(self.feeder_graph, self.substation_bus)
+
+    @cached_property
+    def bus_load_counts(self) -> np.ndarray:
+        bus_index = self.topology.bus_index
+        return np.bincount(
+            [bus_index[bus] for bus in self.load_bus_map.index],
+            minlength=len(bus_index),
+        )
+
+    @cached_property
+    def downstream_customers(self) -> pd.DataFrame:
+        return dss_util.get_downstream_customers(self.topology, self.load_table)
+
+    @cached_property
+    def line_customers(self) -> pd.DataFrame:
+        return dss_util.get_line_customers(self.downstream_customers)
+
+    def get_node_buses(self) -> list[str]:
+        """Returns bus name of each node, extracted again once nodes are added."""
+        n_nodes = odd.Circuit.NumNodes()
+        if self._node_buses is None or self._node_buses[0] != n_nodes:
+            buses = [node.split(".")[0] for node in odd.Circuit.AllNodeNames()]
+            self._node_buses = (n_nodes, buses)
+        return self._node_buses[1]
+
+    def get_branch_elements(self) -> list[str]:
+        """Returns power delivery element names, extracted again once elements are added."""
+        n_elements = odd.PDElements.Count()
+        if self._branch_elements is None or self._branch_elements[0] != n_elements:
+            self._branch_elements = (n_elements, odd.PDElements.AllNames())
+        return self._branch_elements[1]
+
+
+def get_feeder_metadata() -> FeederMetadata:
+    """Returns static metadata of the active circuit.
+
+    Metadata is reused as long as the active circuit has the same fingerprint,
+    e.g. after placing pv systems, and rebuilt once OpenDSS is cleared or
+    any circuit is compiled again.
+    """
+    global _feeder_metadata
+    key = _get_circuit_key()
+    if _feeder_metadata is None or _feeder_metadata[0] != key:
+        _feeder_metadata = (key, FeederMetadata())
+    return _feeder_metadata[1]
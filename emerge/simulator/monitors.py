@@ -0,0 +1,229 @@
+""" Module for placing OpenDSS monitors and reading their results in bulk.
+
+Monitors let OpenDSS record power flow results on its own while it solves
+all the timesteps of a QSTS simulation, so the results can be read back once
+as (time x element) arrays instead of being polled from python every step.
+"""
+
+import numpy as np
+import opendssdirect as odd
+
+from emerge.simulator import powerflow_results
+
+MONITOR_PREFIX = "emerge_"
+
+
+def _get_monitor_names() -> set[str]:
+    """Internal function to return names of monitors in the active circuit."""
+    return {name.lower() for name in odd.Monitors.AllNames() if name != "NONE"}
+
+
+def _get_source_element() -> str:
+    """Internal function to return name of the first voltage source."""
+    odd.Vsources.First()
+    return f"vsource.{odd.Vsources.Name()}"
+
+
+def _read_monitor(monitor_name: str) -> np.ndarray:
+    """Internal function to return monitor channels without hour and seconds columns."""
+    odd.Monitors.Name(monitor_name)
+    return odd.Monitors.AsMatrix()[:, 2:]
+
+
+class MonitorResults:
+    """Class for placing monitors needed to compute power flow results.
+
+    Monitors are only placed for the requested results and are shared
+    where possible e.g. terminal one monitors of power delivery elements
+    are used both for line loadings and node voltages.
+
+    Attributes:
+        results (set[str]): Power flow results to be recorded.
+    """
+
+    def __init__(self, results: set[str]):
+        """Constructor for `MonitorResults` class.
+
+        Args:
+            results (set[str]): Power flow results to be recorded, must be
+                subset of `powerflow_results.POWERFLOW_RESULTS`.
+        """
+        unknown_results = set(results) - set(powerflow_results.POWERFLOW_RESULTS)
+        if unknown_results:
+            raise ValueError(f"{unknown_results} are not valid power flow results.")
+
+        self.results = set(results)
+        self._existing_monitors = _get_monitor_names()
+        self._pd_monitors: dict[str, str] = {}
+        self._voltage_channels: list[tuple[str, list[int], list[int]]] = []
+        self._node_voltage_bases = np.array([])
+        self._pv_monitors: list[str] = []
+        self._loss_monitors: list[str] = []
+        self._source_monitor = ""
+
+        self._solution_monitor = self._add_monitor("solution", _get_source_element(), 1, 5)
+        if "loadings" in self.results:
+            self._place_loading_monitors()
+        if "voltages" in self.results:
+            self._place_voltage_monitors()
+        if self.results & {"pv_powers", "pv_total_power"}:
+            self._place_pv_monitors()
+        if "losses" in self.results:
+            self._place_loss_monitors()
+        if "total_power" in self.results:
+            self._source_monitor = self._add_monitor(
+                "source", _get_source_element(), 1, 1, "ppolar=no"
+            )
+
+    def _add_monitor(
+        self, name: str, element: str, terminal: int, mode: int, options: str = ""
+    ) -> str:
+        """Add monitor to the active circuit and return its name.
+
+        Monitor is edited in place if it was already added to the circuit by
+        previous run so that repeated bulk simulations do not pile up monitors.
+        """
+        monitor_name = f"{MONITOR_PREFIX}{name}"
+        command = "edit" if monitor_name in self._existing_monitors else "new"
+        error = odd.run_command(
+            f"{command} monitor.{monitor_name} element={element} "
+            f"terminal={terminal} mode={mode} {options}"
+        )
+        if error:
+            raise Exception(f"Error adding monitor {monitor_name} >> {error}")
+        odd.Monitors.Name(monitor_name)
+        odd.Monitors.Reset()
+        return monitor_name
+
+    def _place_loading_monitors(self):
+        """Place terminal one monitors on all power delivery elements."""
+        self._pd_phases, self._pd_normal_amps = [], []
+        for id, element in enumerate(powerflow_results.get_branch_elements()):
+            odd.Circuit.SetActiveElement(element)
+            self._pd_phases.append(odd.CktElement.NumPhases())
+            self._pd_normal_amps.append(odd.CktElement.NormalAmps())
+            self._pd_monitors[element.lower()] = self._add_monitor(f"pd_{id}", element, 1, 0)
+
+    def _place_voltage_monitors(self):
+        """Place monitors so that every node in the circuit is covered by one of them."""
+        node_names = odd.Circuit.AllNodeNames()
+        node_index = {node: id for id, node in enumerate(node_names)}
+        is_covered = np.zeros(len(node_names), dtype=bool)
+        bus_kv_base = {}
+
+        for element in odd.Circuit.AllElementNames():
+            odd.Circuit.SetActiveElement(element)
+            if not odd.CktElement.Enabled():
+                continue
+            n_conductors = odd.CktElement.NumConductors()
+            node_order = odd.CktElement.NodeOrder()
+
+            for terminal, bus in enumerate(odd.CktElement.BusNames()):
+                busname = bus.split(".")[0].lower()
+                channels, nodes = [], []
+                for conductor, node in enumerate(
+                    node_order[terminal * n_conductors : (terminal + 1) * n_conductors]
+                ):
+                    id = node_index.get(f"{busname}.{node}")
+                    if id is not None and not is_covered[id]:
+                        is_covered[id] = True
+                        channels.append(2 * conductor)
+                        nodes.append(id)
+                if not nodes:
+                    continue
+
+                monitor_name = self._pd_monitors.get(element.lower()) if terminal == 0 else None
+                if monitor_name is None:
+                    monitor_name = self._add_monitor(
+                        f"v_{len(self._voltage_channels)}", element, terminal + 1, 0
+                    )
+                self._voltage_channels.append((monitor_name, channels, nodes))
+
+            if is_covered.all():
+                break
+
+        for bus in {node.split(".")[0] for node in node_names}:
+            odd.Circuit.SetActiveBus(bus)
+            bus_kv_base[bus] = odd.Bus.kVBase() * 1000
+        self._node_voltage_bases = np.array(
+            [bus_kv_base[node.split(".")[0]] for node in node_names]
+        )
+
+    def _place_pv_monitors(self):
+        """Place power monitors on all pv systems."""
+        for id, pv_name in enumerate(powerflow_results.get_pv_names()):
+            self._pv_monitors.append(
+                self._add_monitor(f"pv_{id}", f"pvsystem.{pv_name}", 1, 1, "ppolar=no")
+            )
+
+    def _place_loss_monitors(self):
+        """Place loss monitors on all power delivery elements."""
+        for id, element in enumerate(powerflow_results.get_branch_elements()):
+            self._loss_monitors.append(self._add_monitor(f"loss_{id}", element, 1, 9))
+
+    def get_convergence(self) -> np.ndarray:
+        """Returns convergence flag for all solved timesteps."""
+        return _read_monitor(self._solution_monitor)[:, 4].astype(bool)
+
+    def get_voltages(self) -> np.ndarray:
+        """Returns (time x node) array of per unit voltages."""
+        n_steps = len(_read_monitor(self._solution_monitor))
+        voltages = np.zeros((n_steps, len(self._node_voltage_bases)))
+        for monitor_name, channels, nodes in self._voltage_channels:
+            voltages[:, nodes] = _read_monitor(monitor_name)[:, channels]
+        bases = np.where(self._node_voltage_bases == 0, np.inf, self._node_voltage_bases)
+        return voltages / bases
+
+    def get_loadings(self) -> np.ndarray:
+        """Returns (time x branch) array of per unit loadings."""
+        loadings = []
+        for monitor_name, n_phases, normal_amps in zip(
+            self._pd_monitors.values(), self._pd_phases, self._pd_normal_amps
+        ):
+            data = _read_monitor(monitor_name)
+            n_conductors = data.shape[1] // 4
+            currents = data[:, 2 * n_conductors : 2 * (n_conductors + n_phases) : 2]
+            loadings.append(
+                currents.max(axis=1) / normal_amps if normal_amps else np.zeros(len(data))
+            )
+        return np.stack(loadings, axis=1)
+
+    def get_pv_powers(self) -> tuple[np.ndarray, np.ndarray]:
+        """Returns (time x pv) arrays of active and reactive powers."""
+        powers = [_read_monitor(monitor_name) for monitor_name in self._pv_monitors]
+        if not powers:
+            n_steps = len(_read_monitor(self._solution_monitor))
+            return np.zeros((n_steps, 0)), np.zeros((n_steps, 0))
+        return (
+            np.stack([-power[:, ::2].sum(axis=1) for power in powers], axis=1),
+            np.stack([-power[:, 1::2].sum(axis=1) for power in powers], axis=1),
+        )
+
+    def get_pv_total_power(self) -> np.ndarray:
+        """Returns (time x 2) array of total pv active and reactive powers."""
+        active_powers, reactive_powers = self.get_pv_powers()
+        return np.stack([active_powers.sum(axis=1), reactive_powers.sum(axis=1)], axis=1)
+
+    def get_losses(self) -> np.ndarray:
+        """Returns (time x 2) array of total circuit losses in W and var."""
+        losses = np.zeros((len(_read_monitor(self._solution_monitor)), 2))
+        for monitor_name in self._loss_monitors:
+            losses += _read_monitor(monitor_name)
+        return losses
+
+    def get_total_power(self) -> np.ndarray:
+        """Returns (time x 2) array of total circuit power in kW and kVar."""
+        data = _read_monitor(self._source_monitor)
+        return np.stack([data[:, ::2].sum(axis=1), data[:, 1::2].sum(axis=1)], axis=1)
+
+    def get_results(self) -> dict[str, np.ndarray | tuple[np.ndarray, np.ndarray]]:
+        """Returns all the recorded results keyed by result name."""
+        getters = {
+            "voltages": self.get_voltages,
+            "loadings": self.get_loadings,
+            "pv_powers": self.get_pv_powers,
+            "pv_total_power": self.get_pv_total_power,
+            "losses": self.get_losses,
+            "total_power": self.get_total_power,
+        }
+        return {result: getters[result]() for result in self.results}
@@ -7,6 +7,11 @@ from loguru import logger
 
 
 class OpenDSSSimulator:
+    # Simulator whose circuit is currently loaded in OpenDSS engine.
+    _active_instance: "OpenDSSSimulator | None" = None
+    # Number of times any circuit was compiled or redefined in this process.
+    _circuit_versions = 0
+
     def __init__(
         self,
         path_to_master_dss_file,
@@ -16,7 +21,23 @@ class OpenDSSSimulator:
 
         self.dss_instance.run_command("Clear")
         self.dss_instance.Basic.ClearAll()
+        OpenDSSSimulator._active_instance = None
         self.execute_dss_command(f"Redirect {self.case_file}")
+        OpenDSSSimulator._active_instance = self
+        self.mark_circuit_changed()
+
+    def mark_circuit_changed(self):
+        """Method to give the circuit new version once its elements are redefined.
+
+        Version is part of the key of cached feeder metadata, so metadata
+        is rebuilt after every compile even if the same master file is compiled.
+        """
+        OpenDSSSimulator._circuit_versions += 1
+        self.circuit_version = OpenDSSSimulator._circuit_versions
+
+    def is_active(self) -> bool:
+        """Returns True if circuit of this instance is still loaded in OpenDSS."""
+        return OpenDSSSimulator._active_instance is self
 
     def execute_dss_command(self, dss_command: str):
         """Method to run opendss commands."""
@@ -50,6 +71,22 @@ class OpenDSSSimulator:
     def post_redirect(self, dss_file_path: Path):
         """Redirect this file."""
         self.execute_dss_command(f"Redirect {str(dss_file_path.absolute())}")
+        self.mark_circuit_changed()
+        self.recalc()
+        self.solve()
+
+    def reset_solution(self):
+        """Method to bring solution back to snapshot state without recompiling.
+
+        Resets meters, monitors and controls, clears pending control actions,
+        moves time back to the start and solves snapshot power flow so that
+        circuit edits can be simulated as if the circuit was freshly compiled.
+        """
+        self.set_mode(0)
+        self.execute_dss_command("Reset")
+        self.dss_instance.CtrlQueue.ClearQueue()
+        self.dss_instance.Solution.Hour(0)
+        self.dss_instance.Solution.Seconds(0)
         self.recalc()
         self.solve()
 
@@ -57,8 +94,9 @@ class OpenDSSSimulator:
         """Method to recal and solve."""
         self.execute_dss_command("calcv")
 
-    def solve(self):
-        self.dss_instance.Solution.Number(1)
+    def solve(self, number: int = 1):
+        """Method to solve given number of timesteps inside OpenDSS."""
+        self.dss_instance.Solution.Number(number)
         self.dss_instance.Solution.Solve()
         return self.dss_instance.Solution.Converged()
 
@@ -1,12 +1,22 @@
 """Extract base level metrics"""
-from functools import cache
+from functools import cached_property
+import datetime
 
 import numpy as np
 import opendssdirect as odd
 import pandas as pd
 import polars as pl
 
-from emerge.network.asset_metrics import networkx_from_opendss_model
+from emerge.simulator.feeder_metadata import get_feeder_metadata
+
+POWERFLOW_RESULTS = (
+    "voltages",
+    "loadings",
+    "pv_powers",
+    "pv_total_power",
+    "losses",
+    "total_power",
+)
 
 
 def get_allbus_voltage_pu():
@@ -40,32 +50,28 @@ def get_voltage_by_distance():
 
 
 def get_voltage_by_lat_lon():
-    network = networkx_from_opendss_model()
-    node_data = {node[0]: node[1] for node in network.nodes.data()}
+    """Returns per unit voltage of each node along with coordinates of its bus."""
+    feeder = get_feeder_metadata()
     all_bus_voltage = odd.Circuit.AllBusMagPu()
-    all_bus_names = odd.Circuit.AllBusNames()
-
-    voltage_by_lat_lon = {"longitudes": [], "latitudes": [], "voltage (pu)": []}
-
-    for bus, voltage_pu in zip(all_bus_names, all_bus_voltage):
-        voltage_by_lat_lon["latitudes"].append(node_data[bus]["pos"][1])
-        voltage_by_lat_lon["longitudes"].append(node_data[bus]["pos"][0])
-        voltage_by_lat_lon["voltage (pu)"].append(voltage_pu)
+    bus_index = feeder.feeder_graph.bus_index
+    bus_ids = [bus_index[bus] for bus in feeder.get_node_buses()]
+    coordinates = feeder.feeder_graph.coordinates[bus_ids]
 
-    return voltage_by_lat_lon
+    return {
+        "longitudes": coordinates[:, 0].tolist(),
+        "latitudes": coordinates[:, 1].tolist(),
+        "voltage (pu)": list(all_bus_voltage),
+    }
 
 
-@cache
 def get_buses() -> list[str]:
     """Returns list of buses for all nodes in current openodd circuit."""
-    nodes = odd.Circuit.AllNodeNames()
-    return [el.split(".")[0] for el in nodes]
+    return get_feeder_metadata().get_node_buses()
 
 
-@cache
 def get_branch_elements() -> list[str]:
     """Returns list of buses for all branches in current openodd circuit."""
-    return odd.PDElements.AllNames()
+    return get_feeder_metadata().get_branch_elements()
 
 
 def get_voltage_dataframe():
@@ -80,21 +86,173 @@ def get_loading_dataframe():
     return pl.DataFrame({"branch": get_branch_elements(), "loading(pu)": np.array(loading) / 100})
 
 
-def get_pv_power_dataframe():
-    """Function to retrieve pv power dataframe."""
-    pv_power_df = {"pvname": [], "active_power": [], "reactive_power": []}
+def get_pv_names() -> list[str]:
+    """Function to retrieve names of pv systems, disabled ones are skipped."""
+    name, next_pv = odd.PVsystems.Name, odd.PVsystems.Next
+    pv_names = []
+    flag = odd.PVsystems.First()
+    while flag > 0:
+        pv_names.append(name().lower())
+        flag = next_pv()
+    return pv_names
+
 
+def get_pv_powers() -> tuple[list[str], np.ndarray, np.ndarray]:
+    """Function to retrieve pv names along with active and reactive powers.
+
+    Powers are summed over conductors inside OpenDSS and collected into a
+    single array, disabled pv systems are skipped like OpenDSS iterators do.
+    """
+    name, total_powers = odd.PVsystems.Name, odd.CktElement.TotalPowers
+    next_pv = odd.PVsystems.Next
+    pv_names, powers = [], []
     flag = odd.PVsystems.First()
     while flag > 0:
-        pv_name = odd.PVsystems.Name().lower()
-        pv_powers = odd.CktElement.Powers()
+        pv_names.append(name().lower())
+        powers.append(total_powers()[:2])
+        flag = next_pv()
+
+    powers = np.array(powers, dtype=float).reshape(-1, 2)
+    return pv_names, -powers[:, 0], -powers[:, 1]
 
-        active_power = -sum(pv_powers[::2])
-        reactive_power = -sum(pv_powers[1::2])
-        pv_power_df["pvname"].append(pv_name)
-        pv_power_df["active_power"].append(active_power)
-        pv_power_df["reactive_power"].append(reactive_power)
 
-        flag = odd.PVsystems.Next()
+def get_pv_total_power() -> np.ndarray:
+    """Function to retrieve total active and reactive power of all pv systems.
 
+    Faster than summing `get_pv_powers` as neither names nor per pv arrays
+    are materialized.
+    """
+    total_powers, next_pv = odd.CktElement.TotalPowers, odd.PVsystems.Next
+    active_power, reactive_power = 0.0, 0.0
+    flag = odd.PVsystems.First()
+    while flag > 0:
+        power = total_powers()
+        active_power -= power[0]
+        reactive_power -= power[1]
+        flag = next_pv()
+    return np.array([active_power, reactive_power])
+
+
+def get_pv_power_dataframe():
+    """Function to retrieve pv power dataframe."""
+    pv_names, active_powers, reactive_powers = get_pv_powers()
+    pv_power_df = {
+        "pvname": pv_names,
+        "active_power": active_powers,
+        "reactive_power": reactive_powers,
+    }
     return pd.DataFrame(pv_power_df).set_index("pvname")
+
+
+class PowerflowSnapshot:
+    """Class for sharing power flow results of a single timestep across observers.
+
+    Every quantity is pulled from OpenDSS lazily the first time an observer asks
+    for it and cached afterwards, so no matter how many observers are attached,
+    each result is extracted at most once per timestep. Arrays share the element
+    index given by `buses`, `branches` and `pv_names` respectively.
+
+    Attributes:
+        timestamp (datetime.datetime | None): Simulation time of the snapshot.
+    """
+
+    def __init__(self, timestamp: datetime.datetime | None = None):
+        self.timestamp = timestamp
+
+    @classmethod
+    def from_results(
+        cls, timestamp: datetime.datetime | None = None, **results
+    ) -> "PowerflowSnapshot":
+        """Create snapshot from already extracted results.
+
+        Results not passed here are still pulled lazily from OpenDSS. PV powers
+        are passed as `pv_powers` tuple of names, active and reactive powers.
+
+        Args:
+            timestamp (datetime.datetime | None): Simulation time of the snapshot.
+            **results: Values keyed by snapshot attribute name e.g. `voltages`.
+        """
+        snapshot = cls(timestamp)
+        for name, value in results.items():
+            if name == "pv_powers":
+                name = "_pv_powers"
+            if not isinstance(getattr(cls, name, None), cached_property):
+                raise ValueError(f"{name} is not a valid power flow result.")
+            snapshot.__dict__[name] = value
+        return snapshot
+
+    @cached_property
+    def timestep_hr(self) -> float:
+        """Simulation step size in hours."""
+        return odd.Solution.StepSize() / 3600
+
+    @cached_property
+    def buses(self) -> list[str]:
+        """Bus names aligned with `voltages`, one entry per node."""
+        return get_buses()
+
+    @cached_property
+    def nodes(self) -> list[str]:
+        """Node names aligned with `voltages`."""
+        return odd.Circuit.AllNodeNames()
+
+    @cached_property
+    def voltages(self) -> np.ndarray:
+        """Per unit voltage magnitude for all nodes."""
+        return np.array(odd.Circuit.AllBusMagPu())
+
+    @cached_property
+    def branches(self) -> list[str]:
+        """Power delivery element names aligned with `loadings`."""
+        return get_branch_elements()
+
+    @cached_property
+    def loadings(self) -> np.ndarray:
+        """Per unit loading for all power delivery elements."""
+        return np.array(odd.PDElements.AllPctNorm(AllNodes=False)) / 100
+
+    @cached_property
+    def _pv_powers(self) -> tuple[list[str], np.ndarray, np.ndarray]:
+        return get_pv_powers()
+
+    @property
+    def pv_names(self) -> list[str]:
+        """PV system names aligned with pv power arrays."""
+        return self._pv_powers[0]
+
+    @property
+    def pv_active_power(self) -> np.ndarray:
+        """Active power in kW generated by each pv system."""
+        return self._pv_powers[1]
+
+    @property
+    def pv_reactive_power(self) -> np.ndarray:
+        """Reactive power in kVar generated by each pv system."""
+        return self._pv_powers[2]
+
+    @cached_property
+    def pv_total_power(self) -> np.ndarray:
+        """Total active power in kW and reactive power in kVar generated by pv systems."""
+        if "_pv_powers" in self.__dict__:
+            return np.array([self.pv_active_power.sum(), self.pv_reactive_power.sum()])
+        return get_pv_total_power()
+
+    @cached_property
+    def losses(self) -> np.ndarray:
+        """Total circuit losses in W and var."""
+        return np.array(odd.Circuit.Losses())
+
+    @cached_property
+    def total_power(self) -> np.ndarray:
+        """Total power flowing into the circuit in kW and kVar."""
+        return np.array(odd.Circuit.TotalPower())
+
+    @cached_property
+    def voltage_dataframe(self) -> pl.DataFrame:
+        """Voltage dataframe for all buses, see `get_voltage_dataframe`."""
+        return pl.DataFrame({"busname": self.buses, "voltage(pu)": self.voltages})
+
+    @cached_property
+    def loading_dataframe(self) -> pl.DataFrame:
+        """Loading dataframe for all branches, see `get_loading_dataframe`."""
+        return pl.DataFrame({"branch": self.branches, "loading(pu)": self.loadings})
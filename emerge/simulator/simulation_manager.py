@@ -1,14 +1,16 @@
 """ This module manages time series simulation for computing
 time series metrics. """
 
-from typing import Union
+from typing import Callable, Union
 import datetime
 
 import pandas as pd
 from loguru import logger
 
 from emerge.constants import OPENDSS_MAX_ITERATION, OPENDSS_QSTS_MODE
-from emerge.simulator import opendss
+from emerge.simulator import opendss, powerflow_results
+from emerge.simulator.monitors import MonitorResults
+from emerge.simulator.powerflow_results import PowerflowSnapshot
 from emerge.metrics import observer
 
 
@@ -43,15 +45,21 @@ class OpenDSSSimulationManager:
         self.simulation_end_time = simulation_end_time
         self.simulation_timestep_min = simulation_timestep_min
         self.opendss_instance = opendss_instance
+        self.current_time = self.simulation_start_time
+        self.convergence_dict = {"datetime": [], "convergence": []}
+        self.is_stopped = False
+        self._prepare_solution()
+
+    def _prepare_solution(self):
+        """Sets QSTS mode, step size and time of the next timestep in OpenDSS.
 
+        Applied again before simulating as circuit edits made in between,
+        e.g. `reset_solution`, bring OpenDSS back to snapshot mode.
+        """
         self.opendss_instance.set_mode(OPENDSS_QSTS_MODE)
-        self.opendss_instance.set_simulation_time(
-            self.simulation_start_time, self.profile_start_time
-        )
+        self.opendss_instance.set_simulation_time(self.current_time, self.profile_start_time)
         self.opendss_instance.set_stepsize(self.simulation_timestep_min)
         self.opendss_instance.set_max_iteration(OPENDSS_MAX_ITERATION)
-        self.current_time = self.simulation_start_time
-        self.convergence_dict = {"datetime": [], "convergence": []}
 
     def update_convergence_dict(self, current_time: datetime.datetime, convergence: bool):
         """Updates convergence dict."""
@@ -66,14 +74,106 @@ class OpenDSSSimulationManager:
         export_df = pd.DataFrame(self.convergence_dict)
         export_df.to_csv(export_path)
 
-    def simulate(self, subject: Union[observer.MetricsSubject, None] = None):
-        """Loops through all the simulation timesteps"""
+    def get_timestamps(self) -> list[datetime.datetime]:
+        """Returns remaining simulation timesteps."""
+        timestamps = []
+        current_time = self.current_time
+        while current_time <= self.simulation_end_time:
+            timestamps.append(current_time)
+            current_time += datetime.timedelta(minutes=self.simulation_timestep_min)
+        return timestamps
+
+    def _should_stop(self, stop_condition: Union[Callable[[], bool], None]) -> bool:
+        """Evaluates stop condition and flags the simulation as stopped if it holds."""
+        if stop_condition is not None and stop_condition():
+            self.is_stopped = True
+            logger.info(f"Simulation stopped at {self.current_time} by stop condition.")
+        return self.is_stopped
+
+    def simulate(
+        self,
+        subject: Union[observer.MetricsSubject, None] = None,
+        stop_condition: Union[Callable[[], bool], None] = None,
+    ):
+        """Loops through all the simulation timesteps
+
+        Args:
+            subject (Union[observer.MetricsSubject, None]): Subject whose
+                observers are notified after each timestep.
+            stop_condition (Union[Callable[[], bool], None]): Predicate evaluated
+                after observers are notified, remaining timesteps are skipped
+                and `is_stopped` is set once it returns True.
+        """
+        self._prepare_solution()
+        if subject:
+            subject.initialize(self.get_timestamps())
         while self.current_time <= self.simulation_end_time:
             convergence = self.opendss_instance.solve()
             self.update_convergence_dict(self.current_time, convergence)
 
             if subject:
-                subject.notify()
+                subject.notify(PowerflowSnapshot(self.current_time))
             self.current_time += datetime.timedelta(minutes=self.simulation_timestep_min)
             if not convergence:
                 logger.error(f"Simulation finished for {self.current_time} >> {convergence}")
+            if self._should_stop(stop_condition):
+                break
+
+    def simulate_bulk(
+        self,
+        subject: Union[observer.MetricsSubject, None] = None,
+        stop_condition: Union[Callable[[], bool], None] = None,
+    ):
+        """Solves all the simulation timesteps inside OpenDSS in one call.
+
+        Monitors are placed for the power flow results needed by the attached
+        observers and read back once the simulation finishes, observers are
+        then notified for each timestep from these results. Note monitors
+        record values in single precision. Stop condition only stops
+        notifying observers as all timesteps are already solved.
+        """
+        timestamps = self.get_timestamps()
+        if not timestamps:
+            return
+
+        self._prepare_solution()
+        if subject:
+            subject.initialize(timestamps)
+        monitor_results = MonitorResults(subject.get_required_results() if subject else set())
+        self.opendss_instance.solve(number=len(timestamps))
+        convergences = monitor_results.get_convergence()
+        results = monitor_results.get_results()
+        timestep_hr = self.opendss_instance.dss_instance.Solution.StepSize() / 3600
+
+        pv_names = []
+        if "pv_powers" in results:
+            pv_names = powerflow_results.get_pv_names()
+
+        for id, current_time in enumerate(timestamps):
+            convergence = bool(convergences[id])
+            self.update_convergence_dict(current_time, convergence)
+
+            if subject:
+                step_results = {
+                    name: value[id] for name, value in results.items() if name != "pv_powers"
+                }
+                if "pv_powers" in results:
+                    active_powers, reactive_powers = results["pv_powers"]
+                    step_results["pv_powers"] = (
+                        pv_names,
+                        active_powers[id],
+                        reactive_powers[id],
+                    )
+                subject.notify(
+                    PowerflowSnapshot.from_results(
+                        current_time, timestep_hr=timestep_hr, **step_results
+                    )
+                )
+            if not convergence:
+                logger.error(f"Simulation finished for {current_time} >> {convergence}")
+
+            self.current_time = current_time + datetime.timedelta(
+                minutes=self.simulation_timestep_min
+            )
+            if self._should_stop(stop_condition):
+                break
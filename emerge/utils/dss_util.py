@@ -1,20 +1,24 @@
 """ Utility functions for odd. """
 
-import copy
 from typing import List
 
+import numpy as np
 import opendssdirect as odd
 import pandas as pd
-import networkx as nx
 
 from emerge.metrics.exceptions import EnergyMeterNotDefined
-from emerge.network import asset_metrics
+from emerge.network import circuit_tables, topology
 from emerge.scenarios import data_model
 
 
-def get_bus_distance_dataframe() -> pd.DataFrame:
+def get_bus_distance_dataframe(bus_df: pd.DataFrame | None = None) -> pd.DataFrame:
     """Get bus distance dataframe.
 
+    Parameters
+    ----------
+        bus_df (pd.DataFrame | None): Already extracted output of
+            `circuit_tables.get_bus_table`, extracted again if not passed.
+
     Returns
     -------
         pd.DataFrame: Dataframe containing distance from
@@ -22,19 +26,13 @@ def get_bus_distance_dataframe() -> pd.DataFrame:
 
     """
 
-    bus_distance_df = {"busname": [], "distance": []}
-    for bus in odd.Circuit.AllBusNames():
-        odd.Circuit.SetActiveBus(bus)
-
-        bus_distance_df["busname"].append(bus)
-        bus_distance_df["distance"].append(odd.Bus.Distance())
-
-    if not sum(bus_distance_df["distance"]):
+    bus_df = circuit_tables.get_bus_table() if bus_df is None else bus_df
+    if not bus_df["distance"].sum():
         raise EnergyMeterNotDefined(
             "Define energy meter to be able to find"
             "number of customers downward of line segment."
         )
-    return pd.DataFrame(bus_distance_df).set_index("busname")
+    return bus_df[["distance"]]
 
 
 def get_list_of_customer_models(
@@ -49,25 +47,24 @@ def get_list_of_customer_models(
         List[data_model.CustomerModel]: List of customer data
             model.
     """
-    cust_type_func = {"class": odd.Loads.Class, "yearly": odd.Loads.Yearly}.get(cust_type)
-
-    flag = odd.Loads.First()
-    bus_distance_df = get_bus_distance_dataframe()
-    customer_model = []
-    while flag:
-        busname = odd.CktElement.BusNames()[0].split(".")[0]
-        customer_model.append(
-            data_model.CustomerModel(
-                name=odd.CktElement.Name(),
-                kw=odd.Loads.kW() * load_multiplier,
-                distance=bus_distance_df.loc[busname]["distance"],
-                cust_type=str(cust_type_func()),
-            )
+    cust_type_column = {"class": "class", "yearly": "yearly"}.get(cust_type)
+
+    load_df = circuit_tables.get_load_table()
+    distances = get_bus_distance_dataframe()["distance"].loc[load_df["busname"]]
+    return [
+        data_model.CustomerModel(
+            name=name,
+            kw=kw * load_multiplier,
+            distance=distance,
+            cust_type=str(load_type),
         )
-
-        flag = odd.Loads.Next()
-
-    return customer_model
+        for name, kw, distance, load_type in zip(
+            load_df.index,
+            load_df["kw"].tolist(),
+            distances.tolist(),
+            load_df[cust_type_column].tolist(),
+        )
+    ]
 
 
 def get_load_mapper_objects() -> List[data_model.LoadMetadataModel]:
@@ -81,56 +78,56 @@ def get_load_mapper_objects() -> List[data_model.LoadMetadataModel]:
             metadata model.
     """
 
-    flag = odd.Loads.First()
-    mapper_model = []
-    while flag:
-        mapper_model.append(
-            data_model.LoadMetadataModel(
-                name=odd.CktElement.Name(),
-                bus=odd.CktElement.BusNames()[0],
-                num_phase=odd.Loads.Phases(),
-                kv=odd.Loads.kV(),
-                yearly=odd.Loads.Yearly(),
-            )
+    load_df = circuit_tables.get_load_table()
+    return [
+        data_model.LoadMetadataModel(
+            name=name, bus=bus, num_phase=num_phase, kv=kv, yearly=yearly
         )
-
-        flag = odd.Loads.Next()
-
-    return mapper_model
+        for name, bus, num_phase, kv, yearly in zip(
+            load_df.index,
+            load_df["bus"],
+            load_df["phases"].tolist(),
+            load_df["kv"].tolist(),
+            load_df["yearly"],
+        )
+    ]
 
 
-def get_bus_load_dataframe() -> pd.DataFrame:
+def get_bus_load_dataframe(load_df: pd.DataFrame | None = None) -> pd.DataFrame:
     """Bus to load mapping dataframe.
 
+    Parameters
+    ----------
+        load_df (pd.DataFrame | None): Already extracted output of
+            `circuit_tables.get_load_table`, extracted again if not passed.
+
     Returns
     -------
         pd.DataFrame: Dataframe containing mapping between load
             name and bus name
     """
 
-    flag = odd.Loads.First()
-    load_bus_name_dict = {"busname": [], "loadname": []}
-    while flag:
-        load_name = odd.CktElement.Name()
-        busname = odd.CktElement.BusNames()[0].split(".")[0]
-        load_bus_name_dict["busname"].append(busname)
-        load_bus_name_dict["loadname"].append(load_name)
+    load_df = circuit_tables.get_load_table() if load_df is None else load_df
+    return pd.DataFrame(
+        {"busname": load_df["busname"].tolist(), "loadname": load_df.index.tolist()}
+    )
 
-        flag = odd.Loads.Next()
 
-    return pd.DataFrame(load_bus_name_dict)
-
-
-def get_bus_load_flag() -> pd.DataFrame:
+def get_bus_load_flag(load_bus_df: pd.DataFrame | None = None) -> pd.DataFrame:
     """Bus to load mapping dataframe.
 
+    Parameters
+    ----------
+        load_bus_df (pd.DataFrame | None): Already extracted output of
+            `get_bus_load_dataframe`, extracted again if not passed.
+
     Returns
     -------
         pd.DataFrame: Dataframe containing load flag
             indexed by bus name.
     """
 
-    load_bus_df = get_bus_load_dataframe()
+    load_bus_df = get_bus_load_dataframe() if load_bus_df is None else load_bus_df
     buses_with_load = list(load_bus_df["busname"])
     all_buses = odd.Circuit.AllBusNames()
     buses_without_load = list(set(all_buses) - set(buses_with_load))
@@ -142,74 +139,100 @@ def get_bus_load_flag() -> pd.DataFrame:
     return pd.DataFrame(is_bus_load).set_index("busname")
 
 
-def get_line_customers() -> pd.DataFrame:
+def get_downstream_customers(
+    radial_topology: topology.RadialTopology | None = None,
+    load_df: pd.DataFrame | None = None,
+) -> pd.DataFrame:
+    """Function to retrieve number of customers, loads and load kW
+    downward of all line segments and transformers.
+
+    All elements are computed together in a single pass over
+    the feeder topology, energy meter is not required.
+
+    Parameters
+    ----------
+        radial_topology (RadialTopology | None): Already built topology
+            index of the feeder, built from the circuit if not passed.
+        load_df (pd.DataFrame | None): Already extracted output of
+            `circuit_tables.get_load_table`, extracted again if not passed.
+
+    Returns
+    -------
+        pd.DataFrame: Dataframe containing number of customers i.e. sum
+            of load `NumCust`, number of loads and nominal load kW indexed
+            by lower case element name e.g. `line.x` or `transformer.x`.
+    """
+    if radial_topology is None:
+        radial_topology = topology.RadialTopology(
+            topology.FeederGraph.from_opendss(), get_source_node()
+        )
+    load_df = circuit_tables.get_load_table() if load_df is None else load_df
+
+    bus_ids = np.array([radial_topology.bus_index[bus] for bus in load_df["busname"]], dtype=int)
+    n_buses = len(radial_topology.buses)
+    bus_customers = np.bincount(bus_ids, weights=load_df["customers"], minlength=n_buses)
+    bus_loads = np.bincount(bus_ids, minlength=n_buses)
+    bus_kw = np.bincount(bus_ids, weights=load_df["kw"], minlength=n_buses)
+
+    element_names = [f"line.{name}".lower() for name in odd.Lines.AllNames() if name != "NONE"]
+    element_names += [
+        f"transformer.{name}".lower() for name in odd.Transformers.AllNames() if name != "NONE"
+    ]
+    return pd.DataFrame(
+        {
+            "customers": radial_topology.get_downstream_sums(
+                element_names, bus_customers
+            ).astype(int),
+            "loads": radial_topology.get_downstream_sums(element_names, bus_loads).astype(int),
+            "kw": radial_topology.get_downstream_sums(element_names, bus_kw),
+        },
+        index=pd.Index(element_names, name="elementname"),
+    )
+
+
+def get_line_customers(customers_df: pd.DataFrame | None = None) -> pd.DataFrame:
     """Function to retrieve dataframe containing number
     of downward serving customers for all line segments.
 
+    Parameters
+    ----------
+        customers_df (pd.DataFrame | None): Already extracted output of
+            `get_downstream_customers`, extracted again if not passed.
+
     Returns
     -------
         pd.DataFrame: Dataframe containing number of customers
             indexed by line name.
     """
-    line_customers_df = {"linename": [], "customers": []}
-
-    odd.Circuit.SetActiveClass("Line")
-    flag = odd.ActiveClass.First()
-
-    while flag:
-        line_name = odd.CktElement.Name().lower()
-        n_customers = odd.Lines.TotalCust()
-        line_customers_df["linename"].append(line_name)
-        line_customers_df["customers"].append(n_customers)
-        flag = odd.ActiveClass.Next()
-
-    if not any(line_customers_df["customers"]):
-        raise EnergyMeterNotDefined(
-            "Define energy meter to be able to find"
-            "number of customers downward of line segment."
-        )
-    return pd.DataFrame(line_customers_df).set_index("linename")
+    customers_df = get_downstream_customers() if customers_df is None else customers_df
+    line_customers_df = customers_df.loc[customers_df.index.str.startswith("line."), ["customers"]]
+    return line_customers_df.rename_axis("linename")
 
 
-def get_transformer_customers() -> pd.DataFrame:
+def get_transformer_customers(customers_df: pd.DataFrame | None = None) -> pd.DataFrame:
     """Function to retrieve dataframe containing number
     of downward serving customers for all transformers.
 
+    Each load downward of the transformer counts as one customer
+    regardless of its `NumCust`, unlike customers of line segments.
+
+    Parameters
+    ----------
+        customers_df (pd.DataFrame | None): Already extracted output of
+            `get_downstream_customers`, extracted again if not passed.
+
     Returns
     -------
         pd.DataFrame: Dataframe containing number of customers
             indexed by transformer name.
     """
-    xfmr_customers_df = {"transformername": [], "customers": []}
-
-    network = asset_metrics.networkx_from_opendss_model()
-    substation_bus = get_source_node()
-    bus_load_flag_df = get_bus_load_flag()
-
-    odd.Circuit.SetActiveClass("Transformer")
-    flag = odd.ActiveClass.First()
-
-    while flag:
-        network_copy = copy.deepcopy(network)
-        xmfr_name = odd.CktElement.Name().lower()
-
-        edge_to_be_removed = []
-        for edge in network_copy.edges():
-            edge_data = network_copy.get_edge_data(*edge)
-            if edge_data and "name" in edge_data and edge_data["name"] == xmfr_name:
-                edge_to_be_removed.append(edge)
-
-        network_copy.remove_edges_from(edge_to_be_removed)
-        connected_buses = nx.node_connected_component(network_copy, substation_bus)
-
-        filtered_bus_df = bus_load_flag_df.loc[bus_load_flag_df.index.difference(connected_buses)]
-
-        n_customers = filtered_bus_df.sum()["is_load"]
-        xfmr_customers_df["transformername"].append(xmfr_name)
-        xfmr_customers_df["customers"].append(n_customers)
-        flag = odd.ActiveClass.Next()
-
-    return pd.DataFrame(xfmr_customers_df).set_index("transformername")
+    customers_df = get_downstream_customers() if customers_df is None else customers_df
+    xfmr_customers_df = customers_df.loc[
+        customers_df.index.str.startswith("transformer."), ["loads"]
+    ]
+    return xfmr_customers_df.rename(columns={"loads": "customers"}).rename_axis(
+        "transformername"
+    )
 
 
 def get_source_node() -> str:
@@ -0,0 +1,140 @@
+""" This module contains tests for computing line loading metrics."""
+
+import numpy as np
+import polars
+
+from emerge.metrics import array_stats, line_loading_stats, observer
+from emerge.simulator.powerflow_results import PowerflowSnapshot
+
+
+def test_overloaded_lines(tmp_path):
+    """Function to test only loadings of overloaded lines are kept."""
+
+    branches = [f"line.l{id}" for id in range(5)]
+    loadings = np.random.default_rng(0).uniform(0.2, 0.9, (10, len(branches)))
+    loadings[7, 1] = 1.2
+    loadings[2, 3] = 1.1
+    loadings[9, 4] = 1.0
+
+    ol_lines = line_loading_stats.OverloadedLines(chunk_size=4)
+    assert ol_lines.get_metric() == {}
+    for step_loadings in loadings:
+        ol_lines.compute(PowerflowSnapshot.from_results(branches=branches, loadings=step_loadings))
+    metric = ol_lines.get_metric()
+
+    assert list(metric) == ["line.l1", "line.l3"]
+    # Loadings of line overloaded in a later chunk start at that chunk.
+    assert ol_lines.get_start_steps() == {"line.l1": 4, "line.l3": 0}
+    assert np.array_equal(metric["line.l1"], loadings[4:, 1])
+    assert np.allclose(metric["line.l3"], loadings[:, 3])
+    assert np.allclose(ol_lines.max_loadings, loadings.max(axis=0))
+    table = ol_lines.get_table()
+    assert table["line.l1"] == [None] * 4 + metric["line.l1"]
+    assert table["line.l3"] == metric["line.l3"]
+    observer.export_metric(ol_lines, tmp_path / "overloaded_lines.csv")
+    exported = polars.read_csv(tmp_path / "overloaded_lines.csv")
+    assert exported["line.l1"].null_count() == 4
+    assert np.allclose(exported["line.l1"].to_numpy()[4:], metric["line.l1"])
+
+    ol_lines = line_loading_stats.OverloadedLines(loading_limit=0.95, chunk_size=4)
+    for step_loadings in loadings:
+        ol_lines.compute(PowerflowSnapshot.from_results(branches=branches, loadings=step_loadings))
+    metric = ol_lines.get_metric()
+    assert list(metric) == ["line.l1", "line.l3", "line.l4"]
+    assert ol_lines.get_start_steps() == {"line.l1": 4, "line.l3": 0, "line.l4": 8}
+    assert np.array_equal(metric["line.l4"], loadings[8:, 4])
+    assert ol_lines.get_metric() == metric
+
+
+def test_line_loading_bins():
+    """Function to test loading bins exclude edges and match batch computation."""
+
+    loadings = np.array([[0.1, 0.2, 0.3, 1.0], [0.5, 2.5, np.nan, 0.2]])
+    bins_obs = line_loading_stats.LineLoadingBins([1.0, 0.2, 0.6, 0.2])
+    for step_loadings in loadings:
+        bins_obs.compute(
+            PowerflowSnapshot.from_results(timestep_hr=0.5, loadings=step_loadings)
+        )
+    assert bins_obs.get_metric() == {
+        ">0.2__<0.6": 1.0,
+        ">0.6__<1.0": 0.0,
+        "<0.2": 0.5,
+        ">1.0": 0.5,
+    }
+
+    batch_obs = line_loading_stats.LineLoadingBins([0.2, 0.6, 1.0])
+    batch_obs.compute_batch(loadings, 0.5)
+    assert batch_obs.get_metric() == bins_obs.get_metric()
+
+
+def _get_p2_quantile(values: np.ndarray, quantile: float) -> float:
+    """Function to estimate quantile of series with reference scalar P² algorithm."""
+    heights = sorted(values[:5])
+    positions = [0, 1, 2, 3, 4]
+    desired_positions = [0, 2 * quantile, 4 * quantile, 2 + 2 * quantile, 4]
+    increments = [0, quantile / 2, quantile, (1 + quantile) / 2, 1]
+    for value in values[5:]:
+        if value < heights[0]:
+            heights[0] = value
+        heights[4] = max(heights[4], value)
+        cell = sum(height <= value for height in heights[1:4])
+        for id in range(cell + 1, 5):
+            positions[id] += 1
+        desired_positions = [
+            position + increment for position, increment in zip(desired_positions, increments)
+        ]
+        for id in range(1, 4):
+            offset = desired_positions[id] - positions[id]
+            if (offset >= 1 and positions[id + 1] - positions[id] > 1) or (
+                offset <= -1 and positions[id - 1] - positions[id] < -1
+            ):
+                step = 1 if offset > 0 else -1
+                n_low, n, n_high = positions[id - 1 : id + 2]
+                q_low, q, q_high = heights[id - 1 : id + 2]
+                parabolic = q + step / (n_high - n_low) * (
+                    (n - n_low + step) * (q_high - q) / (n_high - n)
+                    + (n_high - n - step) * (q - q_low) / (n - n_low)
+                )
+                if q_low < parabolic < q_high:
+                    heights[id] = parabolic
+                else:
+                    next_id = id + step
+                    heights[id] = q + step * (heights[next_id] - q) / (positions[next_id] - n)
+                positions[id] += step
+    return heights[2]
+
+
+def test_p2_quantiles_short_series():
+    """Function to test quantile estimates of short series match reference P² algorithm."""
+
+    rng = np.random.default_rng(1)
+    for n_steps in [6, 24, 100]:
+        values = np.concatenate(
+            [rng.normal(1, 0.1, (n_steps, 4)), rng.exponential(1, (n_steps, 4))], 1
+        )
+        quantiles = array_stats.P2Quantiles([0.05, 0.5, 0.95])
+        for step_values in values:
+            quantiles.add(step_values)
+
+        expected = [
+            [_get_p2_quantile(values[:, id], quantile) for id in range(values.shape[1])]
+            for quantile in [0.05, 0.5, 0.95]
+        ]
+        assert np.allclose(quantiles.get_quantiles(), expected)
+
+
+def test_p2_quantiles():
+    """Function to test quantile estimates of each element over time."""
+
+    rng = np.random.default_rng(0)
+    values = np.concatenate([rng.normal(1, 0.1, (2000, 3)), rng.exponential(1, (2000, 3))], 1)
+    quantiles = array_stats.P2Quantiles([0.05, 0.5, 0.95])
+    for step_values in values[:3]:
+        quantiles.add(step_values)
+    expected = np.quantile(values[:3], [0.05, 0.5, 0.95], axis=0, method="nearest")
+    assert np.allclose(quantiles.get_quantiles(), expected)
+
+    for step_values in values[3:]:
+        quantiles.add(step_values)
+    expected = np.quantile(values, [0.05, 0.5, 0.95], axis=0)
+    assert np.allclose(quantiles.get_quantiles(), expected, atol=0.1 * values.std(axis=0).max())
@@ -3,6 +3,7 @@ feature included in `powerflow_metrics_powerflow` module."""
 
 from pathlib import Path
 
+import numpy as np
 import polars as pl
 import pandas as pd
 
@@ -23,6 +24,34 @@ def test_pv_power_dataframe():
     assert isinstance(pv_df, pd.DataFrame)
 
 
+def test_get_pv_powers():
+    """Test function for bulk and total only pv power extraction."""
+
+    root_path = Path(__file__).absolute().parents[1]
+    master_dss_file = root_path / "examples" / "opendss" / "master.dss"
+
+    simulator = opendss.OpenDSSSimulator(master_dss_file)
+    buses = simulator.dss_instance.Circuit.AllBusNames()
+    for id, bus in enumerate(buses[100:103]):
+        simulator.execute_dss_command(f"new pvsystem.pv{id} bus1={bus} kva=5 pmpp=4")
+    simulator.execute_dss_command("edit pvsystem.pv1 enabled=no")
+    simulator.solve()
+
+    pv_names, active_powers, reactive_powers = powerflow_results.get_pv_powers()
+    assert pv_names == ["pv0", "pv2"]
+    for name, active_power, reactive_power in zip(pv_names, active_powers, reactive_powers):
+        simulator.dss_instance.Circuit.SetActiveElement(f"pvsystem.{name}")
+        powers = simulator.dss_instance.CktElement.Powers()
+        assert np.isclose(active_power, -sum(powers[::2]))
+        assert np.isclose(reactive_power, -sum(powers[1::2]))
+    assert active_powers.min() > 0
+
+    total_power = powerflow_results.get_pv_total_power()
+    assert np.allclose(total_power, [active_powers.sum(), reactive_powers.sum()])
+    snapshot = powerflow_results.PowerflowSnapshot()
+    assert np.allclose(snapshot.pv_total_power, total_power)
+
+
 def test_get_voltage_by_dataframe():
     """Test function for `get_voltage_by_dataframe`
     utility function."""
@@ -36,6 +65,25 @@ def test_get_voltage_by_dataframe():
     assert isinstance(voltage_df, pl.DataFrame)
 
 
+def test_get_voltage_by_lat_lon():
+    """Test function for `get_voltage_by_lat_lon`
+    utility function."""
+
+    root_path = Path(__file__).absolute().parents[1]
+    master_dss_file = root_path / "examples" / "opendss" / "master.dss"
+
+    simulator = opendss.OpenDSSSimulator(master_dss_file)
+    voltage_by_lat_lon = powerflow_results.get_voltage_by_lat_lon()
+
+    n_nodes = simulator.dss_instance.Circuit.NumNodes()
+    assert [len(values) for values in voltage_by_lat_lon.values()] == [n_nodes] * 3
+    voltage_df = pd.DataFrame(voltage_by_lat_lon)
+    node = simulator.dss_instance.Circuit.AllNodeNames()[-1]
+    simulator.dss_instance.Circuit.SetActiveBus(node.split(".")[0])
+    assert voltage_df.iloc[-1]["longitudes"] == simulator.dss_instance.Bus.X()
+    assert voltage_df.iloc[-1]["latitudes"] == simulator.dss_instance.Bus.Y()
+
+
 def test_get_lineloading_dataframe():
     """Test function for `get_lineloading_dataframe`
     utility function."""
@@ -0,0 +1,202 @@
+""" Module for testing multi scenario simulation. """
+
+import datetime
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from emerge.cli import multiscenario_metrics, worker_pool
+from emerge.scenarios import data_model, opendss_writer
+from emerge.simulator import opendss
+
+ROOT_PATH = Path(__file__).absolute().parents[1]
+
+
+def _get_der(customer: str, kw: float) -> data_model.BasicDERModel:
+    """Function to return solar der model for a customer."""
+    return data_model.BasicDERModel(
+        name=f"{customer}_der",
+        kw=kw,
+        customer=data_model.CustomerModel(name=customer, kw=5, distance=0),
+        der_type=data_model.DERType.solar,
+        profile="pvshape_july1",
+    )
+
+
+def test_nested_scenario_groups(tmp_path):
+    """Function to test nested penetration scenarios are grouped by sample."""
+
+    load_mapper = [
+        data_model.LoadMetadataModel(name=f"load_{id}", bus=f"bus_{id}", num_phase=1, kv=0.23)
+        for id in range(3)
+    ]
+    ders = [_get_der(load.name, 2) for load in load_mapper]
+    scenarios = [
+        data_model.DistDERScenarioModel(
+            name=f"sample_{sample_id}_{penetration}",
+            sample_id=sample_id,
+            penetration=penetration,
+            ders=scenario_ders,
+        )
+        for sample_id, penetration, scenario_ders in [
+            (0, 2, ders[:1]),
+            (0, 4, ders[:2]),
+            (0, 6, ders),
+            (1, 2, ders[2:]),
+            (1, 4, ders[:2]),
+        ]
+    ]
+    opendss_writer.OpenDSSPVScenarioWriter(scenarios, tmp_path).write(load_mapper, "pvs.dss")
+
+    scenario_file = opendss_writer.read_scenario_file(tmp_path / "sample_0_4" / "pvs.dss")
+    assert scenario_file.sample_id == 0
+    assert scenario_file.penetration == 4
+    assert len(scenario_file.commands) == 2
+
+    configs = [
+        multiscenario_metrics.ScenarioTimeseriesSimulationInput(
+            master_dss_file=ROOT_PATH / "examples" / "opendss" / "master.dss",
+            start_time=datetime.datetime(2022, 1, 1),
+            end_time=datetime.datetime(2022, 1, 2),
+            profile_start_time=datetime.datetime(2022, 1, 1),
+            export_path=tmp_path / "export",
+            scenario_file=tmp_path / scenario.name / "pvs.dss",
+        )
+        for scenario in reversed(scenarios)
+    ]
+    groups = multiscenario_metrics._get_nested_scenario_groups(configs)
+    assert sorted([config.scenario_file.parent.name for config in group] for group in groups) == [
+        ["sample_0_2", "sample_0_4", "sample_0_6"],
+        ["sample_1_2"],
+        ["sample_1_4"],
+    ]
+
+
+def test_nested_scenarios_match_scenarios_from_scratch(tmp_path):
+    """Function to test nested scenarios give same metrics as simulating each from scratch."""
+
+    master_dss_file = ROOT_PATH / "examples" / "opendss" / "master.dss"
+    buses = opendss.OpenDSSSimulator(master_dss_file).dss_instance.Circuit.AllBusNames()
+    scenario_folder = tmp_path / "scenarios"
+    scenario_folder.mkdir()
+    commands = []
+    for penetration, bus in enumerate([buses[10], buses[40], buses[70]], start=1):
+        commands.append(
+            f"new pvsystem.pv_{penetration} bus1={bus} kva=1500 pmpp=1500 yearly=pvshape_july1"
+        )
+        (scenario_folder / f"sample_0_{penetration}.dss").write_text(
+            f"! DER Scenario for {penetration}.0 kW total size, Sample 0\n" + "\n".join(commands)
+        )
+
+    def get_configs(export_folder: str):
+        return [
+            multiscenario_metrics.ScenarioTimeseriesSimulationInput(
+                master_dss_file=master_dss_file,
+                start_time=datetime.datetime(2022, 1, 1, 6),
+                end_time=datetime.datetime(2022, 1, 1, 18),
+                profile_start_time=datetime.datetime(2022, 1, 1),
+                export_path=tmp_path / export_folder,
+                scenario_file=scenario_file,
+            )
+            for scenario_file in sorted(scenario_folder.iterdir())
+        ]
+
+    (group,) = multiscenario_metrics._get_nested_scenario_groups(get_configs("nested"))
+    assert len(group) == 3
+    multiscenario_metrics._run_nested_timeseries_sims(group)
+    for config in get_configs("scratch"):
+        worker_pool.discard_opendss_instance()
+        multiscenario_metrics._run_timeseries_sim(config)
+    worker_pool.close_background_writer()
+
+    scratch_files = sorted((tmp_path / "scratch").rglob("*.csv"))
+    assert len(scratch_files) > 3
+    pv_energies = []
+    for scratch_file in scratch_files:
+        scratch = pd.read_csv(scratch_file)
+        nested = pd.read_csv(tmp_path / "nested" / scratch_file.relative_to(tmp_path / "scratch"))
+        assert scratch.columns.equals(nested.columns)
+        pd.testing.assert_frame_equal(scratch, nested, rtol=1e-6)
+        if scratch_file.name == "TimeseriesTotalPVPower.csv":
+            pv_energies.append(scratch["active_power"].sum())
+    assert pv_energies[0] < pv_energies[1] < pv_energies[2]
+
+
+@pytest.mark.parametrize("bulk_qsts", [False, True])
+def test_scenarios_reuse_compiled_feeder(tmp_path, bulk_qsts):
+    """Function to test scenarios applied on one compiled feeder match scenarios from scratch."""
+
+    master_dss_file = ROOT_PATH / "examples" / "opendss" / "master.dss"
+    buses = opendss.OpenDSSSimulator(master_dss_file).dss_instance.Circuit.AllBusNames()
+    scenario_folder = tmp_path / "scenarios"
+    scenario_folder.mkdir()
+    scenarios = {
+        "scenario_0": [("pv_1", buses[10], 1500), ("pv_2", buses[40], 1500)],
+        "scenario_1": [("pv_2", buses[70], 800), ("pv_3", buses[40], 1000)],
+        "scenario_2": [("pv_1", buses[10], 1500)],
+    }
+    for name, pvs in scenarios.items():
+        (scenario_folder / f"{name}.dss").write_text(
+            "\n".join(
+                f"new pvsystem.{pv} bus1={bus} kva={kw} pmpp={kw} yearly=pvshape_july1"
+                for pv, bus, kw in pvs
+            )
+        )
+
+    def get_configs(export_folder: str):
+        return [
+            multiscenario_metrics.ScenarioTimeseriesSimulationInput(
+                master_dss_file=master_dss_file,
+                start_time=datetime.datetime(2022, 1, 1, 6),
+                end_time=datetime.datetime(2022, 1, 1, 18),
+                profile_start_time=datetime.datetime(2022, 1, 1),
+                export_path=tmp_path / export_folder,
+                scenario_file=scenario_folder / f"{name}.dss",
+                bulk_qsts=bulk_qsts,
+            )
+            for name in scenarios
+        ]
+
+    worker_pool.discard_opendss_instance()
+    opendss_instance = worker_pool.get_opendss_instance(master_dss_file)
+    for config in get_configs("reused"):
+        multiscenario_metrics._run_timeseries_sim(config)
+        assert worker_pool.get_opendss_instance(master_dss_file) is opendss_instance
+    assert opendss_instance.dss_instance.PVsystems.Count() == 3
+
+    for config in get_configs("scratch"):
+        worker_pool.discard_opendss_instance()
+        multiscenario_metrics._run_timeseries_sim(config)
+    worker_pool.close_background_writer()
+
+    scratch_files = sorted((tmp_path / "scratch").rglob("*.csv"))
+    assert len(scratch_files) > 3
+    for scratch_file in scratch_files:
+        scratch = pd.read_csv(scratch_file)
+        reused = pd.read_csv(tmp_path / "reused" / scratch_file.relative_to(tmp_path / "scratch"))
+        pd.testing.assert_frame_equal(scratch, reused, rtol=1e-6)
+
+
+def test_scenario_editing_feeder_is_not_reused(tmp_path):
+    """Function to test feeder is compiled again after scenario editing its elements."""
+
+    master_dss_file = ROOT_PATH / "examples" / "opendss" / "master.dss"
+    opendss_instance = worker_pool.get_opendss_instance(master_dss_file)
+    load_name = opendss_instance.dss_instance.Loads.AllNames()[0]
+    assert multiscenario_metrics._get_scenario_elements([f"edit load.{load_name} kw=1"]) is None
+
+    scenario_file = tmp_path / "edit_load.dss"
+    scenario_file.write_text(f"edit load.{load_name} kw=1\n")
+    config = multiscenario_metrics.ScenarioTimeseriesSimulationInput(
+        master_dss_file=master_dss_file,
+        start_time=datetime.datetime(2022, 1, 1),
+        end_time=datetime.datetime(2022, 1, 1, 1),
+        profile_start_time=datetime.datetime(2022, 1, 1),
+        export_path=tmp_path / "export",
+        scenario_file=scenario_file,
+    )
+    dss_instance = multiscenario_metrics._apply_scenario(config).dss_instance
+    dss_instance.Loads.Name(load_name)
+    assert dss_instance.Loads.kW() == 1
+    assert worker_pool.get_opendss_instance(master_dss_file) is not opendss_instance
@@ -0,0 +1,228 @@
+""" This module contains tests for computing nodal hosting capacity."""
+
+import datetime
+from pathlib import Path
+
+import numpy as np
+
+from sqlmodel import Session, select, text
+
+from emerge.cli import nodal_hosting_capacity, worker_pool
+from emerge.cli.nodal_hosting_capacity import SingleNodeHostingCapacityInput
+from emerge.cli.nodal_hosting_sqlite_tables import (
+    HostingCapacityReport,
+    OverloadedLinesReport,
+    SimulationTime,
+    SQLiteWriter,
+    create_table,
+    decode_loadings,
+)
+
+ROOT_PATH = Path(__file__).absolute().parents[1]
+HOSTING_CAPACITY_BUSES = [
+    "80_26874634357885_13_085335609729889_htnode",
+    "80_27665028099061_13_086975703292442_node",
+]
+
+
+# Example feeder has overloaded lines at base load, which gives zero hosting capacity.
+UPRATED_MASTER_DSS_FILE = ROOT_PATH / "tests" / "data" / "master_uprated_lines.dss"
+
+
+def hosting_capacity_config_setup(
+    master_dss_file: Path = UPRATED_MASTER_DSS_FILE, **kwargs
+) -> SingleNodeHostingCapacityInput:
+    """Function for setting up single node hosting capacity input."""
+    return SingleNodeHostingCapacityInput(
+        master_dss_file=master_dss_file,
+        start_time=datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc),
+        end_time=datetime.datetime(2022, 1, 2, tzinfo=datetime.timezone.utc),
+        profile_start_time=datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc),
+        resolution_min=60,
+        step_kw=500,
+        max_kw=2000,
+        **kwargs,
+    )
+
+
+def get_hosting_capacities(sqlite_file: Path) -> dict[str, float]:
+    """Function to return hosting capacity by node from sqlite file."""
+    engine = create_table(sqlite_file)
+    with Session(engine) as session:
+        reports = session.exec(select(HostingCapacityReport)).all()
+    return {report.node_name: report.hosting_capacity_kw for report in reports}
+
+
+def test_hosting_capacity_reuses_compiled_circuit(tmp_path):
+    """Function to test hosting capacity for multiple buses on one compiled circuit."""
+
+    sqlite_file = tmp_path / "hosting_capacity.db"
+    create_table(sqlite_file)
+    config = hosting_capacity_config_setup()
+
+    for bus in HOSTING_CAPACITY_BUSES:
+        nodal_hosting_capacity.compute_hosting_capacity(config, bus, "pvshape_july1", sqlite_file)
+
+    opendss_instance = worker_pool.get_opendss_instance(config.master_dss_file)
+    assert opendss_instance.dss_instance.PVsystems.Count() == 1
+    assert get_hosting_capacities(sqlite_file) == {bus: 500 for bus in HOSTING_CAPACITY_BUSES}
+
+
+class _ThresholdReport:
+    """Report whose hosting capacity is reached above a fixed capacity."""
+
+    def __init__(self, capacity: float, threshold: float):
+        self.capacity = capacity
+        self.threshold = threshold
+
+    def is_hosting_capacity_reached(self) -> bool:
+        return self.capacity > self.threshold
+
+
+def test_bisection_search_matches_linear_search():
+    """Function to test bisection search returns same results as linear search."""
+
+    capacities = np.arange(100, 2000, 100)
+    for threshold in [0, 50, 100, 450, 1000, 1850, 1900, 5000]:
+        evaluated = []
+
+        def evaluate(capacity):
+            evaluated.append(capacity)
+            return _ThresholdReport(capacity, threshold)
+
+        linear = nodal_hosting_capacity._linear_search(capacities, evaluate)
+        n_linear = len(evaluated)
+        evaluated.clear()
+        bisection = nodal_hosting_capacity._bisection_search(capacities, evaluate)
+
+        assert bisection[0] == linear[0]
+        assert bisection[1].capacity == linear[1].capacity
+        assert len(evaluated) == len(set(evaluated))
+        assert len(evaluated) <= max(n_linear, 2 * np.log2(len(capacities)) + 2)
+
+    for search in [
+        nodal_hosting_capacity._linear_search,
+        nodal_hosting_capacity._bisection_search,
+    ]:
+        hosting_capacity, report = search(np.array([]), evaluate)
+        assert hosting_capacity == 0
+        assert not report.is_hosting_capacity_reached()
+
+
+def test_hosting_capacity_without_capacities(tmp_path):
+    """Function to test zero hosting capacity is reported if max kw does not exceed step kw."""
+
+    sqlite_file = tmp_path / "hosting_capacity.db"
+    create_table(sqlite_file)
+    bus = HOSTING_CAPACITY_BUSES[0]
+    for search_strategy in ["linear", "bisection"]:
+        config = hosting_capacity_config_setup(search_strategy=search_strategy)
+        config.max_kw = config.step_kw
+        nodal_hosting_capacity.compute_hosting_capacity(config, bus, "pvshape_july1", sqlite_file)
+        assert get_hosting_capacities(sqlite_file) == {bus: 0}
+
+
+def test_hosting_capacity_bisection_search(tmp_path):
+    """Function to test bisection search for hosting capacity written by writer process."""
+
+    sqlite_file = tmp_path / "hosting_capacity.db"
+    engine = create_table(sqlite_file)
+    config = hosting_capacity_config_setup(
+        ROOT_PATH / "examples" / "opendss" / "master.dss", search_strategy="bisection"
+    )
+
+    bus = HOSTING_CAPACITY_BUSES[0]
+    with SQLiteWriter(sqlite_file, commit_rows=1) as writer:
+        nodal_hosting_capacity.compute_hosting_capacity(
+            config, bus, "pvshape_july1", sqlite_file, writer.queue
+        )
+    # Loads downstream of lines overloaded at base load are affected by any capacity.
+    assert get_hosting_capacities(sqlite_file) == {bus: 0}
+
+    with Session(engine) as session:
+        assert session.exec(text("PRAGMA journal_mode")).one()[0] == "wal"
+        overloaded_lines = session.exec(select(OverloadedLinesReport)).all()
+    loadings = [decode_loadings(row.loadings) for row in overloaded_lines]
+    assert loadings
+    assert all(len(loading) == len(loadings[0]) for loading in loadings)
+    assert all(np.nanmax(loading) > 1 for loading in loadings)
+
+
+def test_hosting_capacity_early_termination(tmp_path):
+    """Function to test failing capacities are flagged as partial runs."""
+
+    sqlite_file = tmp_path / "hosting_capacity.db"
+    engine = create_table(sqlite_file)
+    config = hosting_capacity_config_setup(early_termination=True)
+
+    bus = HOSTING_CAPACITY_BUSES[0]
+    nodal_hosting_capacity.compute_hosting_capacity(config, bus, "pvshape_july1", sqlite_file)
+    assert get_hosting_capacities(sqlite_file) == {bus: 500}
+
+    with Session(engine) as session:
+        is_partial = {
+            row.capacity: row.is_partial for row in session.exec(select(SimulationTime)).all()
+        }
+        report = session.exec(select(HostingCapacityReport)).one()
+    assert is_partial == {500: False, 1000: True}
+    assert report.is_partial
+
+
+def test_screened_search_confirms_hosting_capacity():
+    """Function to test screened search falls back to full evaluation."""
+
+    capacities = np.arange(100, 2000, 100)
+    for screened_threshold, threshold in [(1000, 1000), (1500, 450), (50, 50), (5000, 5000)]:
+        evaluated = []
+
+        def screen(capacity):
+            return _ThresholdReport(capacity, screened_threshold)
+
+        def evaluate(capacity):
+            evaluated.append(capacity)
+            return _ThresholdReport(capacity, threshold)
+
+        screened_capacities = capacities[capacities <= screened_threshold]
+        linear = nodal_hosting_capacity._linear_search(capacities, evaluate)
+        n_linear = len(evaluated)
+        for search in [
+            nodal_hosting_capacity._linear_search,
+            nodal_hosting_capacity._bisection_search,
+        ]:
+            evaluated.clear()
+            hosting_capacity, report = nodal_hosting_capacity._screened_search(
+                capacities, search, screen, evaluate
+            )
+            assert hosting_capacity == linear[0]
+            assert report.capacity == linear[1].capacity
+
+            # Screened hosting capacity is confirmed first and only smaller
+            # capacities are evaluated on the whole window afterwards.
+            if len(screened_capacities):
+                assert evaluated[0] == screened_capacities[-1]
+            else:
+                assert not evaluated
+            assert len(evaluated) == len(set(evaluated))
+            assert all(capacity <= screened_threshold for capacity in evaluated)
+            if screened_threshold == threshold:
+                assert evaluated == list(screened_capacities[-1:])
+                assert len(evaluated) < n_linear
+
+
+def test_hosting_capacity_screening(tmp_path):
+    """Function to test hosting capacity screened on critical timesteps."""
+
+    sqlite_file = tmp_path / "hosting_capacity.db"
+    engine = create_table(sqlite_file)
+    config = hosting_capacity_config_setup(screening_timesteps=2)
+
+    bus = HOSTING_CAPACITY_BUSES[0]
+    nodal_hosting_capacity.compute_hosting_capacity(config, bus, "pvshape_july1", sqlite_file)
+    assert get_hosting_capacities(sqlite_file) == {bus: 500}
+
+    with Session(engine) as session:
+        is_partial = [
+            (row.capacity, row.is_partial) for row in session.exec(select(SimulationTime)).all()
+        ]
+    assert (500, False) in is_partial
+    assert all(is_partial_ for capacity, is_partial_ in is_partial if capacity != 500)
@@ -1,10 +1,30 @@
 """ This module contains tests for computing system level metrics."""
 
+import numpy as np
+
 from emerge.metrics import node_metrics
 from emerge.metrics import observer
+from emerge.simulator.feeder_metadata import get_feeder_metadata
+from emerge.simulator.powerflow_results import PowerflowSnapshot
 from conftest import simulation_manager_setup
 
 
+class _LoadingsObserver(observer.MetricObserver):
+    """Observer keeping loadings of every step keyed by lower case branch name."""
+
+    required_results = ("loadings",)
+
+    def __init__(self):
+        self.loadings = []
+
+    def compute(self, snapshot: PowerflowSnapshot):
+        branches = [branch.lower() for branch in snapshot.branches]
+        self.loadings.append(dict(zip(branches, snapshot.loadings)))
+
+    def get_metric(self):
+        return self.loadings
+
+
 def test_nvri_metric():
     """Function to test the computation of NVRI ."""
 
@@ -31,3 +51,31 @@ def test_llri_metric():
     manager.simulate(subject)
     llri = llri_observer.get_metric()
     assert llri
+
+
+def test_llri_metric_values():
+    """Function to test LLRI weights loading above limit by downward customers of each line."""
+
+    manager = simulation_manager_setup()
+    subject = observer.MetricsSubject()
+    llri_observer = node_metrics.LLRI(loading_threshold=0.5)
+    loadings_observer = _LoadingsObserver()
+    subject.attach(llri_observer)
+    subject.attach(loadings_observer)
+
+    manager.simulate(subject)
+
+    customers = get_feeder_metadata().line_customers["customers"]
+    expected = {
+        line: np.mean(
+            [
+                max(loadings[line] - 0.5, 0) * line_customers
+                for loadings in loadings_observer.loadings
+            ]
+        )
+        for line, line_customers in customers.items()
+    }
+    llri = llri_observer.get_metric()
+    assert llri.keys() == expected.keys()
+    assert np.allclose(list(llri.values()), list(expected.values()))
+    assert sum(value > 0 for value in llri.values()) > 1
@@ -1,7 +1,16 @@
 """ This module contains tests for computing system level metrics."""
 
+import datetime
+import json
+
+import numpy as np
+import polars
+import pyarrow
+import pyarrow.parquet
+
 from emerge.metrics import node_voltage_stats
 from emerge.metrics import observer
+from emerge.simulator.powerflow_results import PowerflowSnapshot
 from conftest import simulation_manager_setup
 
 
@@ -31,3 +40,156 @@ def test_node_voltage_bins():
     manager.simulate(subject)
     node_v = node_v_obs.get_metric()
     print(node_v)
+
+
+def test_node_voltage_timeseries(tmp_path):
+    """Function to test storing node voltage time series in preallocated arrays."""
+
+    observers = [
+        node_voltage_stats.NodeVoltageTimeSeries(timestamp_index=True),
+        node_voltage_stats.NodeVoltageTimeSeries("float32", tmp_path / "voltages.npy"),
+    ]
+    manager = simulation_manager_setup()
+    n_steps = len(manager.get_timestamps())
+    subject = observer.MetricsSubject()
+    for node_v_obs in observers:
+        subject.attach(node_v_obs)
+    manager.simulate(subject)
+
+    node_v, memmap_node_v = [node_v_obs.get_metric() for node_v_obs in observers]
+    assert node_v["timestamp"][0] == datetime.datetime(2022, 1, 1)
+    assert len(node_v) == len(memmap_node_v) + 1
+    for node, voltages in memmap_node_v.items():
+        assert len(voltages) == n_steps
+        assert np.allclose(voltages, node_v[node], rtol=1e-5)
+    assert np.load(tmp_path / "voltages.npy").shape == (n_steps, len(memmap_node_v))
+
+    # Array grows when observer is used without being initialized.
+    node_v_obs = node_voltage_stats.NodeVoltageTimeSeries(memmap_file=tmp_path / "grow.npy")
+    for _ in range(3):
+        node_v_obs.compute(PowerflowSnapshot())
+    assert {len(voltages) for voltages in node_v_obs.get_metric().values()} == {3}
+
+    observer.export_csv(observers[:1], tmp_path)
+    assert (tmp_path / "NodeVoltageTimeSeries.csv").exists()
+
+
+def test_export_metrics(tmp_path):
+    """Function to test exporting metrics in columnar formats along with metadata."""
+
+    node_v_obs = node_voltage_stats.NodeVoltageTimeSeries(timestamp_index=True)
+    manager = simulation_manager_setup()
+    manager.simulation_end_time = datetime.datetime(2022, 1, 1, 3)
+    subject = observer.MetricsSubject()
+    subject.attach(node_v_obs)
+    manager.simulate(subject)
+    expected = polars.from_dict(node_v_obs.get_metric())
+
+    observers = {"node_timeseries_voltage": node_v_obs}
+    metadata = {"scenario": "base"}
+    for export_type in ["csv", "parquet", "arrow", "npz"]:
+        export_folder = tmp_path / export_type
+        export_folder.mkdir()
+        observer.export_metrics(
+            observers, export_folder, {"node_timeseries_voltage": export_type}, metadata
+        )
+        file_path = export_folder / f"NodeVoltageTimeSeries.{export_type}"
+        assert file_path.exists()
+
+        if export_type == "parquet":
+            assert polars.read_parquet(file_path).equals(expected)
+            assert pyarrow.parquet.read_schema(file_path).metadata[b"scenario"] == b"base"
+        elif export_type == "arrow":
+            table = pyarrow.ipc.open_file(pyarrow.memory_map(str(file_path))).read_all()
+            assert polars.from_arrow(table).equals(expected)
+            assert table.schema.metadata[b"scenario"] == b"base"
+        elif export_type == "npz":
+            arrays = np.load(file_path)
+            assert json.loads(str(arrays["metadata"])) == metadata
+            assert arrays["timestamp"][0] == np.datetime64("2022-01-01T00:00")
+            node = expected.columns[1]
+            assert np.array_equal(arrays[node], expected[node].to_numpy())
+
+
+def test_node_voltage_timeseries_streaming(tmp_path):
+    """Function to test streaming node voltage time series in chunks bounded by memory."""
+
+    observers = {
+        "in_memory": node_voltage_stats.NodeVoltageTimeSeries(timestamp_index=True),
+        "streamed": node_voltage_stats.NodeVoltageTimeSeries(timestamp_index=True),
+        "stats": node_voltage_stats.NodeVoltageStats(),
+    }
+    manager = simulation_manager_setup()
+    n_steps = len(manager.get_timestamps())
+    subject = observer.MetricsSubject()
+    for node_v_obs in observers.values():
+        subject.attach(node_v_obs)
+
+    # Budget fits 5 timesteps of the feeder with ~8500 nodes in float64.
+    # Observers not able to stream do not take a share of the budget.
+    observer.stream_metrics(
+        observers,
+        tmp_path,
+        {"streamed": "parquet", "stats": "parquet"},
+        0.35,
+        {"scenario": "base"},
+    )
+    assert observers["streamed"].is_streaming and not observers["in_memory"].is_streaming
+    assert not observers["stats"].is_streaming
+    manager.simulate(subject)
+    n_nodes = len(observers["streamed"].nodes)
+    assert len(observers["streamed"].voltages) == 0.35 * 1024**2 // (n_nodes * 8) < n_steps
+
+    observer.export_metrics(observers, tmp_path)
+    assert (tmp_path / "NodeVoltageTimeSeries.csv").exists()
+    file_path = tmp_path / "NodeVoltageTimeSeries.parquet"
+    parquet_file = pyarrow.parquet.ParquetFile(file_path)
+    assert parquet_file.metadata.num_rows == n_steps
+    assert parquet_file.metadata.num_row_groups > 1
+    assert parquet_file.schema_arrow.metadata[b"scenario"] == b"base"
+
+    streamed = polars.from_dict(observers["streamed"].get_metric())
+    assert streamed.equals(polars.from_dict(observers["in_memory"].get_metric()))
+
+
+def test_node_voltage_stats_quantiles():
+    """Function to test configurable quantiles match polars nearest quantiles."""
+
+    voltages = np.random.default_rng(0).uniform(0.9, 1.1, (3, 25))
+    node_v_obs = node_voltage_stats.NodeVoltageStats(quantiles=[0.05, 0.5, 0.95])
+    for step_voltages in voltages:
+        node_v_obs.compute(PowerflowSnapshot.from_results(voltages=step_voltages))
+    node_v = node_v_obs.get_metric()
+
+    assert list(node_v) == ["min", "max", "median", "mean"] + [
+        f"quantile_{quantile}" for quantile in [0.05, 0.5, 0.95]
+    ]
+    for id, step_voltages in enumerate(voltages):
+        df = polars.DataFrame({"voltage(pu)": step_voltages})
+        assert node_v["median"][id] == df.median()["voltage(pu)"][0]
+        for quantile in [0.05, 0.5, 0.95]:
+            expected = df.quantile(quantile)["voltage(pu)"][0]
+            assert node_v[f"quantile_{quantile}"][id] == expected
+
+
+def test_node_voltage_time_stats():
+    """Function to test streaming statistics of each node voltage over time."""
+
+    manager = simulation_manager_setup()
+    subject = observer.MetricsSubject()
+    time_stats_obs = node_voltage_stats.NodeVoltageTimeStats()
+    timeseries_obs = node_voltage_stats.NodeVoltageTimeSeries()
+    subject.attach(time_stats_obs)
+    subject.attach(timeseries_obs)
+    manager.simulate(subject)
+
+    time_stats = time_stats_obs.get_metric()
+    timeseries = timeseries_obs.get_metric()
+    voltages = np.array([timeseries[node] for node in time_stats["node"]]).T
+    assert np.allclose(time_stats["min"], voltages.min(axis=0))
+    assert np.allclose(time_stats["max"], voltages.max(axis=0))
+    assert np.allclose(time_stats["mean"], voltages.mean(axis=0))
+    assert np.allclose(time_stats["variance"], voltages.var(axis=0, ddof=1))
+    for quantile in ["quantile_0.05", "quantile_0.95"]:
+        assert (voltages.min(axis=0) <= time_stats[quantile]).all()
+        assert (time_stats[quantile] <= voltages.max(axis=0)).all()
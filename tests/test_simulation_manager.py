@@ -1,7 +1,13 @@
 """ Module for testing opendss time series simulation. """
 
+import datetime
 from pathlib import Path
 
+import numpy as np
+
+from emerge.metrics import line_loading_stats, node_voltage_stats, observer, system_metrics
+from emerge.simulator import simulation_manager
+from emerge.simulator.powerflow_results import PowerflowSnapshot
 from conftest import simulation_manager_setup
 
 
@@ -15,3 +21,134 @@ def test_timeseries_simulation():
     convergence_file = Path("convergence.csv")
     assert convergence_file.exists()
     convergence_file.unlink()
+
+
+class _PVPowerObserver(observer.MetricObserver):
+    """Class for recording active power of each pv system."""
+
+    required_results = ("pv_powers",)
+
+    def __init__(self):
+        self.active_powers = []
+
+    def compute(self, snapshot: PowerflowSnapshot):
+        """Refer to base class for more details."""
+        self.active_powers.append(dict(zip(snapshot.pv_names, snapshot.pv_active_power)))
+
+    def get_metric(self):
+        """Refer to base class for more details."""
+        return self.active_powers
+
+
+def test_bulk_timeseries_simulation():
+    """Function for testing bulk time series simulation using monitors."""
+
+    results = []
+    for bulk in [False, True]:
+        manager = simulation_manager_setup()
+        bus = manager.opendss_instance.dss_instance.Circuit.AllBusNames()[5]
+        manager.opendss_instance.execute_dss_command(
+            f"new pvsystem.test_pv bus1={bus} kva=2000 pmpp=2000 yearly=pvshape_july1"
+        )
+        observers = {
+            "energy": system_metrics.TotalEnergy(),
+            "voltages": node_voltage_stats.NodeVoltageStats(),
+            "losses": system_metrics.TimeseriesTotalLoss(),
+            "overloaded_lines": line_loading_stats.OverloadedLines(loading_limit=0.5),
+            "loadings": line_loading_stats.LineLoadingStats(),
+            "pv_total_power": system_metrics.TimeseriesTotalPVPower(),
+            "pv_powers": _PVPowerObserver(),
+        }
+        subject = observer.MetricsSubject()
+        for observer_ in observers.values():
+            subject.attach(observer_)
+
+        if bulk:
+            manager.simulate_bulk(subject)
+        else:
+            manager.simulate(subject)
+        results.append({name: observer_.get_metric() for name, observer_ in observers.items()})
+
+    metrics, bulk_metrics = results
+    assert np.isclose(
+        metrics["energy"]["active_power"], bulk_metrics["energy"]["active_power"], rtol=1e-5
+    )
+    assert np.allclose(metrics["voltages"]["max"], bulk_metrics["voltages"]["max"], rtol=1e-5)
+    for key in ["active_power", "reactive_power"]:
+        assert np.allclose(
+            metrics["losses"][key], bulk_metrics["losses"][key], rtol=1e-4, atol=1e-6
+        )
+        assert np.allclose(
+            metrics["pv_total_power"][key],
+            bulk_metrics["pv_total_power"][key],
+            rtol=1e-4,
+            atol=1e-6,
+        )
+    assert metrics["overloaded_lines"]
+    assert metrics["overloaded_lines"].keys() == bulk_metrics["overloaded_lines"].keys()
+    for line, loadings in metrics["overloaded_lines"].items():
+        assert np.allclose(loadings, bulk_metrics["overloaded_lines"][line], rtol=1e-4)
+    for key, values in metrics["loadings"].items():
+        assert np.allclose(values, bulk_metrics["loadings"][key], rtol=1e-4, atol=1e-6)
+    assert [powers.keys() for powers in metrics["pv_powers"]] == [
+        powers.keys() for powers in bulk_metrics["pv_powers"]
+    ]
+    assert np.allclose(
+        [list(powers.values()) for powers in metrics["pv_powers"]],
+        [list(powers.values()) for powers in bulk_metrics["pv_powers"]],
+        rtol=1e-4,
+        atol=1e-3,
+    )
+    assert max(max(powers.values()) for powers in metrics["pv_powers"]) > 0
+
+
+def test_simulation_stop_condition():
+    """Function for testing simulation stops once stop condition is met."""
+
+    for bulk in [False, True]:
+        manager = simulation_manager_setup()
+        subject = observer.MetricsSubject()
+        energy_observer = system_metrics.TotalEnergy()
+        subject.attach(energy_observer)
+
+        def stop_condition():
+            return manager.current_time.hour >= 3
+
+        if bulk:
+            manager.simulate_bulk(subject, stop_condition=stop_condition)
+        else:
+            manager.simulate(subject, stop_condition=stop_condition)
+        assert manager.is_stopped
+        assert manager.current_time == datetime.datetime(2022, 1, 1, 3)
+
+
+def test_simulation_after_reset_solution():
+    """Function to test circuit simulated again after reset solution gives same results."""
+
+    opendss_instance = simulation_manager_setup().opendss_instance
+    bus = opendss_instance.dss_instance.Circuit.AllBusNames()[5]
+    opendss_instance.execute_dss_command(
+        f"new pvsystem.test_pv bus1={bus} kva=500 pmpp=500 yearly=pvshape_july1"
+    )
+    opendss_instance.reset_solution()
+
+    def simulate(reset_after_manager: bool) -> float:
+        manager = simulation_manager.OpenDSSSimulationManager(
+            opendss_instance,
+            datetime.datetime(2022, 1, 1, 6),
+            datetime.datetime(2022, 1, 1),
+            datetime.datetime(2022, 1, 1, 18),
+            60,
+        )
+        if reset_after_manager:
+            opendss_instance.reset_solution()
+        subject = observer.MetricsSubject()
+        energy_observer = system_metrics.TotalEnergy()
+        subject.attach(energy_observer)
+        manager.simulate(subject)
+        return energy_observer.get_metric()["active_power"]
+
+    energy = simulate(reset_after_manager=False)
+    # Simulation has to restore QSTS mode and time also if reset follows manager creation.
+    for _ in range(2):
+        assert np.isclose(simulate(reset_after_manager=True), energy)
@@ -1,11 +1,44 @@
 """ This module contains tests for computing system level metrics."""
 from pathlib import Path
 
+import networkx as nx
+import numpy as np
+
 from emerge.metrics import system_metrics
 from emerge.metrics import observer
+from emerge.simulator.feeder_metadata import get_feeder_metadata
+from emerge.simulator.powerflow_results import PowerflowSnapshot
 from conftest import simulation_manager_setup
 
 
+class _DisconnectedLoadsObserver(observer.MetricObserver):
+    """Observer computing percentage of loads disconnected by overloaded branches
+    by removing them from the networkx graph of the feeder."""
+
+    required_results = ("loadings",)
+
+    def __init__(self):
+        self.percentages = []
+
+    def compute(self, snapshot: PowerflowSnapshot):
+        feeder = get_feeder_metadata()
+        overloaded = {
+            branch.lower()
+            for branch, loading in zip(snapshot.branches, snapshot.loadings)
+            if loading > 1.0
+        }
+        network = feeder.network.copy()
+        network.remove_edges_from(
+            [(u, v) for u, v, name in network.edges(data="name") if name in overloaded]
+        )
+        connected = nx.node_connected_component(network, feeder.substation_bus)
+        loads = feeder.load_bus_map.index
+        self.percentages.append((~loads.isin(connected)).sum() * 100 / len(loads))
+
+    def get_metric(self):
+        return {"percentages": self.percentages}
+
+
 def test_total_energy():
     """Function to test the computation of total energy."""
 
@@ -92,6 +125,26 @@ def test_sardi_aggregated():
     manager.simulate(subject)
 
 
+def test_sardi_overloaded_branches():
+    """Function to test SARDI counts loads downstream of overloaded branches."""
+
+    manager = simulation_manager_setup()
+    subject = observer.MetricsSubject()
+    sardi_line_observer = system_metrics.SARDI_line()
+    sardi_aggregated_observer = system_metrics.SARDI_aggregated()
+    expected_observer = _DisconnectedLoadsObserver()
+    for observer_ in [sardi_line_observer, sardi_aggregated_observer, expected_observer]:
+        subject.attach(observer_)
+
+    manager.simulate(subject)
+
+    # Example feeder has lines overloaded at base load.
+    expected = np.mean(expected_observer.percentages)
+    assert expected > 0
+    assert np.isclose(sardi_line_observer.get_metric()["sardi_line"], expected)
+    assert np.isclose(sardi_aggregated_observer.get_metric()["sardi_aggregated"], expected)
+
+
 def test_sardi_metrics():
     """Function for testing SARDI metrics."""
 
@@ -0,0 +1,78 @@
+""" Module for testing feeder topology index. """
+
+import networkx as nx
+import numpy as np
+
+from emerge.network import topology
+
+
+def _get_network(edges: list[tuple[str, str]]) -> nx.Graph:
+    network = nx.Graph()
+    network.add_nodes_from(["isolated"])
+    for id, (from_bus, to_bus) in enumerate(edges):
+        network.add_edge(from_bus, to_bus, name=f"line.l{id}")
+    return network
+
+
+def _get_disconnected(index: topology.RadialTopology, branches: list[str]) -> set[str]:
+    starts, ends = index.get_disconnected_intervals(branches)
+    positions = [pos for start, end in zip(starts, ends) for pos in range(start, end)]
+    return {index.buses[index.order[pos]] for pos in positions}
+
+
+def test_radial_topology():
+    """Function to test buses downstream of removed branches."""
+
+    edges = [("s", "a"), ("a", "b"), ("b", "c"), ("a", "d"), ("d", "e"), ("s", "f")]
+    index = topology.RadialTopology(_get_network(edges), "s")
+    assert index.is_radial
+
+    def get_disconnected(branches):
+        return _get_disconnected(index, branches)
+
+    assert get_disconnected([]) == set()
+    assert get_disconnected(["line.l1"]) == {"b", "c", "isolated"}
+    assert get_disconnected(["line.l0", "line.l2"]) == {"a", "b", "c", "d", "e", "isolated"}
+    assert get_disconnected(["line.l4", "line.l5", "line.unknown"]) == {"e", "f", "isolated"}
+
+    load_counts = np.zeros(len(index.buses))
+    load_counts[[index.bus_index["c"], index.bus_index["e"]]] = [2, 1]
+    intervals = index.get_disconnected_intervals(["line.l1", "line.l4"])
+    assert topology.get_interval_sums(index.get_prefix_sums(load_counts), intervals) == 3
+    mask = topology.get_interval_mask(index.positions, intervals)
+    assert {bus for bus, flag in zip(index.buses, mask) if flag} == {"b", "c", "e", "isolated"}
+
+    meshed = topology.RadialTopology(_get_network(edges + [("c", "e")]), "s")
+    assert not meshed.is_radial
+    assert _get_disconnected(meshed, ["line.l1"]) == {"isolated"}
+    assert _get_disconnected(meshed, ["line.l1", "line.l3"]) == {"b", "c", "d", "e", "isolated"}
+
+
+def test_feeder_graph():
+    """Function to test compact graph traversal and networkx export."""
+
+    edges = [("s", "a"), ("a", "b"), ("b", "c"), ("a", "d"), ("d", "e"), ("s", "f")]
+    network = _get_network(edges + [("b", "a")])
+    graph = topology.FeederGraph.from_edges(
+        ["isolated"], [(0, 0)], [(u, v, name, 1.0) for u, v, name in network.edges(data="name")]
+    )
+    parallel = topology.FeederGraph.from_edges(
+        [], [], [("a", "b", "line.x", 1.0), ("b", "a", "line.y", 2.0)]
+    )
+    assert parallel.branches == ["line.y"] and list(parallel.lengths) == [2.0]
+    assert graph.to_networkx().nodes["isolated"]["pos"] == (0, 0)
+    exported = topology.FeederGraph.from_networkx(network).to_networkx()
+    assert list(exported.nodes) == list(network.nodes)
+    assert list(exported.edges(data="name")) == list(network.edges(data="name"))
+
+    index = topology.RadialTopology(graph, "s")
+    bus_ids = index.bus_index
+    assert [graph.buses[id] for id in index.bfs_order] == ["s", "a", "f", "b", "d", "c", "e"]
+    assert index.parents[bus_ids["isolated"]] == -1
+    assert graph.branches[index.parent_branches[bus_ids["c"]]] == "line.l2"
+    assert index.depths[bus_ids["e"]] == 3
+
+    path = index.get_path_to_source(bus_ids["e"])
+    assert [graph.buses[id] for id in path] == ["e", "d", "a", "s"]
+    assert {graph.buses[id] for id in index.get_subtree(bus_ids["a"])} == {"a", "b", "c", "d", "e"}
+    assert list(index.get_subtree(bus_ids["f"])) == [bus_ids["f"]]
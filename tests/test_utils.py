@@ -2,8 +2,10 @@
 
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
+from emerge.network import circuit_tables
 from emerge.utils import dss_util
 from emerge.simulator import opendss
 
@@ -61,11 +63,20 @@ def test_get_transformer_customers():
     root_path = Path(__file__).absolute().parents[1]
     master_dss_file = root_path / "examples" / "opendss" / "master.dss"
 
-    opendss.OpenDSSSimulator(master_dss_file)
+    simulator = opendss.OpenDSSSimulator(master_dss_file)
     xfmr_customers_df = dss_util.get_transformer_customers()
 
     assert isinstance(xfmr_customers_df, pd.DataFrame)
 
+    # Transformers count loads while line segments sum customers of loads.
+    simulator.execute_dss_command("BatchEdit Load..* NumCust=3")
+    n_loads = simulator.dss_instance.Loads.Count()
+    xfmr_customers_df = dss_util.get_transformer_customers()
+    line_customers_df = dss_util.get_line_customers()
+    assert xfmr_customers_df["customers"].max() == n_loads
+    assert line_customers_df["customers"].max() == 3 * n_loads
+    assert xfmr_customers_df.index.name == "transformername"
+
 
 def test_get_source_node():
     """test function for getting source node."""
@@ -86,3 +97,57 @@ def test_get_bus_load_flag():
     simulator = opendss.OpenDSSSimulator(master_dss_file)
     is_bus_load_df = dss_util.get_bus_load_flag()
     assert is_bus_load_df.sum()["is_load"] == simulator.dss_instance.Loads.Count()
+
+
+def test_get_downstream_customers():
+    """Test function for checking downstream customers match energy meter."""
+    root_path = Path(__file__).absolute().parents[1]
+    master_dss_file = root_path / "examples" / "opendss" / "master.dss"
+
+    simulator = opendss.OpenDSSSimulator(master_dss_file)
+    customers_df = dss_util.get_downstream_customers()
+
+    flag = simulator.dss_instance.Lines.First()
+    while flag:
+        line_name = simulator.dss_instance.CktElement.Name().lower()
+        n_customers = simulator.dss_instance.Lines.TotalCust()
+        assert customers_df.loc[line_name, "customers"] == n_customers
+        flag = simulator.dss_instance.Lines.Next()
+
+    source_transformer = customers_df.filter(like="transformer.", axis=0)["customers"].idxmax()
+    total_kw = sum(
+        simulator.dss_instance.utils.class_to_dataframe("Load")["kW"].astype(float)
+    )
+    n_loads = simulator.dss_instance.Loads.Count()
+    assert customers_df.loc[source_transformer, "customers"] == n_loads
+    assert np.isclose(customers_df.loc[source_transformer, "kw"], total_kw)
+
+
+def test_circuit_tables():
+    """Test function for checking bulk extracted circuit tables."""
+    root_path = Path(__file__).absolute().parents[1]
+    master_dss_file = root_path / "examples" / "opendss" / "master.dss"
+
+    simulator = opendss.OpenDSSSimulator(master_dss_file)
+    odd = simulator.dss_instance
+
+    bus_df = circuit_tables.get_bus_table()
+    bus = bus_df.index[10]
+    odd.Circuit.SetActiveBus(bus)
+    assert bus_df.loc[bus, ["x", "y", "distance"]].tolist() == [
+        odd.Bus.X(),
+        odd.Bus.Y(),
+        odd.Bus.Distance(),
+    ]
+
+    load_df = circuit_tables.get_load_table()
+    assert len(load_df) == odd.Loads.Count()
+    total_kw = sum(odd.utils.class_to_dataframe("Load")["kW"].astype(float))
+    assert np.isclose(load_df["kw"].sum(), total_kw)
+    assert len(circuit_tables.get_line_table()) == odd.Lines.Count()
+    assert len(circuit_tables.get_transformer_table()) == odd.Transformers.Count()
+    assert circuit_tables.get_pv_table().empty
+
+    simulator.execute_dss_command(f"new pvsystem.pv1 bus1={bus} kva=5 pmpp=4")
+    pv_df = circuit_tables.get_pv_table()
+    assert pv_df.loc["PVSystem.pv1", ["busname", "pmpp", "kva"]].tolist() == [bus, 4, 5]
@@ -0,0 +1,150 @@
+""" Module for testing worker pool keeping compiled feeder. """
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from emerge.cli import worker_pool
+from emerge.simulator import opendss, powerflow_results
+from emerge.simulator.feeder_metadata import get_feeder_metadata
+
+MASTER_DSS_FILE = Path(__file__).absolute().parents[1] / "examples" / "opendss" / "master.dss"
+
+
+def _get_worker_state(_) -> tuple[int, int]:
+    """Function returning ids of compiled simulator and feeder metadata in worker."""
+    return (
+        id(worker_pool.get_opendss_instance(MASTER_DSS_FILE)),
+        id(get_feeder_metadata()),
+    )
+
+
+def _write_slowly(file_path: Path, text: str):
+    """Function writing text to file after a delay."""
+    time.sleep(0.2)
+    file_path.write_text(text)
+
+
+def _submit_write(file_path: Path):
+    """Function queueing write on background writer of the worker."""
+    worker_pool.get_background_writer().submit(_write_slowly, file_path, file_path.stem)
+
+
+def _fail_write():
+    """Function raising error on background writer."""
+    raise OSError("disk full")
+
+
+def _submit_failing_write(id: int):
+    """Function queueing write on background writer failing for second input."""
+    func = _fail_write if id == 1 else time.perf_counter
+    worker_pool.write(worker_pool.get_background_writer(), func, label=f"input_{id}")
+
+
+def test_background_writer(tmp_path):
+    """Function to test background writes are flushed in order and failures raised."""
+
+    writer = worker_pool.BackgroundWriter()
+    file_path = tmp_path / "result.txt"
+    writer.submit(_write_slowly, file_path, "first")
+    writer.submit(_write_slowly, file_path, "second")
+    assert not file_path.exists()
+    writer.flush()
+    assert file_path.read_text() == "second"
+
+    writer.submit(_fail_write)
+    with pytest.raises(RuntimeError, match="Background write of _fail_write failed"):
+        writer.flush()
+    writer.close()
+    with pytest.raises(RuntimeError, match="closed"):
+        writer.submit(_fail_write)
+
+    # Pool workers write queued results before the pool is shut down.
+    file_paths = [tmp_path / f"worker_{id}.txt" for id in range(3)]
+    worker_pool.map_pool(_submit_write, file_paths, 2, MASTER_DSS_FILE)
+    assert [file_path.read_text() for file_path in file_paths] == [
+        "worker_0",
+        "worker_1",
+        "worker_2",
+    ]
+
+    # Failed writes are raised by the pool for the input that queued them,
+    # including the last write of a worker flushed when it exits.
+    with pytest.raises(RuntimeError, match="input_1: OSError") as error:
+        worker_pool.map_pool(_submit_failing_write, [0, 1, 2], 1, MASTER_DSS_FILE)
+    assert "input_0" not in str(error.value) and "input_2" not in str(error.value)
+    with pytest.raises(RuntimeError, match="input_1: OSError"):
+        worker_pool.map_pool(_submit_failing_write, [0, 1], 1, MASTER_DSS_FILE)
+
+
+def test_worker_pool_reuses_compiled_feeder():
+    """Function to test workers compile feeder once and reuse it across tasks."""
+
+    with worker_pool.get_pool(1, MASTER_DSS_FILE) as pool:
+        worker_states = pool.map(_get_worker_state, range(3))
+    assert len(set(worker_states)) == 1
+
+
+def test_feeder_metadata_invalidation(tmp_path):
+    """Function to test feeder metadata is shared until circuit is recompiled or loads change."""
+
+    opendss_instance = opendss.OpenDSSSimulator(MASTER_DSS_FILE)
+    feeder = get_feeder_metadata()
+    bus = feeder.buses[1]
+
+    opendss_instance.execute_dss_command(f"new pvsystem.test_pv bus1={bus} kva=10 pmpp=10")
+    assert get_feeder_metadata() is feeder
+
+    # Redirected edits keeping element counts still invalidate the metadata.
+    load_name = feeder.load_table.index[0]
+    edit_file = tmp_path / "edit_load.dss"
+    edit_file.write_text(f"edit {load_name} kw=123\n")
+    opendss_instance.post_redirect(edit_file)
+    assert get_feeder_metadata() is not feeder
+    assert get_feeder_metadata().load_table.loc[load_name, "kw"] == 123
+
+    feeder = get_feeder_metadata()
+    opendss_instance = opendss.OpenDSSSimulator(MASTER_DSS_FILE)
+    assert get_feeder_metadata() is not feeder
+    assert get_feeder_metadata().load_table.loc[load_name, "kw"] != 123
+    feeder = get_feeder_metadata()
+
+    # Per node metadata follows nodes added without changing buses.
+    n_nodes = len(powerflow_results.get_buses())
+    opendss_instance.execute_dss_command(f"new pvsystem.test_pv2 bus1={bus}.1.2.3.4 pmpp=10")
+    opendss_instance.recalc()
+    assert get_feeder_metadata() is feeder
+    assert len(powerflow_results.get_buses()) == n_nodes + 1
+    assert len(powerflow_results.get_buses()) == opendss_instance.dss_instance.Circuit.NumNodes()
+
+    n_loads = len(feeder.load_bus_map)
+    opendss_instance.execute_dss_command(f"new load.test_load bus1={bus} kw=10")
+    assert get_feeder_metadata() is not feeder
+    assert len(get_feeder_metadata().load_bus_map) == n_loads + 1
+
+    feeder = get_feeder_metadata()
+    opendss_instance.execute_dss_command("clear")
+    assert get_feeder_metadata() is not feeder
+
+
+def _check_forked_worker_state(parent_state: tuple[int, int]):
+    """Function to exit with error if worker does not use feeder compiled by parent."""
+    if _get_worker_state(None) != parent_state:
+        sys.exit(1)
+    worker_pool.get_opendss_instance(MASTER_DSS_FILE).execute_dss_command(
+        f"new load.test_load bus1={get_feeder_metadata().buses[1]} kw=10"
+    )
+
+
+def test_map_forked_inherits_compiled_feeder():
+    """Function to test forked workers use unmodified feeder compiled by parent."""
+
+    worker_pool.init_worker(MASTER_DSS_FILE)
+    parent_state = _get_worker_state(None)
+    worker_pool.map_forked(_check_forked_worker_state, [parent_state] * 3, 2, MASTER_DSS_FILE)
+    assert _get_worker_state(None) == parent_state
+
+    with pytest.raises(RuntimeError):
+        worker_pool.map_forked(_check_forked_worker_state, [(0, 0)], 1, MASTER_DSS_FILE)